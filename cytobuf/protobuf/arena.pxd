@@ -0,0 +1,13 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from cytobuf.protobuf.common cimport Arena as CppArena
+
+cdef class Arena:
+    cdef:
+        CppArena* _arena
+        Py_ssize_t _message_count
@@ -0,0 +1,52 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+import gc
+
+from cytobuf.protobuf.common cimport ArenaOptions
+
+
+cdef class Arena:
+    """A region of memory generated messages can be allocated on and freed all at once.
+
+    Messages constructed with `arena=` (and every sub-message they create) live on the arena
+    and are released together by `Reset()` or when the arena itself is garbage collected.
+    """
+
+    def __cinit__(self, size_t start_block_size = 0, size_t max_block_size = 0):
+        cdef ArenaOptions options = ArenaOptions()
+        if start_block_size:
+            options.start_block_size = start_block_size
+        if max_block_size:
+            options.max_block_size = max_block_size
+        self._arena = new CppArena(options)
+        self._message_count = 0
+
+    def __dealloc__(self):
+        if self._arena is not NULL:
+            del self._arena
+            self._arena = NULL
+
+    def Reset(self):
+        """Frees every message allocated on this arena, returning the number of bytes released.
+
+        Raises `RuntimeError` if a message constructed on this arena is still alive.  Messages
+        that are only kept alive by reference cycles with their cached fields are collected first.
+        """
+        if self._message_count:
+            gc.collect()
+        if self._message_count:
+            raise RuntimeError(
+                f"Cannot reset an arena with {self._message_count} live message(s)"
+            )
+        return self._arena.Reset()
+
+    def SpaceAllocated(self):
+        return self._arena.SpaceAllocated()
+
+    def SpaceUsed(self):
+        return self._arena.SpaceUsed()
@@ -0,0 +1,37 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from libcpp.string cimport string
+from libcpp.vector cimport vector
+
+
+cdef class BinaryColumn:
+    cdef:
+        readonly object offsets
+        readonly bytes data
+        readonly bint utf8
+
+
+cdef class ListColumn:
+    cdef:
+        readonly object offsets
+        readonly object values
+
+
+cdef class ColumnBuffer:
+    cdef:
+        Py_buffer _view
+        bint _acquired
+        const void* data
+
+
+cdef object new_column(str element_format, Py_ssize_t itemsize, Py_ssize_t count, void** data)
+cdef object offsets_column(const vector[long long]& offsets)
+cdef BinaryColumn binary_column(const vector[long long]& offsets, const string& data, bint utf8)
+cdef Py_ssize_t column_length(dict columns) except -1
+cdef ColumnBuffer list_offsets(object column, Py_ssize_t count)
+cdef int binary_values(object column, Py_ssize_t count, vector[string]& values) except -1
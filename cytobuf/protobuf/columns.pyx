@@ -0,0 +1,208 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from cpython.buffer cimport PyBuffer_Release
+from cpython.bytearray cimport PyByteArray_AS_STRING
+from libc.string cimport memcpy
+
+from cytobuf.protobuf.repeated_field cimport acquire_elements
+
+# The Arrow types of numeric columns by struct format, named so that pyarrow is only imported
+# by `to_arrow`.
+_ARROW_TYPES = {
+    "i": "int32",
+    "I": "uint32",
+    "q": "int64",
+    "Q": "uint64",
+    "f": "float32",
+    "d": "float64",
+}
+
+
+cdef class BinaryColumn:
+    """A column of strings or bytes, stored back to back in `data`.
+
+    Value `i` is `data[offsets[i]:offsets[i + 1]]`, so `offsets` holds one more int64 than there
+    are values, as in Arrow's large binary layout.  Values are decoded on access if `utf8`.
+    """
+
+    def __cinit__(self, offsets, bytes data not None, bint utf8 = False):
+        self.offsets = memoryview(offsets)
+        self.data = data
+        self.utf8 = utf8
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, Py_ssize_t index):
+        cdef Py_ssize_t size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("column index out of range")
+        value = self.data[self.offsets[index]:self.offsets[index + 1]]
+        return value.decode("utf-8") if self.utf8 else value
+
+
+cdef class ListColumn:
+    """A column of lists, whose items are stored back to back in the column `values`.
+
+    Row `i` holds items `offsets[i]` up to `offsets[i + 1]` of `values`, as in Arrow's large list
+    layout.
+    """
+
+    def __cinit__(self, offsets, values):
+        self.offsets = memoryview(offsets)
+        self.values = values
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+cdef class ColumnBuffer:
+    """The contiguous buffer of a numeric column of `count` values being read into messages."""
+
+    def __cinit__(self, column, bytes element_format, Py_ssize_t itemsize, Py_ssize_t count):
+        cdef Py_ssize_t size = acquire_elements(column, &self._view, element_format, itemsize, 0)
+        self._acquired = True
+        if size != count:
+            raise ValueError(f"Expected a column of {count} values, got {size}")
+        self.data = self._view.buf
+
+    def __dealloc__(self):
+        if self._acquired:
+            PyBuffer_Release(&self._view)
+
+
+cdef object new_column(str element_format, Py_ssize_t itemsize, Py_ssize_t count, void** data):
+    """Allocates a column of `count` values, pointing `data` at its buffer."""
+    cdef bytearray buffer = bytearray(count * itemsize)
+    data[0] = PyByteArray_AS_STRING(buffer)
+    return memoryview(buffer).cast(element_format)
+
+
+cdef object offsets_column(const vector[long long]& offsets):
+    cdef void* data
+    column = new_column("q", sizeof(long long), offsets.size(), &data)
+    if not offsets.empty():
+        memcpy(data, offsets.data(), offsets.size() * sizeof(long long))
+    return column
+
+
+cdef BinaryColumn binary_column(const vector[long long]& offsets, const string& data, bint utf8):
+    return BinaryColumn(offsets_column(offsets), data, utf8)
+
+
+cdef Py_ssize_t _length(object column) except -2:
+    """Returns the number of rows in `column`, or -1 for a sub-message without columns."""
+    cdef Py_ssize_t length = -1
+    cdef Py_ssize_t size
+    if not isinstance(column, dict):
+        return len(column)
+    for name, child in column.items():
+        size = _length(child)
+        if size < 0:
+            continue
+        if length >= 0 and size != length:
+            raise ValueError(f"Column {name!r} has {size} values, expected {length}")
+        length = size
+    return length
+
+
+cdef Py_ssize_t column_length(dict columns) except -1:
+    """Returns the number of rows in `columns`, which must all have the same length."""
+    return max(_length(columns), 0)
+
+
+cdef int _check_offsets(const long long* offsets, Py_ssize_t count) except -1:
+    cdef Py_ssize_t i
+    if offsets[0] != 0:
+        raise ValueError("Column offsets must start at 0")
+    for i in range(count):
+        if offsets[i + 1] < offsets[i]:
+            raise ValueError("Column offsets must not decrease")
+    return 0
+
+
+cdef ColumnBuffer list_offsets(object column, Py_ssize_t count):
+    """Acquires the validated offsets of a `ListColumn` of `count` rows."""
+    cdef ColumnBuffer offsets
+    if not isinstance(column, ListColumn):
+        raise TypeError(f"Repeated fields must be a ListColumn, not {type(column).__name__}")
+    offsets = ColumnBuffer(column.offsets, b"q", sizeof(long long), count + 1)
+    _check_offsets(<const long long*>offsets.data, count)
+    return offsets
+
+
+cdef int binary_values(object column, Py_ssize_t count, vector[string]& values) except -1:
+    """Reads `count` values from a `BinaryColumn` or a sequence of `str` and bytes."""
+    cdef ColumnBuffer offsets
+    cdef const long long* positions
+    cdef const char* data
+    cdef bytes raw
+    cdef Py_ssize_t i
+    values.clear()
+    values.reserve(count)
+    if isinstance(column, BinaryColumn):
+        offsets = ColumnBuffer(column.offsets, b"q", sizeof(long long), count + 1)
+        positions = <const long long*>offsets.data
+        _check_offsets(positions, count)
+        raw = column.data
+        if positions[count] > len(raw):
+            raise ValueError("Column offsets exceed its data")
+        data = raw
+        for i in range(count):
+            values.push_back(string(data + positions[i], positions[i + 1] - positions[i]))
+        return 0
+    if len(column) != count:
+        raise ValueError(f"Expected a column of {count} values, got {len(column)}")
+    for value in column:
+        values.push_back(value.encode() if isinstance(value, str) else value)
+    return 0
+
+
+def _to_arrow_array(pyarrow, column, Py_ssize_t length):
+    if isinstance(column, dict):
+        if not column:
+            return pyarrow.array([{}] * length, pyarrow.struct([]))
+        return pyarrow.StructArray.from_arrays(
+            [_to_arrow_array(pyarrow, child, length) for child in column.values()],
+            names=list(column),
+        )
+    if isinstance(column, ListColumn):
+        offsets = pyarrow.Array.from_buffers(
+            pyarrow.int64(), length + 1, [None, pyarrow.py_buffer(column.offsets)]
+        )
+        values = _to_arrow_array(pyarrow, column.values, column.offsets[length])
+        return pyarrow.LargeListArray.from_arrays(offsets, values)
+    if isinstance(column, BinaryColumn):
+        return pyarrow.Array.from_buffers(
+            pyarrow.large_string() if column.utf8 else pyarrow.large_binary(),
+            length,
+            [None, pyarrow.py_buffer(column.offsets), pyarrow.py_buffer(column.data)],
+        )
+    view = memoryview(column)
+    if view.format == "?":
+        # Arrow packs booleans into bits, so they're the one type that has to be converted.
+        values = pyarrow.Array.from_buffers(
+            pyarrow.uint8(), length, [None, pyarrow.py_buffer(view.cast("B"))]
+        )
+        return values.cast(pyarrow.bool_())
+    arrow_type = getattr(pyarrow, _ARROW_TYPES[view.format])()
+    return pyarrow.Array.from_buffers(arrow_type, length, [None, pyarrow.py_buffer(view)])
+
+
+def to_arrow(dict columns, Py_ssize_t length):
+    """Converts the columns of `length` rows from a generated `to_columns` to a RecordBatch.
+
+    The Arrow arrays share the columns' buffers rather than copying them, except for booleans.
+    Requires pyarrow, which is imported on first use.
+    """
+    import pyarrow
+
+    arrays = [_to_arrow_array(pyarrow, column, length) for column in columns.values()]
+    return pyarrow.RecordBatch.from_arrays(arrays, names=list(columns))
@@ -5,8 +5,15 @@
 # distutils: library_dirs = /usr/local/lib
 # distutils: extra_compile_args= -std=c++11
 
+from libc.stdint cimport uint32_t
+from libc.stdint cimport uint64_t
+from libc.stdint cimport uint8_t
+from libcpp cimport bool
 from libcpp.pair cimport pair
 from libcpp.string cimport string
+from libcpp.vector cimport vector
+
+from cytobuf.protobuf.repeated_field cimport RepeatedPtrField
 
 
 cdef extern from "google/protobuf/util/message_differencer.h" namespace "google::protobuf::util":
@@ -36,10 +43,18 @@ cdef extern from "google/protobuf/map.h" namespace "google::protobuf":
             iterator operator++(int)
             bint operator==(iterator)
             bint operator!=(iterator)
+        cppclass const_iterator:
+            const value_type& operator*() const
+            const_iterator& operator++()
+            const_iterator operator++(int)
+            bint operator==(const_iterator)
+            bint operator!=(const_iterator)
 
         Map()
         iterator begin()
         iterator end()
+        const_iterator cbegin() const
+        const_iterator cend() const
         void clear()
         size_t size()
         bint empty()
@@ -49,21 +64,136 @@ cdef extern from "google/protobuf/map.h" namespace "google::protobuf":
         T & at(const key_type & key)
         size_t count(const key_type & key) const
         iterator find(const key_type & key)
+        const_iterator const_find "find"(const key_type & key) const
         pair[iterator, bint] insert(const value_type & value)
         size_t erase(const key_type & key)
 
 
+cdef extern from "google/protobuf/arena.h" namespace "google::protobuf":
+    cdef cppclass ArenaOptions:
+        ArenaOptions()
+        size_t start_block_size
+        size_t max_block_size
+
+    cdef cppclass Arena:
+        Arena(const ArenaOptions& options)
+        uint64_t Reset()
+        uint64_t SpaceAllocated() const
+        uint64_t SpaceUsed() const
+
+        @staticmethod
+        T* CreateMessage[T](Arena* arena)
+
+
+cdef extern from "google/protobuf/io/coded_stream.h" namespace "google::protobuf::io" nogil:
+    cdef cppclass CodedInputStream:
+        CodedInputStream(const uint8_t* buffer, int size)
+        bint ConsumedEntireMessage()
+        void SetRecursionLimit(int limit)
+        void SetTotalBytesLimit(int total_bytes_limit)
+
+    cdef cppclass CodedOutputStream:
+        CodedOutputStream(ZeroCopyOutputStream* stream)
+        void WriteVarint32(uint32_t value)
+
+        @staticmethod
+        size_t VarintSize32(uint32_t value)
+
+
+cdef extern from "google/protobuf/io/zero_copy_stream_impl.h" namespace "google::protobuf::io" nogil:
+    cdef cppclass ZeroCopyInputStream:
+        pass
+
+    cdef cppclass ZeroCopyOutputStream:
+        pass
+
+    cdef cppclass ArrayOutputStream(ZeroCopyOutputStream):
+        ArrayOutputStream(void* data, int size)
+
+    cdef cppclass FileInputStream(ZeroCopyInputStream):
+        FileInputStream(int file_descriptor)
+        bint Close()
+        void SetCloseOnDelete(bint value)
+        int GetErrno() const
+
+    cdef cppclass FileOutputStream(ZeroCopyOutputStream):
+        FileOutputStream(int file_descriptor)
+        bint Close()
+        bint Flush()
+        void SetCloseOnDelete(bint value)
+        int GetErrno() const
+
+
+cdef extern from "google/protobuf/descriptor.h" namespace "google::protobuf":
+    cdef cppclass Descriptor
+
+    cdef cppclass OneofDescriptor:
+        pass
+
+    cdef cppclass FieldDescriptor:
+        int number() const
+        bint is_map() const
+        bint is_repeated() const
+        const Descriptor* message_type() const
+        const OneofDescriptor* containing_oneof() const
+
+    cdef cppclass Descriptor:
+        const string& full_name() const
+        int field_count() const
+        const FieldDescriptor* field(int index) const
+        const FieldDescriptor* FindFieldByName(const string& name) const
+
+
+cdef extern from "google/protobuf/unknown_field_set.h" namespace "google::protobuf" nogil:
+    cdef cppclass UnknownFieldSet:
+        void Swap(UnknownFieldSet* other)
+
+
+cdef extern from "google/protobuf/wire_format.h" namespace "google::protobuf::internal" nogil:
+    cdef cppclass WireFormat:
+        @staticmethod
+        size_t ComputeUnknownFieldsSize(const UnknownFieldSet& unknown_fields)
+
+
 cdef extern from "google/protobuf/message.h" namespace "google::protobuf":
     cdef cppclass Message:
-        bint ParseFromString(const string& data) except +
-        bint SerializeToString(string* output) const
+        bint ParseFromString(const string& data) nogil except +
+        bint ParseFromArray(const void* data, int size) nogil except +
+        bint MergeFromCodedStream(CodedInputStream* input) nogil except +
+        bint MergePartialFromCodedStream(CodedInputStream* input) nogil except +
+        bint SerializeToString(string* output) nogil const
+        uint8_t* SerializeWithCachedSizesToArray(uint8_t* target) nogil const
+        void SerializeWithCachedSizes(CodedOutputStream* output) nogil const
+        size_t ByteSizeLong() nogil const
         string DebugString() const
-        void Clear()
+        void Clear() nogil
+        void CopyFrom(const Message& other)
+        void MergeFrom(const Message& other)
+        Arena* GetArena() const
+        const Descriptor* GetDescriptor() const
+        const Reflection* GetReflection() const
+        Message* New(Arena* arena) const
+        int GetCachedSize() nogil const
+        void DiscardUnknownFields() nogil
+
+    cdef cppclass Reflection:
+        # Deprecated upstream, but unlike GetRepeatedFieldRef it indexes the elements directly.
+        const RepeatedPtrField[T]& GetRepeatedPtrField[T](
+            const Message& message, const FieldDescriptor* field
+        ) const
+        void ListFields(const Message& message, vector[const FieldDescriptor*]* output) const
+        void SwapFields(
+            Message* message1, Message* message2, const vector[const FieldDescriptor*]& fields
+        ) const
+        void Swap(Message* message1, Message* message2) const
+        const UnknownFieldSet& GetUnknownFields(const Message& message) const
+        UnknownFieldSet* MutableUnknownFields(Message* message) const
 
 
 cdef extern from "google/protobuf/stubs/status.h" namespace "google::protobuf::util":
     cdef cppclass Status:
         Status()
+        bint ok() const
         string ToString() const
 
 
@@ -79,4 +209,13 @@ cdef extern from "google/protobuf/util/json_util.h" namespace "google::protobuf:
         bint case_insensitive_enum_parsing
 
     cdef Status MessageToJsonString(const Message &, string*, const JsonPrintOptions &)
-    cdef Status JsonStringToMessage(const char*, Message*, const JsonParseOptions &)
\ No newline at end of file
+    cdef Status JsonStringToMessage(const char*, Message*, const JsonParseOptions &)
+
+
+cdef extern from "google/protobuf/util/delimited_message_util.h" namespace "google::protobuf::util" nogil:
+    cdef bint ParseDelimitedFromZeroCopyStream(
+        Message* message, ZeroCopyInputStream* input, bool* clean_eof
+    ) except +
+    cdef bint SerializeDelimitedToZeroCopyStream(
+        const Message& message, ZeroCopyOutputStream* output
+    ) except +
@@ -0,0 +1,23 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from cytobuf.protobuf.common cimport FileInputStream
+from cytobuf.protobuf.common cimport FileOutputStream
+
+cdef class DelimitedReader:
+    cdef:
+        FileInputStream* _stream
+        bint _owns_fd
+        object _message_type
+
+cdef class DelimitedWriter:
+    cdef:
+        FileOutputStream* _stream
+        bint _owns_fd
+
+    cdef int _error(self)
+    cdef int _finish(self)
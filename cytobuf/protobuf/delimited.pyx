@@ -0,0 +1,149 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+import os
+
+from libc.errno cimport EIO
+from libcpp cimport bool as cpp_bool
+
+from cytobuf.protobuf.common cimport ParseDelimitedFromZeroCopyStream
+from cytobuf.protobuf.common cimport SerializeDelimitedToZeroCopyStream
+from cytobuf.protobuf.message cimport Message
+
+from cytobuf.protobuf.message import DecodeError
+
+
+cdef int _open(target, int flags, bint* owns_fd) except -1:
+    if isinstance(target, int):
+        owns_fd[0] = False
+        return target
+    if hasattr(target, "fileno"):
+        owns_fd[0] = False
+        return target.fileno()
+    owns_fd[0] = True
+    return os.open(target, flags, 0o666)
+
+
+cdef _raise_os_error(int error):
+    raise OSError(error, os.strerror(error))
+
+
+cdef class DelimitedReader:
+    """Lazily reads varint length-delimited messages, e.g. as written by Java's `writeDelimitedTo`.
+
+    `source` is a path, a file descriptor, or an object with a `fileno()` method.  File objects
+    are read through their descriptor, bypassing any Python-level buffering.  Only paths are
+    closed by `close()`.
+    """
+
+    def __cinit__(self, source, message_type):
+        if not issubclass(message_type, Message):
+            raise TypeError(f"{message_type!r} is not a cytobuf message type")
+        self._message_type = message_type
+        self._stream = new FileInputStream(_open(source, os.O_RDONLY, &self._owns_fd))
+        self._stream.SetCloseOnDelete(self._owns_fd)
+
+    def __dealloc__(self):
+        if self._stream is not NULL:
+            del self._stream
+            self._stream = NULL
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        cdef Message message
+        cdef bint success
+        cdef cpp_bool clean_eof = False
+        if self._stream is NULL:
+            raise ValueError("I/O operation on closed reader")
+        message = self._message_type()
+        with nogil:
+            success = ParseDelimitedFromZeroCopyStream(
+                message._internal, self._stream, &clean_eof
+            )
+        if success:
+            return message
+        if clean_eof:
+            raise StopIteration
+        if self._stream.GetErrno():
+            _raise_os_error(self._stream.GetErrno())
+        raise DecodeError("Error parsing delimited message")
+
+    def close(self):
+        if self._stream is not NULL:
+            del self._stream
+            self._stream = NULL
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+cdef class DelimitedWriter:
+    """Writes varint length-delimited messages, the framing read by `DelimitedReader`.
+
+    `destination` is a path (truncated if it exists), a file descriptor, or an object with a
+    `fileno()` method.  Output is buffered until `flush()` or `close()`.
+    """
+
+    def __cinit__(self, destination):
+        self._stream = new FileOutputStream(
+            _open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, &self._owns_fd)
+        )
+
+    def __dealloc__(self):
+        if self._stream is not NULL:
+            self._finish()
+
+    cdef int _error(self):
+        return self._stream.GetErrno() or EIO
+
+    cdef int _finish(self):
+        """Flushes the stream, closing the descriptor if we opened it, and returns any errno."""
+        cdef bint success
+        cdef int error = 0
+        if self._owns_fd:
+            success = self._stream.Close()
+        else:
+            success = self._stream.Flush()
+        if not success:
+            error = self._error()
+        del self._stream
+        self._stream = NULL
+        return error
+
+    def write(self, Message message):
+        cdef bint success
+        if self._stream is NULL:
+            raise ValueError("I/O operation on closed writer")
+        message._load_lazy_fields()
+        with nogil:
+            success = SerializeDelimitedToZeroCopyStream(message._internal[0], self._stream)
+        if not success:
+            _raise_os_error(self._error())
+
+    def flush(self):
+        if self._stream is NULL:
+            raise ValueError("I/O operation on closed writer")
+        if not self._stream.Flush():
+            _raise_os_error(self._error())
+
+    def close(self):
+        cdef int error
+        if self._stream is not NULL:
+            error = self._finish()
+            if error:
+                _raise_os_error(error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,18 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from cpython.ref cimport PyObject
+from libcpp.vector cimport vector
+
+
+cdef class EnumTable:
+    cdef:
+        dict _members
+        vector[PyObject*] _table
+        int _first
+
+    cdef object lookup(self, int value)
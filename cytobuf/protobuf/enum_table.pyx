@@ -0,0 +1,37 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+# Enums whose values span more than this many integers are looked up in a dict instead.
+DEF MAX_TABLE_SIZE = 1024
+
+
+cdef class EnumTable:
+    """Maps the integer values of an `IntEnum` to its members.
+
+    Generated code keeps one table per enum type it reads, so decoding an enum field is an
+    array index instead of a call to the enum class.  Values that aren't defined by the enum,
+    which proto3 allows, are returned as plain ints.
+    """
+
+    def __cinit__(self, enum_type):
+        cdef int value
+        # Aliases share a member, so index by value rather than iterating the enum.
+        self._members = dict(enum_type._value2member_map_)
+        if not self._members:
+            return
+        self._first = min(self._members)
+        if max(self._members) - self._first >= MAX_TABLE_SIZE:
+            return
+        self._table.resize(max(self._members) - self._first + 1, NULL)
+        for value, member in self._members.items():
+            self._table[value - self._first] = <PyObject*>member
+
+    cdef object lookup(self, int value):
+        cdef size_t index = <size_t>(<long long>value - self._first)
+        if index < self._table.size() and self._table[index] is not NULL:
+            return <object>self._table[index]
+        return self._members.get(value, value)
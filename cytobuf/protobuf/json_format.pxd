@@ -0,0 +1,30 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from libcpp.string cimport string
+
+from cytobuf.protobuf.common cimport Message as CppMessage
+
+cdef str encode_bytes(const string& value)
+cdef object encode_float(float value)
+cdef object encode_double(double value)
+cdef object encode_enum(object enum_type, int value, bint use_integers_for_enums)
+cdef string decode_string(object value) except *
+cdef string decode_bytes(object value) except *
+cdef bint decode_bool(object value) except -1
+cdef bint decode_bool_key(object value) except -1
+cdef double decode_double(object value) except? -1
+cdef float decode_float(object value) except? -1
+cdef object decode_integer(object value)
+cdef int decode_enum(object enum_type, object value) except? -1
+cdef object encode_well_known(
+    const CppMessage& message,
+    bint including_default_value_fields,
+    bint preserving_proto_field_name,
+    bint use_integers_for_enums,
+)
+cdef int decode_well_known(CppMessage* message, object value, bint ignore_unknown_fields) except -1
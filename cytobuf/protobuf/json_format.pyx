@@ -0,0 +1,197 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+"""Conversions between field values and their JSON representation.
+
+Generated `to_dict` and `from_dict` methods use these helpers so their output matches
+`google.protobuf.json_format.MessageToDict` and `ParseDict`.
+"""
+
+import json
+from binascii import a2b_base64
+from binascii import b2a_base64
+
+from libc.float cimport FLT_MAX
+from libc.math cimport INFINITY
+from libc.stdio cimport snprintf
+from libc.stdlib cimport strtod
+
+from cytobuf.protobuf.common cimport JsonParseOptions
+from cytobuf.protobuf.common cimport JsonPrintOptions
+from cytobuf.protobuf.common cimport JsonStringToMessage
+from cytobuf.protobuf.common cimport MessageToJsonString
+from cytobuf.protobuf.common cimport Status
+
+_URLSAFE_TO_STANDARD = bytes.maketrans(b"-_", b"+/")
+
+
+class ParseError(Exception):
+    pass
+
+
+class SerializeToJsonError(Exception):
+    pass
+
+
+cdef str encode_bytes(const string& value):
+    return b2a_base64(value, newline=False).decode("ascii")
+
+
+cdef object encode_float(float value):
+    """Returns the shortest double that rounds back to the 32-bit `value`."""
+    cdef char buffer[32]
+    cdef int precision
+    cdef double result
+    if value != value:
+        return "NaN"
+    if value == INFINITY:
+        return "Infinity"
+    if value == -INFINITY:
+        return "-Infinity"
+    for precision in range(6, 10):
+        snprintf(buffer, sizeof(buffer), "%.*g", precision, <double>value)
+        result = strtod(buffer, NULL)
+        if <float>result == value:
+            break
+    return result
+
+
+cdef object encode_double(double value):
+    if value != value:
+        return "NaN"
+    if value == INFINITY:
+        return "Infinity"
+    if value == -INFINITY:
+        return "-Infinity"
+    return value
+
+
+cdef object encode_enum(object enum_type, int value, bint use_integers_for_enums):
+    if use_integers_for_enums:
+        return value
+    member = enum_type._value2member_map_.get(value)
+    # Values missing from the enum definition are written as numbers, as protobuf does.
+    return value if member is None else member.name
+
+
+cdef string decode_string(object value) except *:
+    if not isinstance(value, str):
+        raise TypeError(f"str expected, got {type(value).__name__}")
+    return (<str>value).encode("utf-8")
+
+
+cdef string decode_bytes(object value) except *:
+    if isinstance(value, str):
+        value = (<str>value).encode("ascii")
+    if not isinstance(value, bytes):
+        raise TypeError(f"base64 str expected, got {type(value).__name__}")
+    value = (<bytes>value).translate(_URLSAFE_TO_STANDARD)
+    return a2b_base64(value + b"=" * (-len(value) % 4))
+
+
+cdef bint decode_bool(object value) except -1:
+    if value is True:
+        return True
+    if value is False:
+        return False
+    raise TypeError(f"bool expected, got {type(value).__name__}")
+
+
+cdef bint decode_bool_key(object value) except -1:
+    """Decodes a bool map key, which JSON objects can only spell as a string."""
+    if value == "true":
+        return True
+    if value == "false":
+        return False
+    raise ValueError(f'Expected "true" or "false", not {value}')
+
+
+cdef double decode_double(object value) except? -1:
+    if isinstance(value, bool):
+        raise TypeError("number expected, got bool")
+    if isinstance(value, (int, float)):
+        if value != value or value in (INFINITY, -INFINITY):
+            raise ValueError(f"Couldn't parse {value}, use its quoted name instead")
+        return value
+    if isinstance(value, str):
+        if value == "NaN":
+            return float("nan")
+        if value == "Infinity":
+            return INFINITY
+        if value == "-Infinity":
+            return -INFINITY
+        return float(value)
+    raise TypeError(f"number expected, got {type(value).__name__}")
+
+
+cdef float decode_float(object value) except? -1:
+    cdef double result = decode_double(value)
+    if result > FLT_MAX and result != INFINITY:
+        raise ValueError("Float value too large")
+    if result < -FLT_MAX and result != -INFINITY:
+        raise ValueError("Float value too small")
+    return <float>result
+
+
+cdef object decode_integer(object value):
+    if isinstance(value, bool):
+        raise TypeError("int expected, got bool")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"Couldn't parse integer: {value}")
+        return int(value)
+    if isinstance(value, str):
+        return int(value)
+    raise TypeError(f"int expected, got {type(value).__name__}")
+
+
+cdef int decode_enum(object enum_type, object value) except? -1:
+    if isinstance(value, str):
+        return enum_type[value].value
+    return decode_integer(value)
+
+
+cdef object encode_well_known(
+    const CppMessage& message,
+    bint including_default_value_fields,
+    bint preserving_proto_field_name,
+    bint use_integers_for_enums,
+):
+    """Converts a message of a well-known type such as `Timestamp` to its special JSON mapping.
+
+    The C++ library already implements those mappings, so the message is printed by it and the
+    document loaded back.
+    """
+    cdef JsonPrintOptions options = JsonPrintOptions()
+    cdef string result = string()
+    cdef Status status
+    options.add_whitespace = False
+    options.always_print_primitive_fields = including_default_value_fields
+    options.preserve_proto_field_names = preserving_proto_field_name
+    options.always_print_enums_as_ints = use_integers_for_enums
+    status = MessageToJsonString(message, &result, options)
+    if not status.ok():
+        raise SerializeToJsonError(status.ToString().decode("utf-8"))
+    return json.loads(result)
+
+
+cdef int decode_well_known(CppMessage* message, object value, bint ignore_unknown_fields) except -1:
+    """Replaces the contents of `message`, of a well-known type such as `Timestamp`, from `value`.
+
+    Those types have special JSON mappings, e.g. RFC 3339 strings for timestamps, which the C++
+    library already implements, so `value` is dumped back to JSON and parsed by it.
+    """
+    cdef JsonParseOptions options = JsonParseOptions()
+    cdef bytes data = json.dumps(value, allow_nan=False).encode("utf-8")
+    cdef Status status
+    options.ignore_unknown_fields = ignore_unknown_fields
+    status = JsonStringToMessage(data, message, options)
+    if not status.ok():
+        raise ParseError(status.ToString().decode("utf-8"))
+    return 0
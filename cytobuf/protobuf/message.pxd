@@ -5,12 +5,113 @@
 # distutils: library_dirs = /usr/local/lib
 # distutils: extra_compile_args= -std=c++11
 
+cimport cython
+from cpython.ref cimport PyObject
+from libc.stdint cimport uint8_t
+from libcpp.string cimport string
+from libcpp.unordered_map cimport unordered_map
+from libcpp.vector cimport vector
+
+from cytobuf.protobuf.arena cimport Arena
+from cytobuf.protobuf.common cimport Arena as CppArena
+from cytobuf.protobuf.common cimport Descriptor
 from cytobuf.protobuf.common cimport Message as CppMessage
+from cytobuf.protobuf.parallel cimport ParallelSerializer
+from cytobuf.protobuf.projection cimport ProjectionTree
+
+
+cdef class FieldMask:
+    cdef:
+        readonly tuple paths
+        const Descriptor* _descriptor
+        ProjectionTree _tree
+
+    cdef int _check_type(self, CppMessage* message) except -1
+
+
+cdef class ParseOptions:
+    cdef:
+        readonly int recursion_limit
+        readonly int total_bytes_limit
+        readonly bint partial
+        readonly bint discard_unknown_fields
+        readonly FieldMask field_mask
+        readonly bint lazy
+
+
+cdef class LazyFields:
+    cdef:
+        # The serialized occurrences of each deferred field, by field number.
+        unordered_map[int, string] fields
+        # The options the deferred fields are parsed with once they're accessed.
+        ParseOptions options
+
 
+
+cdef class Payloads:
+    cdef:
+        vector[Py_buffer] _views
+        size_t _acquired
+        vector[const char*] data
+        vector[int] sizes
+
+    cdef int _acquire_each(self, object messages) except -1
+    cdef int _acquire_slices(self, object data, object offsets) except -1
+
+
+cdef int parse_payloads(
+    vector[CppMessage*]& messages, Payloads payloads, ParseOptions options
+) except -1
+
+
+# Cython can't parse a pointer to a renamed type as a template argument.
+ctypedef CppMessage* CppMessagePointer
+ctypedef unordered_map[CppMessagePointer, PyObject*] ElementWrappers
+
+
+# Generated messages cache their sub-message wrappers and containers, which reference them back.
+# Those caches are all the garbage collector clears to break the cycles, so a wrapper still has
+# its parent and arena when it's deallocated.
+@cython.no_gc_clear
 cdef class Message:
     cdef:
         CppMessage* _internal
         bint _ptr_owner
+        Arena _arena
+        # The message whose storage this one is a view into, kept alive for as long as the view.
+        Message _parent
+        # The wrappers of this message's repeated and map elements that are referenced
+        # elsewhere, by element.  Allocated along with the first of them.
+        ElementWrappers* _elements
+        # Whether this wrapper is one of `_parent`'s `_elements`.
+        bint _is_element
+        # The sub-messages of a lazy parse that haven't been decoded yet, if any.
+        LazyFields _lazy
+
+    cdef void _reset_cache(self, bint preserve)
+    cdef void _detach_cached(self, Message cached, CppMessage* released)
+    cdef bint _has_cached_field(self, int number)
+    cdef int _check_exports(self) except -1
+    cdef Message _element(self, CppMessage* element)
+    cdef void _track_element(self, Message wrapper)
+    cdef void _detach_element(self, CppMessage* element, bint preserve)
+    cdef int _load_lazy_field(self, int number) except -1
+    cdef int _load_lazy_fields(self) except -1
+    cdef int _merge_from_json(self, object value, bint ignore_unknown_fields) except -1
+    cdef int _parse_from_buffer(self, object data, bint merge, ParseOptions options) except -1
+    cdef size_t _cached_byte_size(self) except? 0
+    cdef void _serialize_with_cached_sizes(self, uint8_t* target, size_t size)
+    cdef ParallelSerializer _parallel_serializer(self, int threads)
+    cdef string _to_json(
+        self,
+        bint including_default_value_fields,
+        bint preserving_proto_field_name,
+        bint use_integers_for_enums,
+    ) except *
+
+    cdef inline CppArena* _arena_pointer(self):
+        return self._arena._arena if self._arena is not None else NULL
 
     cdef inline str DebugString(self):
+        self._load_lazy_fields()
         return self._internal.DebugString().decode('utf-8')
\ No newline at end of file
@@ -5,56 +5,824 @@
 # distutils: library_dirs = /usr/local/lib
 # distutils: extra_compile_args= -std=c++11
 
+import json
+from pickle import PickleBuffer
 
+from cytobuf.protobuf.json_format import ParseError
+from cytobuf.protobuf.json_format import SerializeToJsonError
+
+cimport cython
+from cpython.buffer cimport PyBUF_SIMPLE
+from cpython.buffer cimport PyBUF_WRITABLE
+from cpython.buffer cimport PyBuffer_Release
+from cpython.buffer cimport PyObject_GetBuffer
+from cpython.bytes cimport PyBytes_AS_STRING
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from cython.operator cimport dereference
+from cython.operator cimport preincrement
+from libc.limits cimport INT_MAX
+from libc.stdint cimport uint8_t
 from libcpp.string cimport string
+from libcpp.vector cimport vector
 
-from cytobuf.protobuf.common cimport JsonParseOptions
+from cytobuf.protobuf.common cimport CodedInputStream
+from cytobuf.protobuf.common cimport FieldDescriptor
 from cytobuf.protobuf.common cimport JsonPrintOptions
-from cytobuf.protobuf.common cimport JsonStringToMessage
 from cytobuf.protobuf.common cimport MessageDifferencer
+from cytobuf.protobuf.common cimport Message as CppMessage
 from cytobuf.protobuf.common cimport MessageToJsonString
+from cytobuf.protobuf.common cimport Status
+from cytobuf.protobuf.parallel cimport prepare_parallel
+from cytobuf.protobuf.projection cimport KEEP_FIELD
+from cytobuf.protobuf.projection cimport project
+from cytobuf.protobuf.projection cimport split_fields
+from cytobuf.protobuf.repeated_field cimport acquire_elements
+
+# Payloads smaller than this are parsed and serialized while holding the GIL; releasing and
+# re-acquiring it costs more than the work itself for small messages.
+DEF NOGIL_THRESHOLD = 16 * 1024
+# The nesting depth CodedInputStream allows by default.
+DEF DEFAULT_RECURSION_LIMIT = 100
+
+# Print options for every combination of the ToJsonString flags, indexed by their bits.
+cdef JsonPrintOptions _json_print_options[8]
+cdef int _options
+for _options in range(8):
+    _json_print_options[_options].add_whitespace = False
+    _json_print_options[_options].always_print_primitive_fields = _options & 1
+    _json_print_options[_options].preserve_proto_field_names = _options & 2
+    _json_print_options[_options].always_print_enums_as_ints = _options & 4
+
+
+class DecodeError(Exception):
+    pass
+
+
+cdef class FieldMask:
+    """The fields of `message_type` named by `paths`, as in a `google.protobuf.FieldMask`.
+
+    Each path is a dot-separated list of field names, such as `"people.email"`, and selects
+    that field with all of its sub-fields.  Parsing with a mask in `ParseOptions` skips every
+    other field on the wire rather than decoding it, and `SerializeToString` can drop them from
+    its output.  Map fields can only be selected as a whole.
+    """
+
+    def __cinit__(self, message_type, paths):
+        cdef Message message = message_type()
+        cdef const Descriptor* descriptor
+        cdef const FieldDescriptor* field
+        cdef int node
+        self.paths = tuple(paths)
+        self._descriptor = message._internal.GetDescriptor()
+        self._tree.resize(1)
+        for path in self.paths:
+            node = 0
+            descriptor = self._descriptor
+            names = path.split(".")
+            for depth, name in enumerate(names):
+                if descriptor is NULL:
+                    raise ValueError(
+                        f"Invalid path {path!r}: {names[depth - 1]!r} isn't a message field"
+                    )
+                field = descriptor.FindFieldByName(name.encode("utf-8"))
+                if field is NULL:
+                    raise ValueError(
+                        f"Invalid path {path!r}: {descriptor.full_name().decode('utf-8')} "
+                        f"has no field {name!r}"
+                    )
+                if depth == len(names) - 1:
+                    self._tree[node][field.number()] = KEEP_FIELD
+                    break
+                if field.is_map():
+                    raise ValueError(
+                        f"Invalid path {path!r}: map fields can only be selected as a whole"
+                    )
+                if self._tree[node].count(field.number()) == 0:
+                    self._tree.resize(self._tree.size() + 1)
+                    self._tree[node][field.number()] = self._tree.size() - 1
+                elif self._tree[node][field.number()] == KEEP_FIELD:
+                    # An earlier path already selects the whole field.
+                    break
+                node = self._tree[node][field.number()]
+                descriptor = field.message_type()
+
+    def __repr__(self):
+        return f"FieldMask({self.paths!r})"
+
+    cdef int _check_type(self, CppMessage* message) except -1:
+        if message.GetDescriptor() is not self._descriptor:
+            raise TypeError(
+                f"Cannot use a FieldMask of {self._descriptor.full_name().decode('utf-8')} with "
+                f"{message.GetDescriptor().full_name().decode('utf-8')}"
+            )
+        return 0
+
+
+cdef class ParseOptions:
+    """Limits and behaviour for parsing serialized messages, e.g. from untrusted sources.
+
+    `recursion_limit` bounds how deeply sub-messages may be nested and `total_bytes_limit` how
+    many bytes may be read.  `partial` accepts messages that are missing required fields, and
+    `discard_unknown_fields` drops the fields this schema doesn't define once a payload has been
+    parsed, rather than keeping them in memory.  With a `field_mask`, only the fields it selects
+    are decoded.
+
+    `lazy` defers decoding the singular sub-message fields of the parsed message, outside of
+    oneofs, until their property is first accessed or the whole message is needed, e.g. to
+    serialize it.  Errors in a deferred sub-message are only raised at that point.
+    """
+
+    def __cinit__(
+        self,
+        int recursion_limit = DEFAULT_RECURSION_LIMIT,
+        int total_bytes_limit = INT_MAX,
+        bint partial = False,
+        bint discard_unknown_fields = False,
+        FieldMask field_mask = None,
+        bint lazy = False,
+    ):
+        if recursion_limit < 0:
+            raise ValueError("recursion_limit must not be negative")
+        if total_bytes_limit < 0:
+            raise ValueError("total_bytes_limit must not be negative")
+        self.recursion_limit = recursion_limit
+        self.total_bytes_limit = total_bytes_limit
+        self.partial = partial
+        self.discard_unknown_fields = discard_unknown_fields
+        self.field_mask = field_mask
+        self.lazy = lazy
+
+    def __repr__(self):
+        return (
+            f"ParseOptions(recursion_limit={self.recursion_limit}, "
+            f"total_bytes_limit={self.total_bytes_limit}, partial={self.partial}, "
+            f"discard_unknown_fields={self.discard_unknown_fields}, "
+            f"field_mask={self.field_mask!r}, lazy={self.lazy})"
+        )
+
+
+cdef ParseOptions _default_parse_options = ParseOptions()
+
+
+cdef class LazyFields:
+    """The serialized sub-messages a lazy parse has yet to decode into a message."""
+
+    def __cinit__(self, ParseOptions options not None):
+        # The deferred fields were already projected by any field mask.
+        self.options = ParseOptions(
+            options.recursion_limit,
+            options.total_bytes_limit,
+            options.partial,
+            options.discard_unknown_fields,
+        )
+
+
+cdef void _lazy_field_numbers(Message message, bint merge, vector[int]& numbers):
+    """Fills `numbers` with the fields of `message` a lazy parse defers."""
+    cdef const Descriptor* descriptor = message._internal.GetDescriptor()
+    cdef const FieldDescriptor* field
+    cdef int i
+    for i in range(descriptor.field_count()):
+        field = descriptor.field(i)
+        # A later member of a oneof must replace a deferred one, so oneofs are decoded eagerly.
+        # So are sub-messages merged into a cached wrapper, which must see the merged fields.
+        if (
+            field.message_type() is not NULL
+            and not field.is_repeated()
+            and field.containing_oneof() is NULL
+            and not (merge and message._has_cached_field(field.number()))
+        ):
+            numbers.push_back(field.number())
+
+
+cdef bint _parse_array(
+    CppMessage* message, const void* data, int size, bint merge, ParseOptions options
+) nogil except *:
+    cdef CodedInputStream* stream
+    cdef string projected
+    cdef bint success
+    if not merge:
+        message.Clear()
+    if options.field_mask is not None:
+        if size > options.total_bytes_limit or not project(
+            <const uint8_t*>data, size, options.field_mask._tree, options.recursion_limit,
+            &projected
+        ):
+            return False
+        data = projected.data()
+        size = projected.size()
+    stream = new CodedInputStream(<const uint8_t*>data, size)
+    try:
+        stream.SetRecursionLimit(options.recursion_limit)
+        stream.SetTotalBytesLimit(options.total_bytes_limit)
+        if options.partial:
+            success = message.MergePartialFromCodedStream(stream)
+        else:
+            success = message.MergeFromCodedStream(stream)
+        success = success and stream.ConsumedEntireMessage()
+    finally:
+        del stream
+    if success and options.discard_unknown_fields:
+        message.DiscardUnknownFields()
+    return success
+
+
+cdef bint _parse_lazy(
+    CppMessage* message,
+    const void* data,
+    int size,
+    bint merge,
+    ParseOptions options,
+    const vector[int]& numbers,
+    LazyFields lazy,
+) nogil except *:
+    """Parses `data` into `message`, except for the fields in `numbers` which go to `lazy`."""
+    cdef string projected
+    cdef string rest
+    if size > options.total_bytes_limit:
+        return False
+    if options.field_mask is not None:
+        if not project(
+            <const uint8_t*>data, size, options.field_mask._tree, options.recursion_limit,
+            &projected
+        ):
+            return False
+        data = projected.data()
+        size = projected.size()
+    if not split_fields(
+        <const uint8_t*>data, size, numbers, options.recursion_limit, &rest, &lazy.fields
+    ):
+        return False
+    return _parse_array(message, rest.data(), rest.size(), merge, lazy.options)
+
+
+cdef int _merge_deferred(CppMessage* message, const string& data, ParseOptions options) except -1:
+    cdef bint success
+    if data.size() < NOGIL_THRESHOLD:
+        success = _parse_array(message, data.data(), data.size(), True, options)
+    else:
+        with nogil:
+            success = _parse_array(message, data.data(), data.size(), True, options)
+    if not success:
+        raise DecodeError("Error parsing a lazily decoded sub-message")
+    return 0
+
+
+def _arrow_payloads(array):
+    """Returns the data and offsets of a pyarrow binary array, without importing pyarrow."""
+    cdef bint large = str(array.type) == "large_binary"
+    if not large and str(array.type) != "binary":
+        raise TypeError(f"Expected an array of binary messages, not {array.type}")
+    if array.null_count:
+        raise ValueError("Cannot parse null messages")
+    if not len(array):
+        return b"", memoryview(bytes(sizeof(long long))).cast("q")
+    _, offsets, data = array.buffers()
+    offsets = memoryview(offsets).cast("q" if large else "i")
+    return b"" if data is None else data, offsets[array.offset:array.offset + len(array) + 1]
+
+
+cdef class Payloads:
+    """The serialized messages of a batch, held as pointers into the buffers that contain them.
+
+    `messages` is either a sequence of buffer-protocol objects, a pyarrow binary array (or chunked
+    array) or, with `offsets`, a single buffer holding the messages back to back.  In the last case
+    message `i` is `messages[offsets[i]:offsets[i + 1]]`, with int32 or int64 offsets.
+    """
+
+    def __cinit__(self, messages, offsets = None):
+        if offsets is None and hasattr(messages, "combine_chunks"):
+            messages = messages.combine_chunks()
+        if offsets is None and hasattr(messages, "buffers"):
+            messages, offsets = _arrow_payloads(messages)
+        if offsets is None:
+            self._acquire_each(messages)
+        else:
+            self._acquire_slices(messages, offsets)
+
+    def __dealloc__(self):
+        cdef size_t i
+        for i in range(self._acquired):
+            PyBuffer_Release(&self._views[i])
+
+    def __len__(self):
+        return self.sizes.size()
+
+    cdef int _acquire_each(self, object messages) except -1:
+        cdef list items = messages if type(messages) is list else list(messages)
+        cdef Py_ssize_t count = len(items)
+        cdef Py_ssize_t i
+        self._views.resize(count)
+        self.data.reserve(count)
+        self.sizes.reserve(count)
+        for i in range(count):
+            PyObject_GetBuffer(items[i], &self._views[i], PyBUF_SIMPLE)
+            self._acquired += 1
+            if self._views[i].len > INT_MAX:
+                raise ValueError(f"Cannot parse a message larger than {INT_MAX} bytes")
+            self.data.push_back(<const char*>self._views[i].buf)
+            self.sizes.push_back(self._views[i].len)
+        return 0
+
+    cdef int _acquire_slices(self, object data, object offsets) except -1:
+        cdef Py_buffer offsets_view
+        cdef bint narrow = memoryview(offsets).itemsize == sizeof(int)
+        cdef Py_ssize_t count
+        cdef Py_ssize_t i
+        cdef long long start
+        cdef long long end
+        self._views.resize(1)
+        PyObject_GetBuffer(data, &self._views[0], PyBUF_SIMPLE)
+        self._acquired = 1
+        if narrow:
+            count = acquire_elements(offsets, &offsets_view, b"i", sizeof(int), 0)
+        else:
+            count = acquire_elements(offsets, &offsets_view, b"q", sizeof(long long), 0)
+        try:
+            if count < 1:
+                raise ValueError("offsets must hold one more value than there are messages")
+            self.data.reserve(count - 1)
+            self.sizes.reserve(count - 1)
+            for i in range(count - 1):
+                if narrow:
+                    start = (<const int*>offsets_view.buf)[i]
+                    end = (<const int*>offsets_view.buf)[i + 1]
+                else:
+                    start = (<const long long*>offsets_view.buf)[i]
+                    end = (<const long long*>offsets_view.buf)[i + 1]
+                if start < 0 or end < start or end > self._views[0].len:
+                    raise ValueError(f"Invalid offsets for the message at index {i}")
+                if end - start > INT_MAX:
+                    raise ValueError(f"Cannot parse a message larger than {INT_MAX} bytes")
+                self.data.push_back(<const char*>self._views[0].buf + start)
+                self.sizes.push_back(end - start)
+        finally:
+            PyBuffer_Release(&offsets_view)
+        return 0
+
+
+cdef Py_ssize_t _parse_all(
+    vector[CppMessage*]& messages, Payloads payloads, ParseOptions options
+) nogil except? -2:
+    """Parses each payload into messages[i], returning the index of the first failure or -1."""
+    cdef size_t i
+    cdef bint success
+    for i in range(messages.size()):
+        if options is None:
+            success = messages[i].ParseFromArray(payloads.data[i], payloads.sizes[i])
+        else:
+            success = _parse_array(messages[i], payloads.data[i], payloads.sizes[i], False, options)
+        if not success:
+            return i
+    return -1
+
+
+cdef int parse_payloads(
+    vector[CppMessage*]& messages, Payloads payloads, ParseOptions options
+) except -1:
+    """Parses each of `payloads` into the message at the same index of `messages`.
 
+    The GIL is released unless the batch is small.  Raises `DecodeError` with the index of the
+    first payload that fails to parse.
+    """
+    cdef Py_ssize_t failed
+    cdef size_t total_size = 0
+    cdef size_t i
+    if options is not None and options.lazy:
+        raise ValueError("Batches of messages can't be parsed lazily")
+    if options is not None and options.field_mask is not None and not messages.empty():
+        options.field_mask._check_type(messages[0])
+    for i in range(payloads.sizes.size()):
+        total_size += payloads.sizes[i]
+    if total_size < NOGIL_THRESHOLD:
+        failed = _parse_all(messages, payloads, options)
+    else:
+        with nogil:
+            failed = _parse_all(messages, payloads, options)
+    if failed >= 0:
+        raise DecodeError(f"Error parsing message at index {failed}")
+    return 0
 
+
+def _unpickle(message_type, data):
+    cdef Message message = message_type()
+    message._parse_from_buffer(data, False, None)
+    return message
+
+
+@cython.no_gc_clear
 cdef class Message:
 
-    def __cinit__(self, bint _init = True):
-        self._ptr_owner = _init
+    def __cinit__(self, bint _init = True, Arena arena = None):
+        # Messages allocated on an arena are freed by the arena, which we keep alive until
+        # this message is collected.
+        self._ptr_owner = _init and arena is None
+        if _init and arena is not None:
+            self._arena = arena
+            arena._message_count += 1
 
     def __dealloc__(self):
+        if self._is_element:
+            self._parent._elements.erase(self._internal)
+        if self._elements is not NULL:
+            del self._elements
         if self._internal is not NULL and self._ptr_owner is True:
             del self._internal
             self._internal = NULL
+        if self._arena is not None:
+            self._arena._message_count -= 1
+
+    cdef void _reset_cache(self, bint preserve):
+        """Detaches the wrappers of sub-messages and elements whose storage is about to be cleared.
+
+        With `preserve`, the storage is left with a copy of its contents, e.g. to be swapped into
+        another message.  Generated messages detach their cached sub-messages before calling this.
+        """
+        cdef vector[CppMessage*] elements
+        cdef unordered_map[CppMessagePointer, PyObject*].iterator it
+        cdef size_t i
+        if self._elements is NULL or self._elements.empty():
+            return
+        it = self._elements.begin()
+        while it != self._elements.end():
+            elements.push_back(dereference(it).first)
+            preincrement(it)
+        for i in range(elements.size()):
+            self._detach_element(elements[i], preserve)
+
+    cdef void _detach_cached(self, Message cached, CppMessage* released):
+        """Detaches `cached`, a sub-message wrapper this message is about to stop caching.
+
+        Off an arena the wrapper takes ownership of the `released` sub-message, so views that are
+        still referenced keep their contents once the field is cleared.  Arena storage outlives
+        the field anyway, and the arena is kept alive through the wrapper's parent.
+        """
+        if released is not NULL:
+            cached._internal = released
+            cached._ptr_owner = True
+            cached._parent = None
+
+    cdef bint _has_cached_field(self, int number):
+        """Returns whether the wrapper of the sub-message field `number` is cached."""
+        return False
+
+    cdef int _check_exports(self) except -1:
+        """Raises BufferError while a repeated numeric field has exported its data.
+
+        Those of wrapped sub-messages and elements count too, as modifying this message can
+        reallocate their storage.  Generated messages check their own fields before calling this.
+        """
+        cdef unordered_map[CppMessagePointer, PyObject*].iterator it
+        if self._elements is NULL:
+            return 0
+        it = self._elements.begin()
+        while it != self._elements.end():
+            (<Message>dereference(it).second)._check_exports()
+            preincrement(it)
+        return 0
+
+    cdef Message _element(self, CppMessage* element):
+        """Returns the tracked wrapper of a repeated or map `element` of this message, if any."""
+        cdef unordered_map[CppMessagePointer, PyObject*].iterator found
+        if self._elements is NULL:
+            return None
+        found = self._elements.find(element)
+        if found == self._elements.end():
+            return None
+        return <Message>dereference(found).second
+
+    cdef void _track_element(self, Message wrapper):
+        """Remembers `wrapper`, a view of one of this message's elements, until it's collected."""
+        if self._elements is NULL:
+            self._elements = new ElementWrappers()
+        dereference(self._elements)[wrapper._internal] = <PyObject*>wrapper
+        wrapper._is_element = True
+
+    cdef void _detach_element(self, CppMessage* element, bint preserve):
+        """Forgets the wrapper of `element`, which is about to be removed, cleared or moved.
+
+        Off an arena the wrapper takes the element's contents into a message of its own, as
+        `_detach_cached` does for sub-messages.  They're swapped rather than copied, so views into
+        the element stay valid, and copied back if the element is to be `preserve`d.  Arena storage
+        outlives the element anyway.
+        """
+        cdef Message wrapper = self._element(element)
+        if wrapper is None:
+            return
+        self._elements.erase(element)
+        wrapper._is_element = False
+        if element.GetArena() is NULL:
+            wrapper._internal = element.New(NULL)
+            element.GetReflection().Swap(element, wrapper._internal)
+            if preserve:
+                element.CopyFrom(wrapper._internal[0])
+            wrapper._ptr_owner = True
+            wrapper._parent = None
+
+    cdef int _load_lazy_field(self, int number) except -1:
+        """Decodes the sub-message field `number` if a lazy parse deferred it."""
+        cdef LazyFields lazy = self._lazy
+        cdef unordered_map[int, string].iterator field
+        if lazy is None:
+            return 0
+        field = lazy.fields.find(number)
+        if field == lazy.fields.end():
+            return 0
+        if lazy.fields.size() == 1:
+            self._lazy = None
+        try:
+            return _merge_deferred(self._internal, dereference(field).second, lazy.options)
+        finally:
+            lazy.fields.erase(field)
+
+    cdef int _load_lazy_fields(self) except -1:
+        """Decodes every sub-message a lazy parse deferred, before the whole message is used."""
+        cdef LazyFields lazy = self._lazy
+        cdef unordered_map[int, string].iterator field
+        cdef string data
+        if lazy is None:
+            return 0
+        self._lazy = None
+        field = lazy.fields.begin()
+        while field != lazy.fields.end():
+            data.append(dereference(field).second)
+            preincrement(field)
+        return _merge_deferred(self._internal, data, lazy.options)
+
+    cdef int _merge_from_json(self, object value, bint ignore_unknown_fields) except -1:
+        raise TypeError(f"{type(self).__name__} cannot be parsed from JSON")
+
+    cdef size_t _cached_byte_size(self) except? 0:
+        cdef size_t size
+        self._load_lazy_fields()
+        size = self._internal.ByteSizeLong()
+        if size > INT_MAX:
+            raise ValueError(f"Cannot serialize a message larger than {INT_MAX} bytes")
+        return size
+
+    cdef void _serialize_with_cached_sizes(self, uint8_t* target, size_t size):
+        if size < NOGIL_THRESHOLD:
+            self._internal.SerializeWithCachedSizesToArray(target)
+        else:
+            with nogil:
+                self._internal.SerializeWithCachedSizesToArray(target)
+
+    cdef ParallelSerializer _parallel_serializer(self, int threads):
+        """Sizes this message for `threads` threads, or returns None to serialize it on one."""
+        if threads < 1:
+            raise ValueError(f"threads must be at least 1, got {threads}")
+        if threads == 1:
+            return None
+        self._load_lazy_fields()
+        return prepare_parallel(self._internal, threads)
+
+    def ByteSize(self):
+        self._load_lazy_fields()
+        return self._internal.ByteSizeLong()
+
+    def SerializeToString(self, FieldMask field_mask = None, int threads = 1):
+        """Serializes this message, keeping only the fields selected by `field_mask` if given.
+
+        With more than one of `threads`, the elements of large repeated message fields are
+        sized and serialized on that many threads at once.
+        """
+        cdef ParallelSerializer serializer = self._parallel_serializer(threads)
+        cdef size_t size = (
+            self._cached_byte_size() if serializer is None else serializer.size
+        )
+        cdef bytes result = PyBytes_FromStringAndSize(NULL, size)
+        cdef const uint8_t* serialized = <const uint8_t*>PyBytes_AS_STRING(result)
+        cdef string projected
+        cdef bint success
+        if serializer is None:
+            self._serialize_with_cached_sizes(<uint8_t*>serialized, size)
+        else:
+            serializer.serialize(<uint8_t*>serialized)
+        if field_mask is None:
+            return result
+        field_mask._check_type(self._internal)
+        if size < NOGIL_THRESHOLD:
+            success = project(
+                serialized, size, field_mask._tree, DEFAULT_RECURSION_LIMIT, &projected
+            )
+        else:
+            with nogil:
+                success = project(
+                    serialized, size, field_mask._tree, DEFAULT_RECURSION_LIMIT, &projected
+                )
+        if not success:
+            raise ValueError(
+                f"Cannot project a message nested more than {DEFAULT_RECURSION_LIMIT} levels deep"
+            )
+        return PyBytes_FromStringAndSize(projected.data(), projected.size())
+
+    def SerializeInto(self, buffer, Py_ssize_t offset = 0, int threads = 1):
+        """Serializes this message into a writable buffer-protocol object starting at `offset`.
 
-    def SerializeToString(self):
+        `threads` is used as in `SerializeToString`.  Returns the number of bytes written.
+        """
+        cdef Py_buffer view
+        cdef ParallelSerializer serializer = self._parallel_serializer(threads)
+        cdef size_t size = (
+            self._cached_byte_size() if serializer is None else serializer.size
+        )
+        PyObject_GetBuffer(buffer, &view, PyBUF_SIMPLE | PyBUF_WRITABLE)
+        try:
+            if not 0 <= offset <= view.len:
+                raise IndexError(f"offset ({offset}) out of range")
+            if size > <size_t>(view.len - offset):
+                raise ValueError(
+                    f"Buffer too small: {size} bytes needed, {view.len - offset} available"
+                )
+            if serializer is None:
+                self._serialize_with_cached_sizes(<uint8_t*>view.buf + offset, size)
+            else:
+                serializer.serialize(<uint8_t*>view.buf + offset)
+        finally:
+            PyBuffer_Release(&view)
+        return size
+
+    def FromJsonString(self, data, bint ignore_unknown_fields = False):
+        """Replaces the contents of this message with the JSON document in `data`.
+
+        `data` may be a str or any buffer-protocol object holding UTF-8 encoded JSON.  The
+        document is decoded by `json.loads` and written straight into the message by the
+        generated `from_dict` code, rather than through the C++ type-resolver round trip.  Only
+        well-known types with special JSON mappings, such as `Timestamp`, are left to the C++
+        library.
+        """
+        if not isinstance(data, (str, bytes, bytearray)):
+            data = memoryview(data).tobytes()
+        try:
+            value = json.loads(data)
+        except ValueError as error:
+            raise ParseError(f"Failed to load JSON: {error}") from error
+        self.Clear()
+        self._merge_from_json(value, ignore_unknown_fields)
+
+    cdef string _to_json(
+            self,
+            bint including_default_value_fields,
+            bint preserving_proto_field_name,
+            bint use_integers_for_enums,
+    ) except *:
         cdef string result = string()
-        self._internal.SerializeToString(&result)
+        cdef int options = (
+            including_default_value_fields
+            | preserving_proto_field_name << 1
+            | use_integers_for_enums << 2
+        )
+        cdef Status status
+        self._load_lazy_fields()
+        status = MessageToJsonString(self._internal[0], &result, _json_print_options[options])
+        if not status.ok():
+            raise SerializeToJsonError(status.ToString().decode('utf-8'))
         return result
 
-    def FromJsonString(self, bytes data, bint ignore_unknown_fields = False):
-        cdef JsonParseOptions args = JsonParseOptions()
-        args.ignore_unknown_fields = ignore_unknown_fields
-        JsonStringToMessage(data, self._internal, args)
-
     def ToJsonString(
             self,
             bint including_default_value_fields = False,
             bint preserving_proto_field_name = False,
             bint use_integers_for_enums = False,
     ):
-        cdef string result = string()
-        cdef JsonPrintOptions args = JsonPrintOptions()
-        args.preserve_proto_field_names = preserving_proto_field_name
-        args.always_print_primitive_fields = including_default_value_fields
-        args.always_print_enums_as_ints = use_integers_for_enums
-        MessageToJsonString(self._internal[0], &result, args)
-        return result.decode('utf-8')
+        return self._to_json(
+            including_default_value_fields, preserving_proto_field_name, use_integers_for_enums
+        ).decode('utf-8')
+
+    def ToJsonBytes(
+            self,
+            bint including_default_value_fields = False,
+            bint preserving_proto_field_name = False,
+            bint use_integers_for_enums = False,
+    ):
+        """Like `ToJsonString`, but returns the UTF-8 encoded document without decoding it."""
+        return self._to_json(
+            including_default_value_fields, preserving_proto_field_name, use_integers_for_enums
+        )
 
-    def ParseFromString(self, bytes data):
-        self._internal.ParseFromString(data)
+    cdef int _parse_from_buffer(self, object data, bint merge, ParseOptions options) except -1:
+        cdef Py_buffer view
+        cdef bint success
+        cdef LazyFields lazy = None
+        cdef vector[int] numbers
+        # ParseFromArray is faster than a CodedInputStream, so it's used when nothing needs
+        # configuring.
+        cdef bint default_parse = options is None and not merge
+        if options is None:
+            options = _default_parse_options
+        elif options.field_mask is not None:
+            options.field_mask._check_type(self._internal)
+        self._check_exports()
+        if options.lazy and self._parent is not None:
+            # The deferred fields would be lost when the parent is serialized or copied.
+            raise ValueError("Only messages that own their storage can be parsed lazily")
+        if merge:
+            # Fields merged now must override the deferred ones parsed before them.
+            self._load_lazy_fields()
+        else:
+            self._lazy = None
+        if options.lazy:
+            lazy = LazyFields(options)
+            _lazy_field_numbers(self, merge, numbers)
+        PyObject_GetBuffer(data, &view, PyBUF_SIMPLE)
+        try:
+            if view.len > INT_MAX:
+                raise ValueError(f"Cannot parse a message larger than {INT_MAX} bytes")
+            if not merge:
+                self._reset_cache(False)
+            if view.len < NOGIL_THRESHOLD:
+                if default_parse:
+                    success = self._internal.ParseFromArray(view.buf, view.len)
+                elif lazy is not None:
+                    success = _parse_lazy(
+                        self._internal, view.buf, view.len, merge, options, numbers, lazy
+                    )
+                else:
+                    success = _parse_array(self._internal, view.buf, view.len, merge, options)
+            else:
+                with nogil:
+                    if default_parse:
+                        success = self._internal.ParseFromArray(view.buf, view.len)
+                    elif lazy is not None:
+                        success = _parse_lazy(
+                            self._internal, view.buf, view.len, merge, options, numbers, lazy
+                        )
+                    else:
+                        success = _parse_array(self._internal, view.buf, view.len, merge, options)
+        finally:
+            PyBuffer_Release(&view)
+        if not success:
+            raise DecodeError("Error parsing message")
+        if lazy is not None and not lazy.fields.empty():
+            self._lazy = lazy
+        return 0
+
+    def ParseFromString(self, bytes data, ParseOptions options = None):
+        """Replaces the contents of this message with the serialized message in `data`.
+
+        Raises `DecodeError` if `data` isn't a valid message or exceeds the limits of `options`.
+        """
+        self._parse_from_buffer(data, False, options)
+
+    def ParseFromBuffer(self, data, ParseOptions options = None):
+        """Parses this message from any contiguous buffer-protocol object without copying it."""
+        self._parse_from_buffer(data, False, options)
+
+    def MergeFromString(self, data, ParseOptions options = None):
+        """Merges a serialized message into this one, as `MergeFromBuffer` does."""
+        self._parse_from_buffer(data, True, options)
+
+    def MergeFromBuffer(self, data, ParseOptions options = None):
+        """Merges a serialized message held in a contiguous buffer-protocol object into this one."""
+        self._parse_from_buffer(data, True, options)
+
+    @classmethod
+    def parse_many(cls, buffers, Arena arena = None, ParseOptions options = None):
+        """Parses each serialized message in `buffers` into a new message of this type.
+
+        `buffers` is a sequence of buffer-protocol objects or a pyarrow binary array.  The
+        payloads are decoded back to back in C++ with the GIL released, optionally onto a shared
+        `arena` and with the limits of `options`.  Returns a list of messages in the same order
+        as `buffers`.
+        """
+        cdef Payloads payloads = Payloads(buffers)
+        cdef list messages = []
+        cdef vector[CppMessage*] targets
+        cdef size_t i
+        cdef Message message
+        targets.reserve(payloads.sizes.size())
+        for i in range(payloads.sizes.size()):
+            message = cls() if arena is None else cls(arena=arena)
+            messages.append(message)
+            targets.push_back(message._internal)
+        parse_payloads(targets, payloads, options)
+        return messages
 
     def Clear(self):
+        self._check_exports()
+        self._reset_cache(False)
+        self._lazy = None
         self._internal.Clear()
 
+    def __reduce__(self):
+        return _unpickle, (type(self), self.SerializeToString())
+
+    def __reduce_ex__(self, protocol):
+        if protocol < 5:
+            return self.__reduce__()
+        # Protocol 5 hands the serialized message to a buffer_callback as an out-of-band
+        # buffer instead of copying it into the pickle stream.
+        return _unpickle, (type(self), PickleBuffer(self.SerializeToString()))
+
+    def __copy__(self):
+        cdef Message result = type(self)()
+        self._load_lazy_fields()
+        result._internal.CopyFrom(self._internal[0])
+        return result
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
     def __repr__(self):
         return self.DebugString()
 
@@ -66,5 +834,7 @@ cdef class Message:
         cdef Message _other_message
         if isinstance(other, Message):
             _other_message = <Message> other
+            self._load_lazy_fields()
+            _other_message._load_lazy_fields()
             return differencer.Equals(self._internal[0], _other_message._internal[0])
         return False
\ No newline at end of file
@@ -0,0 +1,41 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from libc.stdint cimport uint32_t
+from libc.stdint cimport uint8_t
+from libcpp.string cimport string
+from libcpp.vector cimport vector
+
+from cytobuf.protobuf.common cimport Message
+from cytobuf.protobuf.repeated_field cimport RepeatedPtrField
+
+
+cdef struct Chunk:
+    # Elements [start, end) of the repeated message field `field` of a message, whose tag is
+    # `tag`.  They serialize to `size` bytes, written at `target`.
+    const RepeatedPtrField[Message]* elements
+    size_t field
+    uint32_t tag
+    int start
+    int end
+    size_t size
+    uint8_t* target
+
+
+cdef class ParallelSerializer:
+    cdef:
+        # The chunks each thread sizes and serializes, in the order they're written.
+        vector[vector[Chunk]] _work
+        # The rest of the message, and the offset in it where each split field is written.
+        string _rest
+        vector[size_t] _offsets
+        readonly size_t size
+
+    cdef int serialize(self, uint8_t* target) except -1
+
+
+cdef ParallelSerializer prepare_parallel(Message* message, int threads)
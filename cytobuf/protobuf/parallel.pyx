@@ -0,0 +1,203 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11 -pthread
+# distutils: extra_link_args= -pthread
+
+from cython.operator cimport dereference
+from libc.limits cimport INT_MAX
+from libc.string cimport memcpy
+
+from cytobuf.protobuf.common cimport ArrayOutputStream
+from cytobuf.protobuf.common cimport CodedOutputStream
+from cytobuf.protobuf.common cimport FieldDescriptor
+from cytobuf.protobuf.common cimport Reflection
+from cytobuf.protobuf.common cimport WireFormat
+from cytobuf.protobuf.projection cimport field_offsets
+
+# Messages whose repeated message fields hold fewer elements than this in total are serialized
+# on a single thread; starting threads costs more than they save.
+DEF PARALLEL_THRESHOLD = 4096
+# The nesting depth CodedInputStream allows by default.
+DEF DEFAULT_RECURSION_LIMIT = 100
+DEF WIRETYPE_LENGTH_DELIMITED = 2
+
+
+cdef extern from "<thread>" namespace "std" nogil:
+    cdef cppclass thread:
+        thread(void (*function)(vector[Chunk]*) nogil, vector[Chunk]* chunks) except +
+        void join()
+
+
+cdef void _size_chunks(vector[Chunk]* chunks) nogil:
+    cdef Chunk* chunk
+    cdef size_t size
+    cdef size_t i
+    cdef int index
+    for i in range(chunks.size()):
+        chunk = &dereference(chunks)[i]
+        chunk.size = 0
+        for index in range(chunk.start, chunk.end):
+            size = chunk.elements.Get(index).ByteSizeLong()
+            chunk.size += (
+                CodedOutputStream.VarintSize32(chunk.tag)
+                + CodedOutputStream.VarintSize32(size)
+                + size
+            )
+
+
+cdef void _serialize_chunks(vector[Chunk]* chunks) nogil:
+    cdef Chunk* chunk
+    cdef const Message* element
+    cdef ArrayOutputStream* stream
+    cdef CodedOutputStream* output
+    cdef size_t i
+    cdef int index
+    for i in range(chunks.size()):
+        chunk = &dereference(chunks)[i]
+        # One stream per chunk, as setting up a stream per element costs as much as writing it.
+        stream = new ArrayOutputStream(chunk.target, chunk.size)
+        output = new CodedOutputStream(stream)
+        for index in range(chunk.start, chunk.end):
+            element = &chunk.elements.Get(index)
+            output.WriteVarint32(chunk.tag)
+            output.WriteVarint32(element.GetCachedSize())
+            element.SerializeWithCachedSizes(output)
+        del output
+        del stream
+
+
+cdef int _run(vector[vector[Chunk]]& work, void (*function)(vector[Chunk]*) nogil) except -1:
+    """Calls `function` with each thread's chunks, the first on this thread."""
+    cdef vector[thread*] workers
+    cdef size_t i
+    for i in range(1, work.size()):
+        if work[i].empty():
+            continue
+        try:
+            workers.push_back(new thread(function, &work[i]))
+        except RuntimeError:
+            # No more threads can be started, so this one takes on their chunks.
+            function(&work[i])
+    with nogil:
+        function(&work[0])
+        for i in range(workers.size()):
+            workers[i].join()
+            del workers[i]
+    return 0
+
+
+cdef inline bint _is_split(const FieldDescriptor* field):
+    return field.is_repeated() and field.message_type() is not NULL and not field.is_map()
+
+
+cdef class ParallelSerializer:
+    """Serializes a message with the elements of its repeated message fields split by thread.
+
+    The elements are sized on the threads too, while the rest of the message is sized and
+    serialized on the calling thread; together these cache the message's sizes like
+    `ByteSizeLong`.  The output is the same as serializing the message on one thread.
+    """
+
+    cdef int serialize(self, uint8_t* target) except -1:
+        """Writes the message to `target`, which must hold `size` bytes."""
+        cdef Chunk* chunk
+        cdef size_t position = 0
+        cdef size_t previous = 0
+        cdef size_t i
+        cdef size_t j
+        # The chunks of all threads in order, with the rest of the message around each field.
+        for i in range(self._work.size()):
+            for j in range(self._work[i].size()):
+                chunk = &self._work[i][j]
+                if chunk.start == 0:
+                    memcpy(
+                        target + position,
+                        self._rest.data() + previous,
+                        self._offsets[chunk.field] - previous,
+                    )
+                    position += self._offsets[chunk.field] - previous
+                    previous = self._offsets[chunk.field]
+                chunk.target = target + position
+                position += chunk.size
+        memcpy(target + position, self._rest.data() + previous, self._rest.size() - previous)
+        return _run(self._work, _serialize_chunks)
+
+
+cdef ParallelSerializer prepare_parallel(Message* message, int threads):
+    """Sizes `message` to be serialized on `threads` threads.
+
+    Returns None if the message has too few repeated message elements to be worth splitting.
+    """
+    cdef const Reflection* reflection = message.GetReflection()
+    cdef ParallelSerializer serializer
+    cdef vector[const FieldDescriptor*] listed
+    cdef vector[const FieldDescriptor*] fields
+    cdef vector[const FieldDescriptor*] others
+    cdef vector[int] numbers
+    cdef Message* rest_message
+    cdef Chunk chunk
+    cdef size_t known_size
+    cdef size_t i
+    cdef size_t j
+    cdef int total = 0
+    cdef int share
+    cdef int taken = 0
+    cdef int worker = 0
+    reflection.ListFields(message[0], &listed)
+    for i in range(listed.size()):
+        if _is_split(listed[i]):
+            fields.push_back(listed[i])
+            numbers.push_back(listed[i].number())
+            total += reflection.GetRepeatedPtrField[Message](message[0], listed[i]).size()
+        else:
+            others.push_back(listed[i])
+    if threads < 2 or total < PARALLEL_THRESHOLD:
+        return None
+    serializer = ParallelSerializer.__new__(ParallelSerializer)
+    serializer._work.resize(threads)
+    # Each thread gets an equal share of the elements, in as few chunks as possible.
+    share = (total + threads - 1) // threads
+    for i in range(fields.size()):
+        chunk.elements = &reflection.GetRepeatedPtrField[Message](message[0], fields[i])
+        chunk.field = i
+        chunk.tag = <uint32_t>numbers[i] << 3 | WIRETYPE_LENGTH_DELIMITED
+        chunk.start = 0
+        while chunk.start < chunk.elements.size():
+            chunk.end = min(chunk.elements.size(), chunk.start + share - taken)
+            serializer._work[worker].push_back(chunk)
+            taken += chunk.end - chunk.start
+            if taken == share:
+                worker += 1
+                taken = 0
+            chunk.start = chunk.end
+    _run(serializer._work, _size_chunks)
+    # The other fields are moved to a message of their own, on the same arena so they're
+    # swapped rather than copied, and serialized on this thread.
+    rest_message = message.New(message.GetArena())
+    reflection.SwapFields(message, rest_message, others)
+    reflection.MutableUnknownFields(message).Swap(reflection.MutableUnknownFields(rest_message))
+    serializer._rest.resize(rest_message.ByteSizeLong())
+    rest_message.SerializeWithCachedSizesToArray(<uint8_t*>&serializer._rest[0])
+    # C++ writes unknown fields after the known ones, whatever their numbers.
+    known_size = serializer._rest.size() - WireFormat.ComputeUnknownFieldsSize(
+        reflection.GetUnknownFields(rest_message[0])
+    )
+    reflection.SwapFields(message, rest_message, others)
+    reflection.MutableUnknownFields(message).Swap(reflection.MutableUnknownFields(rest_message))
+    if message.GetArena() is NULL:
+        del rest_message
+    if not field_offsets(
+        <const uint8_t*>serializer._rest.data(), known_size, numbers, DEFAULT_RECURSION_LIMIT,
+        &serializer._offsets
+    ):
+        return None
+    serializer.size = serializer._rest.size()
+    for i in range(serializer._work.size()):
+        for j in range(serializer._work[i].size()):
+            serializer.size += serializer._work[i][j].size
+    if serializer.size > INT_MAX:
+        raise ValueError(f"Cannot serialize a message larger than {INT_MAX} bytes")
+    return serializer
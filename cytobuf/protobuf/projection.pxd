@@ -0,0 +1,36 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from libc.stdint cimport uint8_t
+from libcpp.string cimport string
+from libcpp.unordered_map cimport unordered_map
+from libcpp.vector cimport vector
+
+# A projection is a tree of the field numbers to keep.  Node `i` maps each kept field number
+# of its message to the node of the sub-message's fields, or to KEEP_FIELD to keep all of them.
+ctypedef vector[unordered_map[int, int]] ProjectionTree
+
+cdef enum:
+    KEEP_FIELD = -1
+
+
+cdef bint project(
+    const uint8_t* data, size_t size, ProjectionTree& tree, int recursion_limit,
+    string* output
+) nogil
+
+
+cdef bint split_fields(
+    const uint8_t* data, size_t size, const vector[int]& numbers, int recursion_limit,
+    string* rest, unordered_map[int, string]* fields
+) nogil
+
+
+cdef bint field_offsets(
+    const uint8_t* data, size_t size, const vector[int]& numbers, int recursion_limit,
+    vector[size_t]* offsets
+) nogil
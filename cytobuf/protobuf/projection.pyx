@@ -0,0 +1,188 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from cython.operator cimport dereference
+from libc.stdint cimport uint64_t
+
+# Wire types, from google/protobuf/wire_format_lite.h.
+DEF WIRETYPE_VARINT = 0
+DEF WIRETYPE_FIXED64 = 1
+DEF WIRETYPE_LENGTH_DELIMITED = 2
+DEF WIRETYPE_START_GROUP = 3
+DEF WIRETYPE_END_GROUP = 4
+DEF WIRETYPE_FIXED32 = 5
+
+
+cdef inline bint _read_varint(const uint8_t** position, const uint8_t* end, uint64_t* value) nogil:
+    cdef uint64_t result = 0
+    cdef int shift = 0
+    cdef uint8_t byte
+    while position[0] < end and shift < 64:
+        byte = position[0][0]
+        position[0] += 1
+        result |= <uint64_t>(byte & 0x7F) << shift
+        if not byte & 0x80:
+            value[0] = result
+            return True
+        shift += 7
+    return False
+
+
+cdef inline void _write_varint(string* output, uint64_t value) nogil:
+    while value >= 0x80:
+        output.push_back(<char>((value & 0x7F) | 0x80))
+        value >>= 7
+    output.push_back(<char>value)
+
+
+cdef bint _skip_value(
+    const uint8_t** position, const uint8_t* end, uint64_t tag, int depth
+) nogil:
+    """Moves `position` past the value of the field `tag` introduces, validating its bounds."""
+    cdef uint64_t value
+    cdef int wire_type = tag & 7
+    if wire_type == WIRETYPE_VARINT:
+        return _read_varint(position, end, &value)
+    if wire_type == WIRETYPE_FIXED64:
+        value = 8
+    elif wire_type == WIRETYPE_FIXED32:
+        value = 4
+    elif wire_type == WIRETYPE_LENGTH_DELIMITED:
+        if not _read_varint(position, end, &value):
+            return False
+    elif wire_type == WIRETYPE_START_GROUP:
+        if depth <= 0:
+            return False
+        while _read_varint(position, end, &value):
+            if value & 7 == WIRETYPE_END_GROUP:
+                return value >> 3 == tag >> 3
+            if not _skip_value(position, end, value, depth - 1):
+                return False
+        return False
+    else:
+        return False
+    if value > <uint64_t>(end - position[0]):
+        return False
+    position[0] += value
+    return True
+
+
+cdef bint _project(
+    const uint8_t* data, size_t size, ProjectionTree& tree, int node, int depth,
+    string* output
+) nogil:
+    cdef const uint8_t* position = data
+    cdef const uint8_t* end = data + size
+    cdef const uint8_t* start
+    cdef uint64_t tag
+    cdef uint64_t length
+    cdef unordered_map[int, int].iterator field
+    cdef string payload
+    while position < end:
+        start = position
+        if not _read_varint(&position, end, &tag) or tag >> 3 == 0 or tag >> 3 > 0x1FFFFFFF:
+            return False
+        field = tree[node].find(<int>(tag >> 3))
+        if (
+            field == tree[node].end()
+            or dereference(field).second == KEEP_FIELD
+            or tag & 7 != WIRETYPE_LENGTH_DELIMITED
+        ):
+            if not _skip_value(&position, end, tag, depth):
+                return False
+            if field != tree[node].end():
+                output.append(<const char*>start, position - start)
+            continue
+        # A sub-message with a projection of its own, which is rewritten with its new length.
+        if depth <= 0:
+            return False
+        if not _read_varint(&position, end, &length) or length > <uint64_t>(end - position):
+            return False
+        payload.clear()
+        if not _project(position, length, tree, dereference(field).second, depth - 1, &payload):
+            return False
+        _write_varint(output, tag)
+        _write_varint(output, payload.size())
+        output.append(payload)
+        position += length
+    return True
+
+
+cdef bint project(
+    const uint8_t* data, size_t size, ProjectionTree& tree, int recursion_limit,
+    string* output
+) nogil:
+    """Appends the fields of the serialized message in `data` that `tree` keeps to `output`.
+
+    Fields the projection drops are skipped without being decoded; only their tags and lengths
+    are read.  Returns false if `data` is malformed or nests deeper than `recursion_limit`.
+    """
+    return _project(data, size, tree, 0, recursion_limit, output)
+
+
+cdef bint split_fields(
+    const uint8_t* data, size_t size, const vector[int]& numbers, int recursion_limit,
+    string* rest, unordered_map[int, string]* fields
+) nogil:
+    """Moves the length-delimited fields of `data` numbered in `numbers` into `fields`.
+
+    The serialized fields of each number are appended to its entry of `fields` in the order
+    they appear, and every other field to `rest`.  Returns false if `data` is malformed.
+    """
+    cdef const uint8_t* position = data
+    cdef const uint8_t* end = data + size
+    cdef const uint8_t* start
+    cdef uint64_t tag
+    cdef size_t i
+    cdef bint selected
+    while position < end:
+        start = position
+        if not _read_varint(&position, end, &tag) or tag >> 3 == 0 or tag >> 3 > 0x1FFFFFFF:
+            return False
+        if not _skip_value(&position, end, tag, recursion_limit):
+            return False
+        selected = False
+        if tag & 7 == WIRETYPE_LENGTH_DELIMITED:
+            for i in range(numbers.size()):
+                if numbers[i] == <int>(tag >> 3):
+                    selected = True
+                    break
+        if selected:
+            dereference(fields)[<int>(tag >> 3)].append(<const char*>start, position - start)
+        else:
+            rest.append(<const char*>start, position - start)
+    return True
+
+
+cdef bint field_offsets(
+    const uint8_t* data, size_t size, const vector[int]& numbers, int recursion_limit,
+    vector[size_t]* offsets
+) nogil:
+    """Finds where fields numbered `numbers` belong among the fields of `data`.
+
+    Both `numbers` and the fields of `data` must be in ascending order, which is how C++ writes
+    known fields.  The offset of the first field of `data` numbered above each of `numbers` is
+    appended to `offsets`.  Returns false if `data` is malformed.
+    """
+    cdef const uint8_t* position = data
+    cdef const uint8_t* end = data + size
+    cdef const uint8_t* start
+    cdef uint64_t tag
+    cdef size_t i = 0
+    while position < end and i < numbers.size():
+        start = position
+        if not _read_varint(&position, end, &tag) or tag >> 3 == 0:
+            return False
+        while i < numbers.size() and tag >> 3 > <uint64_t>numbers[i]:
+            offsets.push_back(start - data)
+            i += 1
+        if not _skip_value(&position, end, tag, recursion_limit):
+            return False
+    while i < numbers.size():
+        offsets.push_back(size)
+        i += 1
+    return True
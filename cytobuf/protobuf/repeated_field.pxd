@@ -10,15 +10,37 @@ cdef extern from "google/protobuf/repeated_field.h" namespace "google::protobuf"
         Element& at(int index)
         void Set(int index, const Element& value)
         void Add(const Element& value)
+        int Capacity() const
+        void Reserve(int new_size)
+        Element* AddNAlreadyReserved(int elements)
+        Element* mutable_data()
+        const Element* data() const
+        void Clear()
+        void SwapElements(int index1, int index2)
+        void ExtractSubrange(int start, int num, Element* elements)
+        void Swap(RepeatedField* other)
 
     cdef cppclass RepeatedPtrField[Element]:
         RepeatedPtrField()
         RepeatedPtrField& operator=(const RepeatedPtrField&)
         bint empty() const
-        int size() const
-        const Element& Get(int) const
+        int size() nogil const
+        const Element& Get(int) nogil const
         Element* Mutable(int)
         Element& operator[](int index)
         Element& at(int index)
         void Set(int index, const Element& value)
-        void Add(const Element& value)
\ No newline at end of file
+        void Add(const Element& value)
+        int Capacity() const
+        void Reserve(int new_size)
+        void Clear()
+        void SwapElements(int index1, int index2)
+        void DeleteSubrange(int start, int num)
+        Element* ReleaseLast()
+        void RemoveLast()
+        void Swap(RepeatedPtrField* other)
+
+
+cdef Py_ssize_t acquire_elements(
+    object data, Py_buffer* view, const char* element_format, Py_ssize_t itemsize, int size
+) except -1
@@ -3,4 +3,43 @@
 # distutils: libraries = protobuf
 # distutils: include_dirs = /usr/local/include
 # distutils: library_dirs = /usr/local/lib
-# distutils: extra_compile_args= -std=c++11
\ No newline at end of file
+# distutils: extra_compile_args= -std=c++11
+from cpython.buffer cimport PyBUF_C_CONTIGUOUS
+from cpython.buffer cimport PyBUF_FORMAT
+from cpython.buffer cimport PyBuffer_Release
+from cpython.buffer cimport PyObject_GetBuffer
+from libc.limits cimport INT_MAX
+
+_FORMAT_KINDS = ("bhilqn", "BHILQN", "efd", "?")
+
+
+cdef str _format_kind(str element_format):
+    if element_format[:1] in ("@", "="):
+        element_format = element_format[1:]
+    if len(element_format) == 1:
+        for kind in _FORMAT_KINDS:
+            if element_format in kind:
+                return kind
+    return None
+
+
+cdef Py_ssize_t acquire_elements(
+    object data, Py_buffer* view, const char* element_format, Py_ssize_t itemsize, int size
+) except -1:
+    """Acquires a contiguous buffer of `data` to be appended to a repeated field.
+
+    The buffer must hold elements of the same kind and size as `element_format`.  On success
+    returns the number of elements in the buffer and the caller must release `view`.
+    """
+    PyObject_GetBuffer(data, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT)
+    buffer_format = "B" if view.format == NULL else view.format.decode("ascii")
+    expected_format = element_format.decode("ascii")
+    if view.itemsize != itemsize or _format_kind(buffer_format) != _format_kind(expected_format):
+        PyBuffer_Release(view)
+        raise ValueError(
+            f"Buffer with format '{buffer_format}' cannot be converted to '{expected_format}'"
+        )
+    if view.len // itemsize > INT_MAX - size:
+        PyBuffer_Release(view)
+        raise OverflowError("Buffer is too large for a repeated field")
+    return view.len // itemsize
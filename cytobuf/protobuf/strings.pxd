@@ -0,0 +1,25 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from cpython.ref cimport PyObject
+from cpython.unicode cimport PyUnicode_DecodeUTF8
+from libcpp.string cimport string
+from libcpp.unordered_map cimport unordered_map
+
+
+cdef inline str decode_utf8(const string& value):
+    # Decodes straight from the C++ buffer rather than through an intermediate bytes object.
+    return PyUnicode_DecodeUTF8(<char*>value.data(), value.size(), NULL)
+
+
+cdef class StringCache:
+    cdef:
+        unordered_map[string, PyObject*] _values
+        size_t _max_size
+        size_t _max_length
+
+    cdef str decode(self, const string& value)
@@ -0,0 +1,53 @@
+# cython: language_level=3
+# distutils: language = c++
+# distutils: libraries = protobuf
+# distutils: include_dirs = /usr/local/include
+# distutils: library_dirs = /usr/local/lib
+# distutils: extra_compile_args= -std=c++11
+
+from cpython.ref cimport Py_DECREF
+from cpython.ref cimport Py_INCREF
+from cython.operator cimport dereference
+from cython.operator cimport preincrement
+
+
+cdef class StringCache:
+    """Maps encoded string field values to the `str` objects previously decoded from them.
+
+    Generated code keeps one cache per field selected with the `--cache_strings` plugin
+    option, so repeated reads of the same few values return a shared `str` instead of
+    decoding a new one each time.  Once `max_size` distinct values have been cached, further
+    values are decoded without being cached; values longer than `max_length` bytes are never
+    cached.
+    """
+
+    def __cinit__(self, size_t max_size = 4096, size_t max_length = 256):
+        self._max_size = max_size
+        self._max_length = max_length
+
+    def __dealloc__(self):
+        self.clear()
+
+    cdef str decode(self, const string& value):
+        cdef unordered_map[string, PyObject*].iterator it
+        cdef str result
+        if value.size() > self._max_length:
+            return decode_utf8(value)
+        it = self._values.find(value)
+        if it != self._values.end():
+            return <str>dereference(it).second
+        result = decode_utf8(value)
+        if self._values.size() < self._max_size:
+            Py_INCREF(result)
+            self._values[value] = <PyObject*>result
+        return result
+
+    def clear(self):
+        cdef unordered_map[string, PyObject*].iterator it = self._values.begin()
+        while it != self._values.end():
+            Py_DECREF(<object>dereference(it).second)
+            preincrement(it)
+        self._values.clear()
+
+    def __len__(self):
+        return self._values.size()
@@ -7,6 +7,7 @@ from typing import Set
 from google.protobuf.compiler import plugin_pb2
 
 from cytobuf.protoc_gen_cython.constants import DEFAULT_INCLUDE_DIRECTORY
+from cytobuf.protoc_gen_cython.cython_file import GeneratorOptions
 from cytobuf.protoc_gen_cython.cython_file import Module
 from cytobuf.protoc_gen_cython.cython_file import ProtoFile
 from cytobuf.protoc_gen_cython.templates import merged_pyx_template
@@ -72,14 +73,30 @@ def register_modules(filename: str, modules: Set[str]) -> None:
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--prefix", type=str, default="")
+    parser.add_argument(
+        "--cache_strings",
+        type=str,
+        default="",
+        help="Comma-separated patterns of string fields (e.g. `package.Message.field` or "
+        "`package.Message.*`) whose decoded values are cached and shared between reads",
+    )
+    parser.add_argument(
+        "--raw_enums",
+        action="store_true",
+        help="Return enum fields as plain ints instead of members of their IntEnum",
+    )
     data = sys.stdin.buffer.read()
     request = plugin_pb2.CodeGeneratorRequest()
     request.ParseFromString(data)
     args = parser.parse_args(request.parameter.split())
 
     response = plugin_pb2.CodeGeneratorResponse()
+    options = GeneratorOptions(
+        cache_strings=[pattern for pattern in args.cache_strings.split(",") if pattern],
+        raw_enums=args.raw_enums,
+    )
     cython_files = ProtoFile.from_file_descriptor_protos(
-        request.proto_file, set(request.file_to_generate), args.prefix
+        request.proto_file, set(request.file_to_generate), args.prefix, options
     )
     write_module(cython_files, response)
     sys.stdout.buffer.write(response.SerializeToString())
@@ -27,6 +27,49 @@ UNSIGNED_TYPES = {
     FieldDescriptorProto.TYPE_FIXED64,
 }
 
+# Repeated numeric fields are exposed through the buffer protocol.  Maps the cython type of
+# such a field to the element type of its `RepeatedField` storage and its struct format.
+REPEATED_BUFFER_TYPES = {
+    "int": ("int32_t", "i"),
+    "unsigned int": ("uint32_t", "I"),
+    "long long": ("int64_t", "q"),
+    "unsigned long long": ("uint64_t", "Q"),
+    "float": ("float", "f"),
+    "double": ("double", "d"),
+    "bint": ("cpp_bool", "?"),
+}
+
+# Numeric fields are exported by `to_columns` as memoryviews of these C types and struct formats.
+COLUMN_TYPES = {
+    "int": ("int", "i"),
+    "unsigned int": ("unsigned int", "I"),
+    "long long": ("long long", "q"),
+    "unsigned long long": ("unsigned long long", "Q"),
+    "float": ("float", "f"),
+    "double": ("double", "d"),
+    "bint": ("unsigned char", "?"),
+}
+
+# JSON conversion kinds of the scalar cython types that aren't 32-bit integers.
+SCALAR_VALUE_KINDS = {
+    "bint": "bool",
+    "float": "float",
+    "double": "double",
+    "long long": "int64",
+    "unsigned long long": "int64",
+}
+
+# The files defining the well-known types with special JSON mappings, e.g. `Timestamp` to an
+# RFC 3339 string.  Generated dict conversions leave those types to the C++ JSON library.
+WELL_KNOWN_TYPE_FILES = {
+    "google/protobuf/any.proto",
+    "google/protobuf/duration.proto",
+    "google/protobuf/field_mask.proto",
+    "google/protobuf/struct.proto",
+    "google/protobuf/timestamp.proto",
+    "google/protobuf/wrappers.proto",
+}
+
 
 CPP_KEYWORDS = {
     "NULL",
@@ -5,6 +5,7 @@ import os
 import re
 from enum import auto
 from enum import Enum
+from fnmatch import fnmatchcase
 from itertools import chain
 from typing import Any
 from typing import Dict
@@ -12,17 +13,23 @@ from typing import Iterable
 from typing import List
 from typing import NamedTuple
 from typing import Optional
+from typing import Sequence
 from typing import Set
+from typing import Tuple
 
 from google.protobuf.descriptor_pb2 import DescriptorProto
 from google.protobuf.descriptor_pb2 import EnumDescriptorProto
 from google.protobuf.descriptor_pb2 import FieldDescriptorProto
 from google.protobuf.descriptor_pb2 import FileDescriptorProto
 
+from cytobuf.protoc_gen_cython.constants import COLUMN_TYPES
 from cytobuf.protoc_gen_cython.constants import CPP_KEYWORDS
 from cytobuf.protoc_gen_cython.constants import INT_TYPES
 from cytobuf.protoc_gen_cython.constants import LONG_TYPES
+from cytobuf.protoc_gen_cython.constants import REPEATED_BUFFER_TYPES
+from cytobuf.protoc_gen_cython.constants import SCALAR_VALUE_KINDS
 from cytobuf.protoc_gen_cython.constants import UNSIGNED_TYPES
+from cytobuf.protoc_gen_cython.constants import WELL_KNOWN_TYPE_FILES
 
 
 def proto_filename_to_base(proto_filename):
@@ -331,6 +338,9 @@ class Field(NamedTuple):
     key_field: Optional[Any] = None
     value_field: Optional[Any] = None
     type_symbol: Optional[ProtoCythonSymbol] = None
+    json_name: str = ""
+    string_cache: str = ""
+    number: int = 0
 
     def const_reference(self, module: Module) -> str:
         if self.is_reference:
@@ -358,6 +368,85 @@ class Field(NamedTuple):
             return self.type_symbol.name.name
         return self.cython_type
 
+    @property
+    def default_value(self) -> str:
+        """A C++ expression for this scalar field's zero value."""
+        if self.cpp_type == "string":
+            return "string()"
+        if self.type_symbol:
+            return f"<{self.cpp_type}>0"
+        return "0"
+
+    @property
+    def enum_type(self) -> str:
+        """The Python enum class of this enum field."""
+        return f"_py_{self.type_symbol.name}" if self.type_symbol else ""
+
+    @property
+    def buffer_element_type(self) -> Optional[str]:
+        """The element type of this repeated numeric field's `RepeatedField` storage."""
+        if self.repeated and not self.type_symbol and self.cpp_type in REPEATED_BUFFER_TYPES:
+            return REPEATED_BUFFER_TYPES[self.cpp_type][0]
+        return None
+
+    @property
+    def buffer_format(self) -> Optional[str]:
+        """The struct format of this repeated numeric field's elements."""
+        if self.buffer_element_type:
+            return REPEATED_BUFFER_TYPES[self.cpp_type][1]
+        return None
+
+    @property
+    def value_kind(self) -> str:
+        """How a single value of this field is converted to and from JSON."""
+        if self.is_map:
+            return "map"
+        if self.field_type == FieldType.message:
+            return "message"
+        if self.type_symbol:
+            return "enum"
+        if self.cpp_type == "string":
+            return self.python_type
+        return SCALAR_VALUE_KINDS.get(self.cpp_type, "int32")
+
+    @property
+    def well_known(self) -> bool:
+        """Whether this message field's type has a special JSON mapping."""
+        return (
+            self.field_type == FieldType.message
+            and self.type_symbol is not None
+            and self.type_symbol.filename in WELL_KNOWN_TYPE_FILES
+        )
+
+    @property
+    def json_null(self) -> bool:
+        """Whether JSON null is a value of this `google.protobuf.Value` field, not its absence."""
+        return (
+            self.well_known
+            and not self.repeated
+            and self.type_symbol is not None
+            and self.type_symbol.package == "google.protobuf"
+            and self.type_symbol.name.fully_unwrapped == "Value"
+        )
+
+    @property
+    def column_type(self) -> Tuple[str, str]:
+        """The C element type and struct format of this numeric field's column."""
+        # Enums are exported as their underlying int.
+        return COLUMN_TYPES["int" if self.type_symbol else self.cpp_type]
+
+    @property
+    def repeated_ptr(self) -> bool:
+        """Whether this repeated field is stored in a `RepeatedPtrField`."""
+        return self.field_type == FieldType.message or self.cpp_type == "string"
+
+    def repeated_storage_type(self, module: Module) -> str:
+        """The C++ container backing this repeated field."""
+        if self.repeated_ptr:
+            return f"RepeatedPtrField[{self.local_cpp_type(module)}]"
+        # Repeated enums are stored as their underlying int.
+        return f"RepeatedField[{self.buffer_element_type or 'int'}]"
+
     @property
     def cpp_name(self):
         if self.name in CPP_KEYWORDS:
@@ -402,7 +491,11 @@ class Field(NamedTuple):
     @staticmethod
     def create_string(name: str, repeated: bool = False) -> Field:
         return Field._create_string_or_bytes(
-            name, "str", repeated, encode_suffix=".encode()", decode_function="bytes.decode"
+            name,
+            "str",
+            repeated,
+            encode_suffix=".encode()",
+            decode_function="cytobuf.protobuf.strings.decode_utf8",
         )
 
     @staticmethod
@@ -445,7 +538,7 @@ class Field(NamedTuple):
             cpp_type=f"_cpp_{str(enum_type_symbol.name)}",
             python_type=str(enum_type_symbol.name),
             type_symbol=enum_type_symbol,
-            decode_function=f"_py_{enum_type_symbol.name}",
+            decode_function=f"__{enum_type_symbol.name}__members.lookup",
         )
 
     @staticmethod
@@ -497,28 +590,91 @@ class Field(NamedTuple):
             # special case for maps.  The C++ API doesn't treating maps as repeated key values.
             message_type = fqn_map[field_descriptor.type_name]
             if message_type.is_map_entry:
-                return Field.build_map(field_name, fqn_map, message_type, output_prefix, imports)
+                return Field.build_map(
+                    field_name, fqn_map, message_type, output_prefix, imports
+                )._replace(
+                    json_name=field_descriptor.json_name or field_name,
+                    number=field_descriptor.number,
+                )
+        result: Optional[Field] = None
         if field_type in INT_TYPES:
-            return Field.create_int(field_name, field_type in UNSIGNED_TYPES, repeated)
+            result = Field.create_int(field_name, field_type in UNSIGNED_TYPES, repeated)
         elif field_type in LONG_TYPES:
-            return Field.create_long(field_name, field_type in UNSIGNED_TYPES, repeated)
+            result = Field.create_long(field_name, field_type in UNSIGNED_TYPES, repeated)
         elif field_type == FieldDescriptorProto.TYPE_STRING:
-            return Field.create_string(field_name, repeated)
+            result = Field.create_string(field_name, repeated)
         elif field_type == FieldDescriptorProto.TYPE_BYTES:
-            return Field.create_bytes(field_name, repeated)
+            result = Field.create_bytes(field_name, repeated)
         elif field_type == FieldDescriptorProto.TYPE_FLOAT:
-            return Field.create_float(field_name, repeated)
+            result = Field.create_float(field_name, repeated)
         elif field_type == FieldDescriptorProto.TYPE_DOUBLE:
-            return Field.create_double(field_name, repeated)
+            result = Field.create_double(field_name, repeated)
         elif field_type == FieldDescriptorProto.TYPE_BOOL:
-            return Field.create_bool(field_name, repeated)
+            result = Field.create_bool(field_name, repeated)
         elif field_type == FieldDescriptorProto.TYPE_ENUM:
             symbol = Field.add_import(field_descriptor, fqn_map, imports)
-            return Field.create_enum(field_name, symbol, repeated)
+            result = Field.create_enum(field_name, symbol, repeated)
         elif field_type == FieldDescriptorProto.TYPE_MESSAGE:
             symbol = Field.add_import(field_descriptor, fqn_map, imports)
-            return Field.create_message(field_name, symbol, repeated)
-        return None
+            result = Field.create_message(field_name, symbol, repeated)
+        if result is None:
+            return None
+        if result.repeated:
+            Field.add_repeated_imports(result, imports)
+        return result._replace(
+            json_name=field_descriptor.json_name or field_name, number=field_descriptor.number
+        )
+
+    @staticmethod
+    def add_repeated_imports(field: Field, imports: Set[Import]) -> None:
+        repeated_field_module = Module(package="cytobuf.protobuf", module_basename="repeated_field")
+        for symbol in ("RepeatedField", "RepeatedPtrField"):
+            imports.add(Import(repeated_field_module, ImportType.cython, Name("", symbol)))
+        if field.field_type == FieldType.scalar:
+            imports.add(
+                Import(
+                    Module(package="libcpp", module_basename="vector"),
+                    ImportType.cython,
+                    Name("", "vector"),
+                )
+            )
+        if not field.buffer_element_type:
+            return
+        imports.add(
+            Import(repeated_field_module, ImportType.cython, Name("", "acquire_elements"))
+        )
+        imports.add(
+            Import(
+                Module(package="libc", module_basename="string"),
+                ImportType.cython,
+                Name("", "memcpy"),
+            )
+        )
+        for symbol in ("PyBuffer_Release", "PyObject_CheckBuffer"):
+            imports.add(
+                Import(
+                    Module(package="cpython", module_basename="buffer"),
+                    ImportType.cython,
+                    Name("", symbol),
+                )
+            )
+        if field.buffer_element_type == "cpp_bool":
+            imports.add(
+                Import(
+                    Module(module_basename="libcpp"),
+                    ImportType.cython,
+                    Name("", "bool"),
+                    alias="cpp_bool",
+                )
+            )
+        elif field.buffer_element_type not in ("float", "double"):
+            imports.add(
+                Import(
+                    Module(package="libc", module_basename="stdint"),
+                    ImportType.cython,
+                    Name("", field.buffer_element_type),
+                )
+            )
 
     @staticmethod
     def build_map(field_name, fqn_map, message_type, output_prefix, imports):
@@ -572,11 +728,32 @@ class Field(NamedTuple):
         return symbol
 
 
+class GeneratorOptions(NamedTuple):
+    """Options passed to the plugin through `--cython_opt`."""
+
+    cache_strings: Sequence[str] = ()
+    raw_enums: bool = False
+
+
 class Class(NamedTuple):
     name: Name
     fields: List[Field]
     exported: bool
     nested_names: List[Name]
+    # Whether this is a well-known type with a special JSON mapping, e.g. `Timestamp`.
+    well_known: bool = False
+
+    @property
+    def string_cache_fields(self) -> List[Field]:
+        return [field for field in self.fields if field.string_cache]
+
+    @property
+    def singular_message_fields(self) -> List[Field]:
+        return [
+            field
+            for field in self.fields
+            if field.field_type == FieldType.message and not field.repeated and not field.is_map
+        ]
 
     @staticmethod
     def from_descriptor(
@@ -587,27 +764,54 @@ class Class(NamedTuple):
         nested_names: List[Name],
         prefix: List[str],
         output_prefix: str,
+        options: GeneratorOptions = GeneratorOptions(),
     ) -> Class:
         prefix = prefix or []
         fqn = "." + ".".join(chain([package], prefix, [descriptor.name]))
         symbol = fqn_map[fqn]
         invalid_field_names = Class._invalid_field_names(descriptor)
+        fields = [
+            cython_field
+            for cython_field in (
+                Field.from_field_descriptor(field, fqn_map, imports, output_prefix)
+                for field in descriptor.field
+                if field.name not in invalid_field_names
+            )
+            if cython_field is not None
+        ]
 
         return Class(
             name=symbol.name,
             fields=[
-                cython_field
-                for cython_field in (
-                    Field.from_field_descriptor(field, fqn_map, imports, output_prefix)
-                    for field in descriptor.field
-                    if field.name not in invalid_field_names
-                )
-                if cython_field is not None
+                Class._apply_options(field, symbol.name, fqn.lstrip("."), options)
+                for field in fields
             ],
             nested_names=nested_names,
             exported=not prefix,
+            well_known=symbol.filename in WELL_KNOWN_TYPE_FILES,
         )
 
+    @staticmethod
+    def _apply_options(
+        field: Field, class_name: Name, fqn: str, options: GeneratorOptions
+    ) -> Field:
+        if options.raw_enums:
+            # Enum values are returned as the ints stored in the message.
+            if field.value_kind == "enum":
+                return field._replace(decode_function="")
+            value_field = field.value_field
+            if field.is_map and value_field and value_field.value_kind == "enum":
+                return field._replace(value_field=value_field._replace(decode_function=""))
+        field_fqn = f"{fqn}.{field.name}"
+        if field.value_kind == "str" and any(
+            fnmatchcase(field_fqn, pattern) for pattern in options.cache_strings
+        ):
+            string_cache = f"__{class_name}__{field.name}__strings"
+            return field._replace(
+                string_cache=string_cache, decode_function=f"{string_cache}.decode"
+            )
+        return field
+
     @staticmethod
     def _invalid_field_names(descriptor):
         invalid_field_names = set(keyword.kwlist)
@@ -638,6 +842,22 @@ class ProtoFile(NamedTuple):
             self.proto_package, self.proto_filename, self.output_prefix
         )
 
+    @property
+    def enum_tables(self) -> List[Name]:
+        """The enums read by this file's fields through an `EnumTable`."""
+        names = set()
+        for cdef_class in self.classes:
+            for field in cdef_class.fields:
+                value_field = field.value_field if field.is_map else field
+                if (
+                    value_field
+                    and value_field.type_symbol
+                    and value_field.value_kind == "enum"
+                    and value_field.decode_function
+                ):
+                    names.add(value_field.type_symbol.name)
+        return sorted(names)
+
     @property
     def cpp_header(self):
         return proto_filename_to_base(self.proto_filename) + ".pb.h"
@@ -652,6 +872,7 @@ class ProtoFile(NamedTuple):
         fqn_map: Dict[str, ProtoCythonSymbol],
         filename_to_package_map: Dict[str, str],
         output_prefix: str,
+        options: GeneratorOptions = GeneratorOptions(),
     ) -> ProtoFile:
         namespace = file_descriptor.package.split(".")
         classes: List[Class] = []
@@ -660,7 +881,12 @@ class ProtoFile(NamedTuple):
                 Module(package="libcpp", module_basename="string"),
                 ImportType.cython,
                 Name("", "string"),
-            )
+            ),
+            Import(
+                Module(package="libcpp", module_basename="vector"),
+                ImportType.cython,
+                Name("", "vector"),
+            ),
         }
         enums = [
             ProtoEnum.from_enum_descriptor(enum_type, file_descriptor.package, fqn_map)
@@ -678,6 +904,7 @@ class ProtoFile(NamedTuple):
                     imports,
                     [],
                     output_prefix,
+                    options,
                 )
         dependent_modules = {
             Module.from_package_and_file(filename_to_package_map[dep], dep, output_prefix)
@@ -705,11 +932,14 @@ class ProtoFile(NamedTuple):
         file_descriptors: Iterable[FileDescriptorProto],
         files_to_generate: Set[str],
         output_prefix: str,
+        options: GeneratorOptions = GeneratorOptions(),
     ) -> List[ProtoFile]:
         fqn_map = ProtoCythonSymbol.build_fqn_to_symbol_map(file_descriptors, output_prefix)
         package_map = {x.name: x.package for x in file_descriptors}
         proto_files = [
-            ProtoFile.from_file_descriptor_proto(descriptor, fqn_map, package_map, output_prefix)
+            ProtoFile.from_file_descriptor_proto(
+                descriptor, fqn_map, package_map, output_prefix, options
+            )
             for descriptor in file_descriptors
         ]
         module_to_proto = {proto_file.module: proto_file for proto_file in proto_files}
@@ -748,6 +978,7 @@ class ProtoFile(NamedTuple):
         imports: Set[Import],
         path: List[str],
         output_prefix: str,
+        options: GeneratorOptions = GeneratorOptions(),
     ) -> Class:
         nested_names: List[Name] = []
         embedded_path = path + [class_descriptor.name]
@@ -765,6 +996,7 @@ class ProtoFile(NamedTuple):
                 imports,
                 embedded_path,
                 output_prefix,
+                options,
             )
             nested_names.append(new_class.name)
         nested_enums = [
@@ -775,7 +1007,14 @@ class ProtoFile(NamedTuple):
         enums.extend(nested_enums)
         nested_names.extend(enum.name for enum in nested_enums)
         new_class = Class.from_descriptor(
-            class_descriptor, package, fqn_map, imports, nested_names, path, output_prefix
+            class_descriptor,
+            package,
+            fqn_map,
+            imports,
+            nested_names,
+            path,
+            output_prefix,
+            options,
         )
         classes.append(new_class)
         return new_class
@@ -40,6 +40,7 @@ cdef extern from "{{ file.cpp_header }}" namespace "{{ file.namespace | join("::
 
     cdef cppclass {{ cdef_class.name.name }}(cytobuf.protobuf.common.Message):
         {{ cdef_class.name.name }}()
+        void Swap({{ cdef_class.name.name }}* other)
     {%- for field in cdef_class.fields %}
         void clear_{{ field.cpp_name }}()
         {{ field.const_reference(file.module) }} {{ field.cpp_name }}({%- if field.repeated -%}int) except +{%- else -%}){%- endif -%}
@@ -59,6 +60,11 @@ cdef extern from "{{ file.cpp_header }}" namespace "{{ file.namespace | join("::
             {%- endif %}
         {%- elif field.field_type.name == 'message' and not field.is_map %}
         bint has_{{ field.cpp_name }}() const;
+        {{ field.local_cpp_type(file.module) }}* release_{{ field.cpp_name }}()
+        {%- endif -%}
+        {%- if field.repeated %}
+        const {{ field.repeated_storage_type(file.module) }}& {{ field.cpp_name }}()
+        {{ field.repeated_storage_type(file.module) }}* mutable_{{ field.cpp_name }}()
         {%- endif -%}
     {%- endfor %}
 {%- endfor %}
@@ -69,16 +75,54 @@ cdef extern from "{{ file.cpp_header }}" namespace "{{ file.namespace | join("::
 
 cdef class __{{ cdef_class.name }}__{{ field.name }}__container:
     cdef {{ cdef_class.name.name }}* _instance
+    cdef cytobuf.protobuf.message.Message _parent
+        {%- if field.buffer_format %}
+    cdef Py_ssize_t _exports
+    cdef Py_ssize_t _shape
+    cdef int _check_resizable(self) except -1
+        {%- elif field.repeated and field.field_type.name == 'message' %}
+    cdef void _detach_elements(self, int start)
+        {%- endif %}
     {%- endfor %}
 
 cdef class {{ cdef_class.name }}(cytobuf.protobuf.message.Message):
     {%- for field in cdef_class.fields if field.repeated or field.is_map %}
-    cdef readonly __{{ cdef_class.name }}__{{ field.name }}__container {{ field.name }}
+    cdef __{{ cdef_class.name }}__{{ field.name }}__container _{{ field.name }}_cache
+    {%- endfor %}
+    {%- for field in cdef_class.singular_message_fields %}
+    cdef cytobuf.protobuf.message.Message _{{ field.name }}_cache
     {%- endfor %}
     cdef {{ cdef_class.name.name }}* _message(self)
 
     @staticmethod
-    cdef from_cpp({{ cdef_class.name.name }}* other)
+    cdef from_cpp({{ cdef_class.name.name }}* other, cytobuf.protobuf.message.Message parent)
+
+    @staticmethod
+    cdef from_element({{ cdef_class.name.name }}* other, cytobuf.protobuf.message.Message parent)
+
+    @staticmethod
+    cdef dict _to_dict(
+        {{ cdef_class.name.name }}* message,
+        bint including_default_value_fields,
+        bint preserving_proto_field_name,
+        bint use_integers_for_enums,
+    )
+
+    @staticmethod
+    cdef int _merge_dict({{ cdef_class.name.name }}* message, dict value, bint ignore_unknown_fields) except -1
+
+    @staticmethod
+    cdef dict _to_columns(vector[{{ cdef_class.name.name }}*]& messages, set fields)
+
+    @staticmethod
+    cdef int _from_columns(vector[{{ cdef_class.name.name }}*]& messages, dict columns) except -1
+
+    @staticmethod
+    cdef dict _parse_columns(
+        cytobuf.protobuf.message.Payloads payloads,
+        object fields,
+        cytobuf.protobuf.message.ParseOptions options,
+    )
 {%- endfor %}
 """
 
@@ -90,21 +134,114 @@ MESSAGE_PYX_TEMPLATE = (
     PYX_HEADER
     + """\
 
+cimport cython
+
+cimport cytobuf.protobuf.arena
+cimport cytobuf.protobuf.columns
+cimport cytobuf.protobuf.common
+cimport cytobuf.protobuf.enum_table
+cimport cytobuf.protobuf.json_format
 cimport cytobuf.protobuf.message
+cimport cytobuf.protobuf.strings
 {%- for import in file.imports %}
 {{ import.cython_import }}
 {%- endfor %}
 
+import cytobuf.protobuf.columns
+import cytobuf.protobuf.json_format
+{%- for enum_name in file.enum_tables %}
+
+cdef cytobuf.protobuf.enum_table.EnumTable __{{ enum_name }}__members = cytobuf.protobuf.enum_table.EnumTable(_py_{{ enum_name }})
+{%- endfor %}
+
+{#- Converts a C++ value of `field` to its JSON representation. #}
+{%- macro json_value(field, value) -%}
+    {%- if field.well_known -%}
+cytobuf.protobuf.json_format.encode_well_known({{ value }}, including_default_value_fields, preserving_proto_field_name, use_integers_for_enums)
+    {%- elif field.value_kind == 'message' -%}
+{{ field.python_type }}._to_dict(<{{ field.local_cpp_type(file.module) }}*>&{{ value }}, including_default_value_fields, preserving_proto_field_name, use_integers_for_enums)
+    {%- elif field.value_kind == 'str' -%}
+{{ field.decode_function }}({{ value }})
+    {%- elif field.value_kind == 'bytes' -%}
+cytobuf.protobuf.json_format.encode_bytes({{ value }})
+    {%- elif field.value_kind == 'float' -%}
+cytobuf.protobuf.json_format.encode_float({{ value }})
+    {%- elif field.value_kind == 'double' -%}
+cytobuf.protobuf.json_format.encode_double({{ value }})
+    {%- elif field.value_kind == 'enum' -%}
+cytobuf.protobuf.json_format.encode_enum({{ field.enum_type }}, {{ value }}, use_integers_for_enums)
+    {%- elif field.value_kind == 'int64' -%}
+str({{ value }})
+    {%- else -%}
+{{ value }}
+    {%- endif -%}
+{%- endmacro %}
+
+{#- Converts a C++ map key of `field` to a JSON object key. #}
+{%- macro json_key(field, value) -%}
+    {%- if field.value_kind == 'str' -%}
+{{ field.decode_function }}({{ value }})
+    {%- elif field.value_kind == 'bool' -%}
+("true" if {{ value }} else "false")
+    {%- else -%}
+str({{ value }})
+    {%- endif -%}
+{%- endmacro %}
+
+{#- Converts the JSON representation of a scalar `field` to its C++ value. #}
+{%- macro proto_value(field, value) -%}
+    {%- if field.value_kind == 'str' -%}
+cytobuf.protobuf.json_format.decode_string({{ value }})
+    {%- elif field.value_kind == 'bytes' -%}
+cytobuf.protobuf.json_format.decode_bytes({{ value }})
+    {%- elif field.value_kind == 'bool' -%}
+cytobuf.protobuf.json_format.decode_bool({{ value }})
+    {%- elif field.value_kind == 'float' -%}
+cytobuf.protobuf.json_format.decode_float({{ value }})
+    {%- elif field.value_kind == 'double' -%}
+cytobuf.protobuf.json_format.decode_double({{ value }})
+    {%- elif field.value_kind == 'enum' -%}
+<{{ field.local_cpp_type(file.module) }}>cytobuf.protobuf.json_format.decode_enum({{ field.enum_type }}, {{ value }})
+    {%- else -%}
+cytobuf.protobuf.json_format.decode_integer({{ value }})
+    {%- endif -%}
+{%- endmacro %}
+
+{#- Converts a JSON object key to a C++ map key of `field`. #}
+{%- macro proto_key(field, value) -%}
+    {%- if field.value_kind == 'bool' -%}
+cytobuf.protobuf.json_format.decode_bool_key({{ value }})
+    {%- else -%}
+{{ proto_value(field, value) }}
+    {%- endif -%}
+{%- endmacro %}
+
+{%- macro dict_key(field) -%}
+    {%- if field.json_name == field.name -%}
+"{{ field.name }}"
+    {%- else -%}
+("{{ field.name }}" if preserving_proto_field_name else "{{ field.json_name }}")
+    {%- endif -%}
+{%- endmacro %}
+
+{#- Raises a ValueError for the names in `names` that aren't columns of `cdef_class`. #}
+{%- macro check_column_names(cdef_class, names) -%}
+unknown = {{ names }} - {{ '{' }}{% for field in cdef_class.fields if not field.is_map %}"{{ field.name }}"{% if not loop.last %}, {% endif %}{% else %}None{% endfor %}{{ '}' }}
+        if unknown:
+            raise ValueError(f"{{ cdef_class.name.name }} has no fields named {sorted(unknown)}")
+{%- endmacro %}
+
 {%- for cdef_class in file.classes %}
     {%- for field in cdef_class.fields if field.repeated %}
 
+@cython.freelist(8)
 cdef class __{{ cdef_class.name }}__{{ field.name }}__container:
 
     def __iter__(self):
         cdef size_t i
         for i in range(self._instance.{{ field.cpp_name }}_size()):
         {%- if field.field_type.name == 'message' %}
-            yield {{ field.python_type }}.from_cpp(self._instance.mutable_{{ field.cpp_name }}(i))
+            yield {{ field.python_type }}.from_element(self._instance.mutable_{{ field.cpp_name }}(i), self._parent)
         {%- else %}
             yield {{ field.decode_function }}(self._instance.{{ field.cpp_name }}(i))
         {%- endif %}
@@ -124,7 +261,7 @@ cdef class __{{ cdef_class.name }}__{{ field.name }}__container:
             if not 0 <= index < size:
                 raise IndexError(f"list index ({key}) out of range")
         {%- if field.field_type.name == 'message' %}
-            return {{ field.python_type }}.from_cpp(self._instance.mutable_{{ field.cpp_name }}(index))
+            return {{ field.python_type }}.from_element(self._instance.mutable_{{ field.cpp_name }}(index), self._parent)
         {%- else %}
             return {{ field.decode_function }}(self._instance.{{ field.cpp_name }}(index))
         {%- endif %}
@@ -132,7 +269,7 @@ cdef class __{{ cdef_class.name }}__{{ field.name }}__container:
             start, stop, step = key.indices(size)
             return [
         {%- if field.field_type.name == 'message' %}
-                {{ field.python_type }}.from_cpp(self._instance.mutable_{{ field.cpp_name }}(index))
+                {{ field.python_type }}.from_element(self._instance.mutable_{{ field.cpp_name }}(index), self._parent)
         {%- else %}
                 {{ field.decode_function }}(self._instance.{{ field.cpp_name }}(index))
         {%- endif %}
@@ -142,99 +279,890 @@ cdef class __{{ cdef_class.name }}__{{ field.name }}__container:
         {%- if field.field_type.name == 'message' %}
 
     def add(self):
-        return {{ field.python_type }}.from_cpp(self._instance.add_{{ field.cpp_name }}())
+        return {{ field.python_type }}.from_element(self._instance.add_{{ field.cpp_name }}(), self._parent)
+
+    def extend(self, values):
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef {{ field.python_type }} value
+        if not isinstance(values, (list, tuple)):
+            values = list(values)
+        elements.Reserve(elements.size() + len(values))
+        for value in values:
+            if value is None:
+                raise TypeError("{{ field.python_type }} expected, got NoneType")
+            value._load_lazy_fields()
+            self._instance.add_{{ field.cpp_name }}().CopyFrom(value._message()[0])
+
+    def __setitem__(self, key, value):
+        raise TypeError("Repeated message fields do not support item assignment")
+
+    def pop(self, Py_ssize_t index=-1):
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef Py_ssize_t size = elements.size()
+        cdef {{ field.python_type }} result
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("pop index out of range")
+        while index < size - 1:
+            elements.SwapElements(index, index + 1)
+            index += 1
+        result = <{{ field.python_type }}>self._parent._element(elements.Mutable(index))
+        if result is not None:
+            self._parent._detach_element(elements.Mutable(index), False)
+            # Off an arena the element's wrapper has taken its contents, so it's the result.
+            if result._ptr_owner:
+                elements.RemoveLast()
+                return result
+        result = {{ field.python_type }}.from_cpp(elements.ReleaseLast(), None)
+        result._ptr_owner = True
+        return result
+
+    def to_columns(self):
+        \"\"\"Exports the fields of every element as a dict of columns, with a row per element.
+
+        Numeric and enum fields become typed memoryviews, string and bytes fields `BinaryColumn`s,
+        repeated fields `ListColumn`s and sub-messages dicts of their own columns.  Map fields
+        aren't exported.
+        \"\"\"
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef vector[{{ field.local_cpp_type(file.module) }}*] messages
+        cdef int i
+        messages.reserve(elements.size())
+        for i in range(elements.size()):
+            messages.push_back(elements.Mutable(i))
+        return {{ field.python_type }}._to_columns(messages, None)
+
+    def to_arrow(self):
+        \"\"\"Exports the columns of `to_columns` as a `pyarrow.RecordBatch`.\"\"\"
+        return cytobuf.protobuf.columns.to_arrow(self.to_columns(), len(self))
+
+    def from_columns(self, dict columns not None):
+        \"\"\"Appends an element for each row of `columns`, in the format produced by `to_columns`.
+
+        Numeric columns may be any buffer of a matching type, such as NumPy arrays, and string
+        and bytes columns any sequence of `str` or bytes.  Missing columns are left unset.
+        \"\"\"
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef int start = elements.size()
+        cdef Py_ssize_t count = cytobuf.protobuf.columns.column_length(columns)
+        cdef vector[{{ field.local_cpp_type(file.module) }}*] messages
+        cdef Py_ssize_t i
+        self._parent._check_exports()
+        elements.Reserve(start + count)
+        messages.reserve(count)
+        for i in range(count):
+            messages.push_back(self._instance.add_{{ field.cpp_name }}())
+        try:
+            {{ field.python_type }}._from_columns(messages, columns)
+        except:
+            self._detach_elements(start)
+            elements.DeleteSubrange(start, count)
+            raise
+
+    cdef void _detach_elements(self, int start):
+        \"\"\"Detaches the wrappers of the elements from `start` on, before they're removed.\"\"\"
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef int i
+        if self._parent._elements is NULL:
+            return
+        for i in range(start, elements.size()):
+            self._parent._detach_element(elements.Mutable(i), False)
         {%- else %}
 
     def add(self, {{ field.local_cython_type(file.module) }} value):
+            {%- if field.buffer_format %}
+        self._check_resizable()
+            {%- endif %}
         self._instance.add_{{ field.cpp_name }}(value{{ field.encode_suffix }})
-        {%- endif -%}
+
+    def extend(self, values):
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef vector[{{ field.local_cpp_type(file.module) }}] converted
+        cdef {{ field.local_cython_type(file.module) }} value
+        cdef size_t i
+            {%- if field.buffer_format %}
+        self._check_resizable()
+        if PyObject_CheckBuffer(values):
+            try:
+                self.extend_from_buffer(values)
+                return
+            except ValueError:
+                pass
+            {%- endif %}
+        if not isinstance(values, (list, tuple)):
+            values = list(values)
+        converted.reserve(len(values))
+        for value in values:
+            converted.push_back(value{{ field.encode_suffix }})
+        elements.Reserve(elements.size() + converted.size())
+        for i in range(converted.size()):
+            self._instance.add_{{ field.cpp_name }}(converted[i])
+
+    def __setitem__(self, key, value):
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef Py_ssize_t size = elements.size()
+        cdef Py_ssize_t index, start, stop, step
+        cdef vector[{{ field.local_cpp_type(file.module) }}] converted
+        cdef {{ field.local_cython_type(file.module) }} item
+        cdef size_t i
+        if isinstance(key, slice):
+            start, stop, step = key.indices(size)
+            indices = range(start, stop, step)
+            for item in value:
+                converted.push_back(item{{ field.encode_suffix }})
+            if converted.size() == <size_t>len(indices):
+                for i in range(converted.size()):
+                    self._instance.set_{{ field.cpp_name }}(indices[i], converted[i])
+                return
+            if step != 1:
+                raise ValueError(
+                    f"attempt to assign sequence of size {converted.size()} "
+                    f"to extended slice of size {len(indices)}"
+                )
+            {%- if field.buffer_format %}
+            self._check_resizable()
+            {%- endif %}
+            stop = max(start, stop)
+            for index in range(stop, size):
+                converted.push_back(self._instance.{{ field.cpp_name }}(index))
+            del self[start:]
+            elements.Reserve(start + converted.size())
+            for i in range(converted.size()):
+                self._instance.add_{{ field.cpp_name }}(converted[i])
+        else:
+            index = key
+            if index < 0:
+                index += size
+            if not 0 <= index < size:
+                raise IndexError("list assignment index out of range")
+            item = value
+            self._instance.set_{{ field.cpp_name }}(index, item{{ field.encode_suffix }})
+
+    def pop(self, Py_ssize_t index=-1):
+        cdef Py_ssize_t size = self._instance.{{ field.cpp_name }}_size()
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("pop index out of range")
+        result = self[index]
+        del self[index]
+        return result
+        {%- endif %}
+
+    def __delitem__(self, key):
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef Py_ssize_t size = elements.size()
+        cdef Py_ssize_t index, first, last, step, kept
+        {%- if field.buffer_format %}
+        self._check_resizable()
+        {%- endif %}
+        if isinstance(key, slice):
+            indices = range(*key.indices(size))
+            if not indices:
+                return
+            if indices.step < 0:
+                indices = indices[::-1]
+            first, last, step = indices[0], indices[-1], indices.step
+        else:
+            index = key
+            if index < 0:
+                index += size
+            if not 0 <= index < size:
+                raise IndexError("list assignment index out of range")
+            first, last, step = index, index, 1
+        kept = first
+        for index in range(first, size):
+            if index > last or (index - first) % step:
+                if kept != index:
+                    elements.SwapElements(kept, index)
+                kept += 1
+        {%- if field.field_type.name == 'message' %}
+        self._detach_elements(kept)
+        {%- endif %}
+        {%- if field.repeated_ptr %}
+        elements.DeleteSubrange(kept, size - kept)
+        {%- else %}
+        elements.ExtractSubrange(kept, size - kept, NULL)
+        {%- endif %}
+
+    def clear(self):
+        {%- if field.buffer_format %}
+        self._check_resizable()
+        {%- elif field.field_type.name == 'message' %}
+        self._detach_elements(0)
+        {%- endif %}
+        self._instance.clear_{{ field.cpp_name }}()
+
+    def Reserve(self, int size):
+        {%- if field.buffer_format %}
+        self._check_resizable()
+        {%- endif %}
+        self._instance.mutable_{{ field.cpp_name }}().Reserve(size)
+
+    def swap(self, __{{ cdef_class.name }}__{{ field.name }}__container other not None):
+        \"\"\"Exchanges the elements of this field with those of the same field in another message.\"\"\"
+        {%- if field.buffer_format %}
+        self._check_resizable()
+        other._check_resizable()
+        {%- elif field.field_type.name == 'message' %}
+        self._detach_elements(0)
+        other._detach_elements(0)
+        {%- endif %}
+        self._instance.mutable_{{ field.cpp_name }}().Swap(other._instance.mutable_{{ field.cpp_name }}())
+        {%- if field.buffer_format %}
+
+    cdef int _check_resizable(self) except -1:
+        if self._exports:
+            raise BufferError("Existing exports of data: object cannot be re-sized")
+        return 0
+
+    def extend_from_buffer(self, data):
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        cdef Py_buffer view
+        cdef Py_ssize_t count
+        self._check_resizable()
+        count = acquire_elements(
+            data, &view, b"{{ field.buffer_format }}", sizeof({{ field.buffer_element_type }}), elements.size()
+        )
+        try:
+            elements.Reserve(elements.size() + count)
+            memcpy(elements.AddNAlreadyReserved(count), view.buf, count * sizeof({{ field.buffer_element_type }}))
+        finally:
+            PyBuffer_Release(&view)
+
+    def __getbuffer__(self, Py_buffer* buffer, int flags):
+        cdef {{ field.repeated_storage_type(file.module) }}* elements = self._instance.mutable_{{ field.cpp_name }}()
+        self._shape = elements.size()
+        buffer.buf = elements.mutable_data()
+        buffer.obj = self
+        buffer.len = self._shape * sizeof({{ field.buffer_element_type }})
+        buffer.readonly = 0
+        buffer.itemsize = sizeof({{ field.buffer_element_type }})
+        buffer.format = b"{{ field.buffer_format }}"
+        buffer.ndim = 1
+        buffer.shape = &self._shape
+        buffer.strides = NULL
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+        self._exports += 1
+
+    def __releasebuffer__(self, Py_buffer* buffer):
+        self._exports -= 1
+        {%- endif %}
     {%- endfor %}
 
     {%- for field in cdef_class.fields if field.is_map %}
 
+@cython.freelist(8)
 cdef class __{{ cdef_class.name }}__{{ field.name }}__container:
 
     def __iter__(self):
-        cdef {{ field.local_cpp_type(file.module) }} map_instance = self._instance.{{ field.cpp_name }}()
+        return iter(self.keys())
+
+    def keys(self):
+        cdef const {{ field.local_cpp_type(file.module) }}* map_instance = &self._instance.{{ field.cpp_name }}()
+        cdef {{ field.local_cpp_type(file.module) }}.const_iterator it = map_instance.cbegin()
+        cdef list result = []
+        while it != map_instance.cend():
+            result.append({{ field.key_field.decode_function }}(dereference(it).first))
+            postincrement(it)
+        return result
+    {%- if field.value_field.field_type.name == 'message' %}
+
+    def values(self):
+        cdef {{ field.local_cpp_type(file.module) }}* map_instance = self._instance.mutable_{{ field.cpp_name }}()
         cdef {{ field.local_cpp_type(file.module) }}.iterator it = map_instance.begin()
+        cdef list result = []
         while it != map_instance.end():
-            yield {{ field.key_field.decode_function }}({{ field.decode_function }}(dereference(it).first))
+            result.append({{ field.value_field.python_type }}.from_element(&(dereference(it).second), self._parent))
             postincrement(it)
+        return result
 
     def items(self):
-        cdef {{ field.local_cpp_type(file.module) }} map_instance = self._instance.{{ field.cpp_name }}()
+        cdef {{ field.local_cpp_type(file.module) }}* map_instance = self._instance.mutable_{{ field.cpp_name }}()
         cdef {{ field.local_cpp_type(file.module) }}.iterator it = map_instance.begin()
-        cdef {{ field.key_field.local_cython_type(file.module) }} key_value
+        cdef list result = []
         while it != map_instance.end():
-            key_value = {{ field.key_field.decode_function }}({{ field.decode_function }}(dereference(it).first))
-            {%- if field.value_field.field_type.name == 'message' %}
-            yield key_value, {{ field.value_field.python_type }}.from_cpp(&(dereference(it).second))
-            {%- else %}
-            yield key_value, {{ field.decode_function }}(dereference(it).second)
-            {%- endif %}
+            result.append((
+                {{ field.key_field.decode_function }}(dereference(it).first),
+                {{ field.value_field.python_type }}.from_element(&(dereference(it).second), self._parent),
+            ))
+            postincrement(it)
+        return result
+
+    def to_dict(self):
+        cdef {{ field.local_cpp_type(file.module) }}* map_instance = self._instance.mutable_{{ field.cpp_name }}()
+        cdef {{ field.local_cpp_type(file.module) }}.iterator it = map_instance.begin()
+        cdef dict result = {}
+        while it != map_instance.end():
+            result[{{ field.key_field.decode_function }}(dereference(it).first)] = {{ field.value_field.python_type }}.from_element(&(dereference(it).second), self._parent)
+            postincrement(it)
+        return result
+    {%- else %}
+
+    def values(self):
+        cdef const {{ field.local_cpp_type(file.module) }}* map_instance = &self._instance.{{ field.cpp_name }}()
+        cdef {{ field.local_cpp_type(file.module) }}.const_iterator it = map_instance.cbegin()
+        cdef list result = []
+        while it != map_instance.cend():
+            result.append({{ field.value_field.decode_function }}(dereference(it).second))
+            postincrement(it)
+        return result
+
+    def items(self):
+        cdef const {{ field.local_cpp_type(file.module) }}* map_instance = &self._instance.{{ field.cpp_name }}()
+        cdef {{ field.local_cpp_type(file.module) }}.const_iterator it = map_instance.cbegin()
+        cdef list result = []
+        while it != map_instance.cend():
+            result.append((
+                {{ field.key_field.decode_function }}(dereference(it).first),
+                {{ field.value_field.decode_function }}(dereference(it).second),
+            ))
+            postincrement(it)
+        return result
+
+    def to_dict(self):
+        cdef const {{ field.local_cpp_type(file.module) }}* map_instance = &self._instance.{{ field.cpp_name }}()
+        cdef {{ field.local_cpp_type(file.module) }}.const_iterator it = map_instance.cbegin()
+        cdef dict result = {}
+        while it != map_instance.cend():
+            result[{{ field.key_field.decode_function }}(dereference(it).first)] = {{ field.value_field.decode_function }}(dereference(it).second)
             postincrement(it)
+        return result
+    {%- endif %}
 
     def __len__(self):
         return self._instance.{{ field.cpp_name }}().size()
 
     def __contains__(self, {{ field.key_field.local_cython_type(file.module) }} key):
-        cdef {{ field.local_cpp_type(file.module) }} map_instance = self._instance.{{ field.cpp_name }}()
         cdef {{ field.key_field.local_cpp_type(file.module) }} key_value = key{{ field.key_field.encode_suffix }}
-        return map_instance.contains(key_value)
+        return self._instance.{{ field.cpp_name }}().contains(key_value)
+    {%- if field.value_field.field_type.name == 'message' %}
+
+    def get(self, {{ field.key_field.local_cython_type(file.module) }} key, default=None):
+        cdef {{ field.local_cpp_type(file.module) }}* map_instance = self._instance.mutable_{{ field.cpp_name }}()
+        cdef {{ field.key_field.local_cpp_type(file.module) }} key_value = key{{ field.key_field.encode_suffix }}
+        cdef {{ field.local_cpp_type(file.module) }}.iterator it = map_instance.find(key_value)
+        if it == map_instance.end():
+            return default
+        return {{ field.value_field.python_type }}.from_element(&(dereference(it).second), self._parent)
 
     def __getitem__(self, {{ field.key_field.local_cython_type(file.module) }} key):
+        cdef {{ field.local_cpp_type(file.module) }}* map_instance = self._instance.mutable_{{ field.cpp_name }}()
         cdef {{ field.key_field.local_cpp_type(file.module) }} key_value = key{{ field.key_field.encode_suffix }}
-        {%- if field.value_field.field_type.name == 'message' %}
+        return {{ field.value_field.python_type }}.from_element(&dereference(map_instance)[key_value], self._parent)
+    {%- else %}
+
+    def get(self, {{ field.key_field.local_cython_type(file.module) }} key, default=None):
+        cdef const {{ field.local_cpp_type(file.module) }}* map_instance = &self._instance.{{ field.cpp_name }}()
+        cdef {{ field.key_field.local_cpp_type(file.module) }} key_value = key{{ field.key_field.encode_suffix }}
+        cdef {{ field.local_cpp_type(file.module) }}.const_iterator it = map_instance.const_find(key_value)
+        if it == map_instance.cend():
+            return default
+        return {{ field.value_field.decode_function }}(dereference(it).second)
+
+    def __getitem__(self, {{ field.key_field.local_cython_type(file.module) }} key):
+        cdef const {{ field.local_cpp_type(file.module) }}* map_instance = &self._instance.{{ field.cpp_name }}()
+        cdef {{ field.key_field.local_cpp_type(file.module) }} key_value = key{{ field.key_field.encode_suffix }}
+        cdef {{ field.local_cpp_type(file.module) }}.const_iterator it = map_instance.const_find(key_value)
+        if it == map_instance.cend():
+            return {{ field.value_field.decode_function }}({{ field.value_field.default_value }})
+        return {{ field.value_field.decode_function }}(dereference(it).second)
+
+    def __setitem__(self, {{ field.key_field.local_cython_type(file.module) }} key, {{ field.value_field.local_cython_type(file.module) }} value):
         cdef {{ field.local_cpp_type(file.module) }}* map_instance = self._instance.mutable_{{ field.cpp_name }}()
-        return {{ field.value_field.python_type }}.from_cpp(&dereference(map_instance)[key_value])
-        {%- else %}
-        cdef {{ field.local_cpp_type(file.module) }} map_instance = self._instance.{{ field.cpp_name }}()
-        return {{ field.value_field.decode_function }}(map_instance[key_value])
-        {%- endif %}
+        cdef {{ field.key_field.local_cpp_type(file.module) }} key_value = key{{ field.key_field.encode_suffix }}
+        dereference(map_instance)[key_value] = value{{ field.value_field.encode_suffix }}
+    {%- endif %}
 
     def __delitem__(self, {{ field.key_field.local_cython_type(file.module) }} key):
         cdef {{ field.local_cpp_type(file.module) }}* map_instance = self._instance.mutable_{{ field.cpp_name }}()
         cdef {{ field.key_field.local_cpp_type(file.module) }} key_value = key{{ field.key_field.encode_suffix }}
         cdef size_t result
-        result = dereference(map_instance).erase(key_value)
+        {%- if field.value_field.field_type.name == 'message' %}
+        cdef {{ field.local_cpp_type(file.module) }}.iterator it = map_instance.find(key_value)
+        if it != map_instance.end():
+            self._parent._detach_element(&(dereference(it).second), False)
+        {%- endif %}
+        result = map_instance.erase(key_value)
         if result == 0:
             raise KeyError(key)
 
-        {%- if field.value_field.field_type.name != 'message' %}
-    def __setitem__(self, {{ field.key_field.local_cython_type(file.module) }} key, {{ field.value_field.local_cpp_type(file.module) }} value):
+    def update(self, other=(), **kwargs):
         cdef {{ field.local_cpp_type(file.module) }}* map_instance = self._instance.mutable_{{ field.cpp_name }}()
-        cdef {{ field.key_field.local_cpp_type(file.module) }} key_value = key{{ field.key_field.encode_suffix }}
-        dereference(map_instance)[key_value] = {{ field.value_field.decode_function }}(value)
+        cdef {{ field.key_field.local_cython_type(file.module) }} key_object
+        {%- if field.value_field.field_type.name == 'message' %}
+        cdef {{ field.value_field.python_type }} value_object
+        {%- else %}
+        cdef {{ field.value_field.local_cython_type(file.module) }} value_object
         {%- endif %}
+        cdef list items
+        if hasattr(other, "keys"):
+            items = [(key, other[key]) for key in other.keys()]
+        else:
+            items = list(other)
+        items.extend(kwargs.items())
+        for key_object, value_object in items:
+            {%- if field.value_field.field_type.name == 'message' %}
+            if value_object is None:
+                raise TypeError("{{ field.value_field.python_type }} expected, got NoneType")
+            value_object._load_lazy_fields()
+            dereference(map_instance)[key_object{{ field.key_field.encode_suffix }}].CopyFrom(dereference(value_object._message()))
+            {%- else %}
+            dereference(map_instance)[key_object{{ field.key_field.encode_suffix }}] = value_object{{ field.value_field.encode_suffix }}
+            {%- endif %}
+
+    {%- endfor %}
+    {%- for field in cdef_class.string_cache_fields %}
 
+cdef cytobuf.protobuf.strings.StringCache {{ field.string_cache }} = cytobuf.protobuf.strings.StringCache()
     {%- endfor %}
 
 cdef class {{ cdef_class.name }}(cytobuf.protobuf.message.Message):
 
-    def __cinit__(self, _init = True):
-    {%- for field in cdef_class.fields if field.repeated or field.is_map %}
-        self.{{ field.name }} = __{{ cdef_class.name }}__{{ field.name }}__container()
-    {%- endfor %}
+    def __cinit__(self, _init = True, cytobuf.protobuf.arena.Arena arena = None):
         if _init:
-            instance = new {{ cdef_class.name.name }}()
-    {%- for field in cdef_class.fields if field.repeated or field.is_map %}
-            self.{{ field.name }}._instance = instance
-    {%- endfor %}
-            self._internal = instance
+            self._internal = cytobuf.protobuf.common.Arena.CreateMessage[{{ cdef_class.name.name }}](self._arena_pointer())
 
     cdef {{ cdef_class.name.name }}* _message(self):
         return <{{ cdef_class.name.name }}*>self._internal
+    {%- if cdef_class.singular_message_fields %}
+
+    cdef void _reset_cache(self, bint preserve):
+        cdef bint on_arena = self._internal.GetArena() is not NULL
+        cdef cytobuf.protobuf.common.Message* released
+        {%- for field in cdef_class.singular_message_fields %}
+        if self._{{ field.name }}_cache is not None:
+            if not on_arena:
+                released = self._message().release_{{ field.cpp_name }}()
+                self._detach_cached(self._{{ field.name }}_cache, released)
+                if preserve and released is not NULL:
+                    self._message().mutable_{{ field.cpp_name }}().CopyFrom(released[0])
+            self._{{ field.name }}_cache = None
+        {%- endfor %}
+        cytobuf.protobuf.message.Message._reset_cache(self, preserve)
+
+    cdef bint _has_cached_field(self, int number):
+        {%- for field in cdef_class.singular_message_fields %}
+        if number == {{ field.number }}:
+            return self._{{ field.name }}_cache is not None
+        {%- endfor %}
+        return False
+    {%- endif %}
+    {%- if cdef_class.singular_message_fields or cdef_class.fields | selectattr("buffer_format") | list %}
+
+    cdef int _check_exports(self) except -1:
+        {%- for field in cdef_class.fields if field.buffer_format %}
+        if self._{{ field.name }}_cache is not None:
+            self._{{ field.name }}_cache._check_resizable()
+        {%- endfor %}
+        {%- for field in cdef_class.singular_message_fields %}
+        if self._{{ field.name }}_cache is not None:
+            self._{{ field.name }}_cache._check_exports()
+        {%- endfor %}
+        return cytobuf.protobuf.message.Message._check_exports(self)
+    {%- endif %}
+
+    cdef int _merge_from_json(self, object value, bint ignore_unknown_fields) except -1:
+    {%- if cdef_class.well_known %}
+        return cytobuf.protobuf.json_format.decode_well_known(self._internal, value, ignore_unknown_fields)
+    {%- else %}
+        if not isinstance(value, dict):
+            raise cytobuf.protobuf.json_format.ParseError(f"Expected a JSON object, got {type(value).__name__}")
+        return {{ cdef_class.name }}._merge_dict(self._message(), value, ignore_unknown_fields)
+    {%- endif %}
 
     @staticmethod
-    cdef from_cpp({{ cdef_class.name.name }}* other):
-        result = {{ cdef_class.name }}(_init=False)
-        result._internal = other   
-    {%- for field in cdef_class.fields if field.repeated or field.is_map %}
-        result.{{ field.name }}._instance = other
+    cdef from_cpp({{ cdef_class.name.name }}* other, cytobuf.protobuf.message.Message parent):
+        cdef {{ cdef_class.name }} result = {{ cdef_class.name }}.__new__({{ cdef_class.name }}, False)
+        result._internal = other
+        result._parent = parent
+        return result
+
+    @staticmethod
+    cdef from_element({{ cdef_class.name.name }}* other, cytobuf.protobuf.message.Message parent):
+        \"\"\"Wraps a repeated or map element of `parent`, reusing its wrapper if it has one.\"\"\"
+        cdef cytobuf.protobuf.message.Message result = parent._element(other)
+        if result is None:
+            result = {{ cdef_class.name }}.from_cpp(other, parent)
+            parent._track_element(result)
+        return result
+
+    @staticmethod
+    cdef dict _to_dict(
+        {{ cdef_class.name.name }}* message,
+        bint including_default_value_fields,
+        bint preserving_proto_field_name,
+        bint use_integers_for_enums,
+    ):
+        cdef dict result = {}
+    {%- if cdef_class.fields | selectattr("repeated") | list %}
+        cdef int i
+    {%- endif %}
+    {%- for field in cdef_class.fields if field.is_map %}
+        cdef {{ field.local_cpp_type(file.module) }}.const_iterator {{ field.name }}_iterator
+        cdef dict {{ field.name }}_value
+    {%- endfor %}
+    {%- for field in cdef_class.fields %}
+        {%- if field.is_map %}
+        if including_default_value_fields or message.{{ field.cpp_name }}().size():
+            {{ field.name }}_value = {}
+            {{ field.name }}_iterator = message.{{ field.cpp_name }}().cbegin()
+            while {{ field.name }}_iterator != message.{{ field.cpp_name }}().cend():
+                {{ field.name }}_value[{{ json_key(field.key_field, "dereference(" ~ field.name ~ "_iterator).first") }}] = {{ json_value(field.value_field, "dereference(" ~ field.name ~ "_iterator).second") }}
+                postincrement({{ field.name }}_iterator)
+            result[{{ dict_key(field) }}] = {{ field.name }}_value
+        {%- elif field.repeated %}
+        if including_default_value_fields or message.{{ field.cpp_name }}_size():
+            result[{{ dict_key(field) }}] = [
+                {{ json_value(field, "message." ~ field.cpp_name ~ "(i)") }}
+                for i in range(message.{{ field.cpp_name }}_size())
+            ]
+        {%- elif field.value_kind == 'message' %}
+        if message.has_{{ field.cpp_name }}():
+            result[{{ dict_key(field) }}] = {{ json_value(field, "message." ~ field.cpp_name ~ "()") }}
+        {%- else %}
+        if including_default_value_fields or {% if field.cpp_type == 'string' %}not message.{{ field.cpp_name }}().empty(){% else %}message.{{ field.cpp_name }}() != 0{% endif %}:
+            result[{{ dict_key(field) }}] = {{ json_value(field, "message." ~ field.cpp_name ~ "()") }}
+        {%- endif %}
+    {%- endfor %}
+        return result
+
+    @staticmethod
+    cdef int _merge_dict({{ cdef_class.name.name }}* message, dict value, bint ignore_unknown_fields) except -1:
+    {%- for field in cdef_class.fields if field.is_map %}
+        cdef {{ field.key_field.local_cpp_type(file.module) }} {{ field.name }}_key
     {%- endfor %}
+        for key, item in value.items():
+            try:
+    {%- for field in cdef_class.fields %}
+                {% if not loop.first %}el{% endif %}if key == "{{ field.json_name }}"{% if field.json_name != field.name %} or key == "{{ field.name }}"{% endif %}:
+        {%- if field.json_null %}
+                    cytobuf.protobuf.json_format.decode_well_known(message.mutable_{{ field.cpp_name }}(), item, ignore_unknown_fields)
+        {%- else %}
+                    if item is None:
+                        message.clear_{{ field.cpp_name }}()
+        {%- endif %}
+        {%- if field.json_null %}
+        {%- elif field.is_map %}
+                    elif not isinstance(item, dict):
+                        raise TypeError(f"dict expected, got {type(item).__name__}")
+                    else:
+                        for map_key, map_value in item.items():
+                            {{ field.name }}_key = {{ proto_key(field.key_field, "map_key") }}
+            {%- if field.value_field.well_known %}
+                            cytobuf.protobuf.json_format.decode_well_known(
+                                &dereference(message.mutable_{{ field.cpp_name }}())[{{ field.name }}_key], map_value, ignore_unknown_fields
+                            )
+            {%- elif field.value_field.value_kind == 'message' %}
+                            {{ field.value_field.python_type }}._merge_dict(
+                                &dereference(message.mutable_{{ field.cpp_name }}())[{{ field.name }}_key], map_value, ignore_unknown_fields
+                            )
+            {%- else %}
+                            dereference(message.mutable_{{ field.cpp_name }}())[{{ field.name }}_key] = {{ proto_value(field.value_field, "map_value") }}
+            {%- endif %}
+        {%- elif field.repeated %}
+                    elif not isinstance(item, list):
+                        raise TypeError(f"list expected, got {type(item).__name__}")
+                    else:
+                        for element in item:
+            {%- if field.well_known %}
+                            cytobuf.protobuf.json_format.decode_well_known(message.add_{{ field.cpp_name }}(), element, ignore_unknown_fields)
+            {%- elif field.value_kind == 'message' %}
+                            {{ field.python_type }}._merge_dict(message.add_{{ field.cpp_name }}(), element, ignore_unknown_fields)
+            {%- else %}
+                            message.add_{{ field.cpp_name }}({{ proto_value(field, "element") }})
+            {%- endif %}
+        {%- elif field.well_known %}
+                    else:
+                        cytobuf.protobuf.json_format.decode_well_known(message.mutable_{{ field.cpp_name }}(), item, ignore_unknown_fields)
+        {%- elif field.value_kind == 'message' %}
+                    else:
+                        {{ field.python_type }}._merge_dict(message.mutable_{{ field.cpp_name }}(), item, ignore_unknown_fields)
+        {%- else %}
+                    else:
+                        message.set_{{ field.cpp_name }}({{ proto_value(field, "item") }})
+        {%- endif %}
+    {%- endfor %}
+                {% if cdef_class.fields %}el{% endif %}if not ignore_unknown_fields:
+                    raise cytobuf.protobuf.json_format.ParseError(
+                        f'Message type "{{ cdef_class.name.name }}" has no field named "{key}"'
+                    )
+            except cytobuf.protobuf.json_format.ParseError:
+                raise
+            except (KeyError, OverflowError, TypeError, ValueError) as error:
+                raise cytobuf.protobuf.json_format.ParseError(f"Failed to parse {key} field: {error}") from error
+        return 0
+
+    @staticmethod
+    cdef dict _to_columns(vector[{{ cdef_class.name.name }}*]& messages, set fields):
+        cdef dict columns = {}
+        cdef size_t i
+        cdef int j
+        cdef void* data
+        cdef bint present
+        cdef vector[long long] offsets
+        cdef vector[long long] value_offsets
+        cdef string values
+    {%- for field in cdef_class.fields if field.value_kind == 'message' %}
+        cdef vector[{{ field.local_cpp_type(file.module) }}*] {{ field.name }}_messages
+    {%- endfor %}
+        if fields is not None:
+            {{ check_column_names(cdef_class, 'fields') | indent(4) }}
+    {%- for field in cdef_class.fields if not field.is_map %}
+        if fields is None or "{{ field.name }}" in fields:
+        {%- if field.value_kind == 'message' and field.repeated %}
+            offsets.assign(1, 0)
+            for i in range(messages.size()):
+                for j in range(messages[i].{{ field.cpp_name }}_size()):
+                    {{ field.name }}_messages.push_back(messages[i].mutable_{{ field.cpp_name }}(j))
+                offsets.push_back({{ field.name }}_messages.size())
+            columns["{{ field.name }}"] = cytobuf.protobuf.columns.ListColumn(
+                cytobuf.protobuf.columns.offsets_column(offsets),
+                {{ field.python_type }}._to_columns({{ field.name }}_messages, None),
+            )
+        {%- elif field.value_kind == 'message' %}
+            # Unset sub-messages are exported as their defaults, unless none of the rows set one,
+            # which also ends the recursion of recursive message types.
+            present = False
+            for i in range(messages.size()):
+                if messages[i].has_{{ field.cpp_name }}():
+                    present = True
+                    break
+            if present:
+                {{ field.name }}_messages.reserve(messages.size())
+                for i in range(messages.size()):
+                    {{ field.name }}_messages.push_back(<{{ field.local_cpp_type(file.module) }}*>&messages[i].{{ field.cpp_name }}())
+                columns["{{ field.name }}"] = {{ field.python_type }}._to_columns({{ field.name }}_messages, None)
+            else:
+                columns["{{ field.name }}"] = {}
+        {%- elif field.cpp_type == 'string' %}
+            value_offsets.assign(1, 0)
+            values.clear()
+            {%- if field.repeated %}
+            offsets.assign(1, 0)
+            for i in range(messages.size()):
+                for j in range(messages[i].{{ field.cpp_name }}_size()):
+                    values.append(messages[i].{{ field.cpp_name }}(j))
+                    value_offsets.push_back(values.size())
+                offsets.push_back(value_offsets.size() - 1)
+            columns["{{ field.name }}"] = cytobuf.protobuf.columns.ListColumn(
+                cytobuf.protobuf.columns.offsets_column(offsets),
+                cytobuf.protobuf.columns.binary_column(value_offsets, values, {{ field.value_kind == 'str' }}),
+            )
+            {%- else %}
+            for i in range(messages.size()):
+                values.append(messages[i].{{ field.cpp_name }}())
+                value_offsets.push_back(values.size())
+            columns["{{ field.name }}"] = cytobuf.protobuf.columns.binary_column(value_offsets, values, {{ field.value_kind == 'str' }})
+            {%- endif %}
+        {%- elif field.repeated %}
+            {%- set element_type, element_format = field.column_type %}
+            offsets.assign(1, 0)
+            for i in range(messages.size()):
+                offsets.push_back(offsets.back() + messages[i].{{ field.cpp_name }}_size())
+            column = cytobuf.protobuf.columns.new_column("{{ element_format }}", sizeof({{ element_type }}), offsets.back(), &data)
+            for i in range(messages.size()):
+                for j in range(messages[i].{{ field.cpp_name }}_size()):
+                    (<{{ element_type }}*>data)[offsets[i] + j] = messages[i].{{ field.cpp_name }}(j)
+            columns["{{ field.name }}"] = cytobuf.protobuf.columns.ListColumn(
+                cytobuf.protobuf.columns.offsets_column(offsets), column
+            )
+        {%- else %}
+            {%- set element_type, element_format = field.column_type %}
+            columns["{{ field.name }}"] = cytobuf.protobuf.columns.new_column("{{ element_format }}", sizeof({{ element_type }}), messages.size(), &data)
+            for i in range(messages.size()):
+                (<{{ element_type }}*>data)[i] = messages[i].{{ field.cpp_name }}()
+        {%- endif %}
+    {%- endfor %}
+        return columns
+
+    @staticmethod
+    cdef int _from_columns(vector[{{ cdef_class.name.name }}*]& messages, dict columns) except -1:
+        cdef size_t i
+        cdef long long j
+        cdef cytobuf.protobuf.columns.ColumnBuffer buffer
+        cdef const long long* offsets
+        cdef vector[string] values
+    {%- for field in cdef_class.fields if field.value_kind == 'message' %}
+        cdef vector[{{ field.local_cpp_type(file.module) }}*] {{ field.name }}_messages
+    {%- endfor %}
+        {{ check_column_names(cdef_class, 'columns.keys()') }}
+    {%- for field in cdef_class.fields if not field.is_map %}
+        column = columns.get("{{ field.name }}")
+        if column is not None:
+        {%- if field.repeated %}
+            buffer = cytobuf.protobuf.columns.list_offsets(column, messages.size())
+            offsets = <const long long*>buffer.data
+            column = column.values
+        {%- endif %}
+        {%- if field.value_kind == 'message' and field.repeated %}
+            for i in range(messages.size()):
+                for j in range(offsets[i], offsets[i + 1]):
+                    {{ field.name }}_messages.push_back(messages[i].add_{{ field.cpp_name }}())
+            {{ field.python_type }}._from_columns({{ field.name }}_messages, column)
+        {%- elif field.value_kind == 'message' %}
+            # An empty dict is the export of a field that none of the rows set.
+            for i in range(messages.size() if column else 0):
+                {{ field.name }}_messages.push_back(messages[i].mutable_{{ field.cpp_name }}())
+            {{ field.python_type }}._from_columns({{ field.name }}_messages, column)
+        {%- elif field.cpp_type == 'string' and field.repeated %}
+            cytobuf.protobuf.columns.binary_values(column, offsets[messages.size()], values)
+            for i in range(messages.size()):
+                for j in range(offsets[i], offsets[i + 1]):
+                    messages[i].add_{{ field.cpp_name }}(values[j])
+        {%- elif field.cpp_type == 'string' %}
+            cytobuf.protobuf.columns.binary_values(column, messages.size(), values)
+            for i in range(messages.size()):
+                messages[i].set_{{ field.cpp_name }}(values[i])
+        {%- elif field.repeated %}
+            {%- set element_type, element_format = field.column_type %}
+            buffer = cytobuf.protobuf.columns.ColumnBuffer(column, b"{{ element_format }}", sizeof({{ element_type }}), offsets[messages.size()])
+            for i in range(messages.size()):
+                for j in range(offsets[i], offsets[i + 1]):
+                    messages[i].add_{{ field.cpp_name }}(<{{ field.local_cpp_type(file.module) }}>(<const {{ element_type }}*>buffer.data)[j])
+        {%- else %}
+            {%- set element_type, element_format = field.column_type %}
+            buffer = cytobuf.protobuf.columns.ColumnBuffer(column, b"{{ element_format }}", sizeof({{ element_type }}), messages.size())
+            for i in range(messages.size()):
+                messages[i].set_{{ field.cpp_name }}(<{{ field.local_cpp_type(file.module) }}>(<const {{ element_type }}*>buffer.data)[i])
+        {%- endif %}
+    {%- endfor %}
+        return 0
+
+    def to_dict(
+            self,
+            bint including_default_value_fields = False,
+            bint preserving_proto_field_name = False,
+            bint use_integers_for_enums = False,
+    ):
+        \"\"\"Converts this message to a {% if not cdef_class.well_known %}dict{% else %}value{% endif %} matching `json_format.MessageToDict`.\"\"\"
+        self._load_lazy_fields()
+    {%- if cdef_class.well_known %}
+        return cytobuf.protobuf.json_format.encode_well_known(
+            self._internal[0],
+            including_default_value_fields,
+            preserving_proto_field_name,
+            use_integers_for_enums,
+        )
+    {%- else %}
+        return {{ cdef_class.name }}._to_dict(
+            self._message(),
+            including_default_value_fields,
+            preserving_proto_field_name,
+            use_integers_for_enums,
+        )
+    {%- endif %}
+
+    @classmethod
+    def from_dict(cls, {% if not cdef_class.well_known %}dict {% endif %}value, bint ignore_unknown_fields = False):
+        \"\"\"Builds a new message from a {% if not cdef_class.well_known %}dict{% else %}value{% endif %} in the format produced by `to_dict`.\"\"\"
+        cdef {{ cdef_class.name }} result = cls()
+    {%- if cdef_class.well_known %}
+        result._merge_from_json(value, ignore_unknown_fields)
+    {%- else %}
+        {{ cdef_class.name }}._merge_dict(result._message(), value, ignore_unknown_fields)
+    {%- endif %}
         return result
-        
-    {%- for map_field in cdef_class.fields if map_field.is_map %}
+
+    @classmethod
+    def parse_columns(
+            cls,
+            messages,
+            offsets = None,
+            fields = None,
+            cytobuf.protobuf.message.ParseOptions options = None,
+    ):
+        \"\"\"Parses a batch of serialized messages into columns, as exported by `to_columns`.
+
+        `messages` is a sequence of buffer-protocol objects, a pyarrow binary array or, with
+        `offsets`, a single buffer holding the messages back to back.  They're decoded in C++ with
+        the GIL released onto a temporary arena, without creating a message object per record.
+        Only the fields named in `fields` are exported, if given.
+        \"\"\"
+        return {{ cdef_class.name }}._parse_columns(
+            cytobuf.protobuf.message.Payloads(messages, offsets), fields, options
+        )
+
+    @classmethod
+    def parse_arrow(
+            cls,
+            messages,
+            offsets = None,
+            fields = None,
+            cytobuf.protobuf.message.ParseOptions options = None,
+    ):
+        \"\"\"Like `parse_columns`, but returns the columns as a `pyarrow.RecordBatch`.\"\"\"
+        cdef cytobuf.protobuf.message.Payloads payloads = cytobuf.protobuf.message.Payloads(messages, offsets)
+        return cytobuf.protobuf.columns.to_arrow(
+            {{ cdef_class.name }}._parse_columns(payloads, fields, options), len(payloads)
+        )
+
+    @staticmethod
+    cdef dict _parse_columns(
+            cytobuf.protobuf.message.Payloads payloads,
+            object fields,
+            cytobuf.protobuf.message.ParseOptions options,
+    ):
+        cdef cytobuf.protobuf.arena.Arena arena = cytobuf.protobuf.arena.Arena()
+        cdef set selected = None if fields is None else set(fields)
+        cdef vector[cytobuf.protobuf.common.Message*] targets
+        cdef vector[{{ cdef_class.name.name }}*] parsed
+        cdef {{ cdef_class.name.name }}* message
+        cdef size_t i
+        targets.reserve(payloads.sizes.size())
+        parsed.reserve(payloads.sizes.size())
+        for i in range(payloads.sizes.size()):
+            message = cytobuf.protobuf.common.Arena.CreateMessage[{{ cdef_class.name.name }}](arena._arena)
+            targets.push_back(message)
+            parsed.push_back(message)
+        cytobuf.protobuf.message.parse_payloads(targets, payloads, options)
+        return {{ cdef_class.name }}._to_columns(parsed, selected)
+
+    def CopyFrom(self, {{ cdef_class.name }} other not None):
+        if other is self:
+            return
+        self._check_exports()
+        self._reset_cache(False)
+        self._lazy = None
+        other._load_lazy_fields()
+        self._message().CopyFrom(other._message()[0])
+
+    def MergeFrom(self, {{ cdef_class.name }} other not None):
+        self._check_exports()
+        self._load_lazy_fields()
+        other._load_lazy_fields()
+        if other is self:
+            # C++ doesn't allow merging a message into itself, so merge a serialized copy.
+            self.MergeFromString(self.SerializeToString())
+        else:
+            self._message().MergeFrom(other._message()[0])
+
+    def Swap(self, {{ cdef_class.name }} other not None):
+        if other is self:
+            return
+        self._check_exports()
+        other._check_exports()
+        self._reset_cache(True)
+        other._reset_cache(True)
+        self._load_lazy_fields()
+        other._load_lazy_fields()
+        self._message().Swap(other._message())
+
+    {%- for field in cdef_class.fields if field.repeated or field.is_map %}
+
+    @property
+    def {{ field.name }}(self):
+        cdef __{{ cdef_class.name }}__{{ field.name }}__container container
+        # Containers are created when the field is first accessed and kept for later accesses.
+        if self._{{ field.name }}_cache is not None:
+            return self._{{ field.name }}_cache
+        container = __{{ cdef_class.name }}__{{ field.name }}__container()
+        container._instance = self._message()
+        container._parent = self
+        self._{{ field.name }}_cache = container
+        return container
     {%- endfor %}
 
     {%- for field in cdef_class.fields if not field.repeated and not field.is_map %}
@@ -251,11 +1179,28 @@ cdef class {{ cdef_class.name }}(cytobuf.protobuf.message.Message):
 
     @property
     def {{ field.name }}(self):
-        return {{ field.python_type }}.from_cpp(self._message().mutable_{{ field.cpp_name }}())
+        cdef {{ field.local_cpp_type(file.module) }}* instance
+        cdef cytobuf.protobuf.message.Message cached
+        self._load_lazy_field({{ field.number }})
+        instance = self._message().mutable_{{ field.cpp_name }}()
+        # The wrapper is only reused while it still points at the sub-message's current storage.
+        cached = self._{{ field.name }}_cache
+        if cached is not None and cached._internal == instance:
+            return cached
+        cached = {{ field.python_type }}.from_cpp(instance, self)
+        self._{{ field.name }}_cache = cached
+        return cached
         {%- endif %}
 
     @{{ field.name }}.deleter
     def {{ field.name }}(self):
+        {%- if field.field_type.name == 'message' %}
+        self._load_lazy_field({{ field.number }})
+        if self._{{ field.name }}_cache is not None:
+            if self._internal.GetArena() is NULL:
+                self._detach_cached(self._{{ field.name }}_cache, self._message().release_{{ field.cpp_name }}())
+            self._{{ field.name }}_cache = None
+        {%- endif %}
         self._message().clear_{{ field.cpp_name }}()
     {%- endfor %}
 {%- endfor %}
@@ -267,11 +1212,11 @@ message_pyx_template = Template(MESSAGE_PYX_TEMPLATE)
 
 
 PY_ENUM_TEMPLATE = """\
-from enum import Enum
+from enum import IntEnum
 
 {%- for enum in file.enums %}
 
-class {{ enum.name }}(Enum):
+class {{ enum.name }}(IntEnum):
     {%- for value in enum.value_names %}
     {{ value.name.fully_unwrapped }} = {{ value.number }}
     {%- endfor %}
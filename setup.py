@@ -13,7 +13,14 @@ setup(
     packages=find_packages(),
     ext_modules=cythonize(
         [
+            "cytobuf/protobuf/arena.pyx",
+            "cytobuf/protobuf/columns.pyx",
+            "cytobuf/protobuf/delimited.pyx",
+            "cytobuf/protobuf/enum_table.pyx",
+            "cytobuf/protobuf/json_format.pyx",
             "cytobuf/protobuf/message.pyx",
+            "cytobuf/protobuf/parallel.pyx",
+            "cytobuf/protobuf/projection.pyx",
             "cytobuf/protobuf/repeated_field.pyx",
             "cytobuf/protobuf/repeated_int_field.pyx",
             "cytobuf/protobuf/repeated_uint_field.pyx",
@@ -22,6 +29,7 @@ setup(
             "cytobuf/protobuf/repeated_float_field.pyx",
             "cytobuf/protobuf/repeated_double_field.pyx",
             "cytobuf/protobuf/repeated_bool_field.pyx",
+            "cytobuf/protobuf/strings.pyx",
         ]
     ),
     include_package_data=True,
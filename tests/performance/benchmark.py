@@ -1,14 +1,23 @@
 import argparse
+import array
 import gc
 import json
 import linecache
+import pickle
 import random
 import string
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from itertools import chain
 from timeit import Timer
 
+from cytobuf.protobuf.arena import Arena
+from cytobuf.protobuf.message import FieldMask
+from cytobuf.protobuf.message import ParseOptions
 from cytobuf_pb.addressbook.models.addressbook_pb2 import AddressBook as CyAddressBook
+from cytobuf_type_test.type_test_pb2 import TypeTester as CyTypeTester
 from google.protobuf import json_format
 from google.protobuf.internal import api_implementation  # type: ignore
 from memory_profiler import LineProfiler
@@ -17,6 +26,7 @@ sys.path.append("../../scratch/py")
 
 from pb.addressbook.models.addressbook_pb2 import AddressBook as CppAddressBook  # noqa: E402
 from pb.people.models.people_pb2 import Person as CppPerson  # noqa: E402
+from pb.type_test_pb2 import TypeTester as CppTypeTester  # noqa: E402
 from pyrobuf_flat_pb import AddressBook as PyroAddressBook  # noqa: E402
 
 NS_PER_SEC = 1e9
@@ -91,6 +101,186 @@ def benchmark_memory(name, baseline_proto, proto_class, baseline_allocated_memor
     return allocated_memory
 
 
+def _run_threaded(function, thread_count, iterations):
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        start = time.perf_counter()
+        for _ in executor.map(lambda _: function(), range(iterations)):
+            pass
+        return time.perf_counter() - start
+
+
+def benchmark_threads(title, function, thread_counts, iterations=200):
+    print(f"\t{title}:")
+    baseline_throughput = None
+    for thread_count in thread_counts:
+        elapsed = min(_run_threaded(function, thread_count, iterations) for _ in range(3))
+        throughput = iterations / elapsed
+        scaling_str = ""
+        if baseline_throughput:
+            scaling_str = f" {throughput / baseline_throughput:,.2f} X Scaling"
+        else:
+            baseline_throughput = throughput
+        print(f"\t\t{thread_count} threads\t{throughput:,.2f} ops/s{scaling_str}")
+
+
+def parse_fresh(constructor, serialized_string):
+    def _parse():
+        value = constructor()
+        value.ParseFromString(serialized_string)
+
+    return _parse
+
+
+def parse_on_arena(arena, serialized_string):
+    def _parse():
+        value = CyAddressBook(arena=arena)
+        value.ParseFromString(serialized_string)
+        del value
+        arena.Reset()
+
+    return _parse
+
+
+def parse_each(constructor, serialized_strings):
+    def _parse():
+        result = []
+        for serialized_string in serialized_strings:
+            value = constructor()
+            value.ParseFromString(serialized_string)
+            result.append(value)
+        return result
+
+    return _parse
+
+
+def parse_many_on_arena(arena, serialized_strings):
+    def _parse():
+        values = CyAddressBook.parse_many(serialized_strings, arena=arena)
+        del values
+        arena.Reset()
+
+    return _parse
+
+
+def benchmark_map(entry_count):
+    baseline = CppTypeTester()
+    for x in range(entry_count):
+        baseline.map_to_int32_value[f"key {x}"] = x
+    cpp_type_tester = CppTypeTester()
+    cython_type_tester = CyTypeTester()
+    cpp_type_tester.ParseFromString(baseline.SerializeToString())
+    cython_type_tester.ParseFromString(baseline.SerializeToString())
+    key = f"key {entry_count // 2}"
+    benchmarks = {
+        "Lookup": {
+            "baseline": lambda: cpp_type_tester.map_to_int32_value[key],
+            "cytobuf": lambda: cython_type_tester.map_to_int32_value[key],
+        },
+        "Contains": {
+            "baseline": lambda: key in cpp_type_tester.map_to_int32_value,
+            "cytobuf": lambda: key in cython_type_tester.map_to_int32_value,
+        },
+        "Items": {
+            "baseline": lambda: list(cpp_type_tester.map_to_int32_value.items()),
+            "cytobuf": lambda: cython_type_tester.map_to_int32_value.items(),
+        },
+    }
+    for title, variants in benchmarks.items():
+        print(f"\t{title}:")
+        baseline_result = None
+        for implementation, function in variants.items():
+            result = run_timeit(function, f"\t\t{implementation.ljust(8)}", baseline_result)
+            if implementation == "baseline":
+                baseline_result = result
+
+
+def benchmark_repeated(sample_count):
+    samples = array.array("d", (random.random() for _ in range(sample_count)))
+    cpp_type_tester = CppTypeTester()
+    cython_type_tester = CyTypeTester()
+    cpp_type_tester.repeated_double_value.extend(samples)
+    cython_type_tester.repeated_double_value.extend_from_buffer(samples)
+    enum_values = [random.randint(0, 2) for _ in range(sample_count)]
+    cpp_type_tester.repeated_enum_value.extend(enum_values)
+    cython_type_tester.repeated_enum_value.extend(enum_values)
+    benchmarks = {
+        "Read": {
+            "baseline": lambda: list(cpp_type_tester.repeated_double_value),
+            "cytobuf": lambda: list(cython_type_tester.repeated_double_value),
+            "cytobuf (buffer)": lambda: memoryview(cython_type_tester.repeated_double_value),
+        },
+        "Read Enums": {
+            "baseline": lambda: list(cpp_type_tester.repeated_enum_value),
+            "cytobuf": lambda: list(cython_type_tester.repeated_enum_value),
+        },
+        "Write": {
+            "baseline": lambda: CppTypeTester().repeated_double_value.extend(samples),
+            "cytobuf": lambda: CyTypeTester().repeated_double_value.extend(samples.tolist()),
+            "cytobuf (buffer)": lambda: CyTypeTester().repeated_double_value.extend_from_buffer(
+                samples
+            ),
+        },
+    }
+    for title, variants in benchmarks.items():
+        print(f"\t{title}:")
+        baseline_result = None
+        for implementation, function in variants.items():
+            result = run_timeit(function, f"\t\t{implementation.ljust(16)}", baseline_result)
+            if implementation == "baseline":
+                baseline_result = result
+
+
+def _echo(message):
+    return message
+
+
+def benchmark_pickle(item_count, iterations=200):
+    baseline_proto = build_baseline_proto(item_count)
+    cpp_address_book = CppAddressBook()
+    cython_address_book = CyAddressBook()
+    cpp_address_book.ParseFromString(baseline_proto)
+    cython_address_book.ParseFromString(baseline_proto)
+    print("\tPickle Round Trip:")
+    baseline_result = run_timeit(
+        lambda: pickle.loads(pickle.dumps(cpp_address_book, protocol=5)), "\t\tbaseline"
+    )
+    run_timeit(
+        lambda: pickle.loads(pickle.dumps(cython_address_book, protocol=5)),
+        "\t\tcytobuf ",
+        baseline_result,
+    )
+    print("\tProcess Pool Round Trip:")
+    baseline_result = None
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        for implementation, message in (
+            ("baseline", cpp_address_book),
+            ("cytobuf ", cython_address_book),
+        ):
+            executor.submit(_echo, message).result()
+            start = time.perf_counter()
+            for _ in executor.map(_echo, [message] * iterations):
+                pass
+            result = (time.perf_counter() - start) / iterations * NS_PER_SEC
+            speedup_str = f" {baseline_result / result:,.2f} X Speedup" if baseline_result else ""
+            print(f"\t\t{implementation}\t{result:,.2f}ns{speedup_str}")
+            baseline_result = baseline_result or result
+
+
+def benchmark_parallel_serialize(item_count, thread_counts):
+    cpp_address_book = CppAddressBook()
+    cpp_address_book.ParseFromString(build_baseline_proto(item_count))
+    cython_address_book = CyAddressBook()
+    cython_address_book.ParseFromString(cpp_address_book.SerializeToString())
+    print("\tSerialize:")
+    baseline_result = run_timeit(cpp_address_book.SerializeToString, "\t\tbaseline\t")
+    for thread_count in thread_counts:
+        run_timeit(
+            lambda: cython_address_book.SerializeToString(threads=thread_count),
+            f"\t\tcytobuf ({thread_count} threads)",
+            baseline_result,
+        )
+
+
 def build_baseline_proto(item_count):
     baseline = CppAddressBook()
     for _ in range(item_count):
@@ -106,6 +296,16 @@ def build_baseline_proto(item_count):
     return baseline_proto
 
 
+def build_nested_type_tester(depth):
+    type_tester = CppTypeTester()
+    type_tester.int32_value = 1
+    sub_message = type_tester.sub_message_value
+    for _ in range(depth):
+        sub_message.value = random_string(20)
+        sub_message = sub_message.child
+    return type_tester.SerializeToString()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Runs a benchmark of Marshmallow.")
     parser.add_argument(
@@ -114,8 +314,46 @@ def main():
         default="1,10,100",
         help="Comma-seperated list of number of items in the protobuf",
     )
+    parser.add_argument(
+        "--threads",
+        type=str,
+        default="1,2,4,8",
+        help="Comma-seperated list of thread counts for the multi-threaded benchmark",
+    )
+    parser.add_argument(
+        "--threaded-items",
+        type=int,
+        default=1000,
+        help="Number of items in the protobuf used for the multi-threaded benchmark",
+    )
+    parser.add_argument(
+        "--parallel-items",
+        type=str,
+        default="10000,100000,1000000",
+        help="Comma-seperated list of number of items in the protobuf serialized in parallel",
+    )
+    parser.add_argument(
+        "--map-entries",
+        type=int,
+        default=10000,
+        help="Number of entries in the map used for the map benchmark",
+    )
+    parser.add_argument(
+        "--repeated-samples",
+        type=int,
+        default=100000,
+        help="Number of samples in the repeated field used for the repeated field benchmark",
+    )
+    parser.add_argument(
+        "--pickle-items",
+        type=int,
+        default=100,
+        help="Number of items in the protobuf used for the pickle benchmark",
+    )
     args = parser.parse_args()
     items = [int(x.strip()) for x in args.items.split(",")]
+    thread_counts = [int(x.strip()) for x in args.threads.split(",")]
+    parallel_items = [int(x.strip()) for x in args.parallel_items.split(",")]
     if api_implementation.Type() != "cpp":
         print("*** WARNING google.protobuf isn't using the native extension ***")
 
@@ -130,26 +368,71 @@ def main():
         cpp_address_book.ParseFromString(baseline_proto)
         cython_address_book.ParseFromString(baseline_proto)
         pyro_address_book.ParseFromString(baseline_proto)
+        baseline_buffer = memoryview(bytearray(baseline_proto))
+        serialize_buffer = bytearray(len(baseline_proto))
+        batch = [baseline_proto] * 100
+        email_options = ParseOptions(field_mask=FieldMask(CyAddressBook, ["people.email"]))
         json_str = json_format.MessageToJson(cpp_address_book).encode("utf-8")
         py_dict = json.loads(json_str)
         cpp_person = cpp_address_book.people[0]
         cython_person = cython_address_book.people[0]
         pyrobuf_person = pyro_address_book.people[0]
         python_person = py_dict["people"][0]
+        cpp_type_tester = CppTypeTester()
+        cpp_type_tester.sub_message_value.child.value = random_string()
+        cpp_type_tester.string_value = cpp_type_tester.cached_string_value = random_string(2)
+        cython_type_tester = CyTypeTester()
+        cython_type_tester.ParseFromString(cpp_type_tester.SerializeToString())
+        nested_type_tester = build_nested_type_tester(min(item_count, 64))
+        lazy_options = ParseOptions(lazy=True)
+        cpp_nested_tester = CppTypeTester()
+        cython_nested_tester = CyTypeTester()
         print("\t*** Compute ***")
         benchmarks = {
             "Parse": {
                 "json.loads": lambda: json.loads(json_str),
                 "baseline": lambda: cpp_address_book.ParseFromString(baseline_proto),
                 "cytobuf": lambda: cython_address_book.ParseFromString(baseline_proto),
+                "cytobuf (buffer)": lambda: cython_address_book.ParseFromBuffer(baseline_buffer),
+                "cytobuf (people.email)": lambda: cython_address_book.ParseFromString(
+                    baseline_proto, email_options
+                ),
                 "pyrobuf": lambda: pyro_address_book.ParseFromString(baseline_proto),
             },
+            "Parse New Message": {
+                "baseline": parse_fresh(CppAddressBook, baseline_proto),
+                "cytobuf": parse_fresh(CyAddressBook, baseline_proto),
+                "cytobuf (arena)": parse_on_arena(Arena(), baseline_proto),
+            },
+            "Parse Nested Sub-Messages": {
+                "baseline": lambda: cpp_nested_tester.ParseFromString(nested_type_tester),
+                "cytobuf": lambda: cython_nested_tester.ParseFromString(nested_type_tester),
+                "cytobuf (lazy)": lambda: cython_nested_tester.ParseFromString(
+                    nested_type_tester, lazy_options
+                ),
+            },
+            "Parse Batch of 100": {
+                "baseline": parse_each(CppAddressBook, batch),
+                "cytobuf": parse_each(CyAddressBook, batch),
+                "cytobuf (parse_many)": lambda: CyAddressBook.parse_many(batch),
+                "cytobuf (parse_many arena)": parse_many_on_arena(Arena(), batch),
+                "cytobuf (parse_columns)": lambda: CyAddressBook.parse_columns(batch),
+            },
             "Serialize": {
                 "json.dumps": lambda: json.loads(json_str),
                 "baseline": lambda: cpp_address_book.SerializeToString(),
                 "cytobuf": lambda: cython_address_book.SerializeToString(),
+                "cytobuf (into)": lambda: cython_address_book.SerializeInto(serialize_buffer),
                 "pyrobuf": lambda: pyro_address_book.SerializeToString(),
             },
+            "CopyFrom": {
+                "baseline": lambda: CppAddressBook().CopyFrom(cpp_address_book),
+                "cytobuf": lambda: CyAddressBook().CopyFrom(cython_address_book),
+            },
+            "MergeFrom": {
+                "baseline": lambda: CppAddressBook().MergeFrom(cpp_address_book),
+                "cytobuf": lambda: CyAddressBook().MergeFrom(cython_address_book),
+            },
             "FromJson": {
                 "baseline": lambda: json_format.Parse(json_str, cpp_address_book),
                 "cytobuf": lambda: cython_address_book.FromJsonString(json_str),
@@ -158,8 +441,23 @@ def main():
             "ToJson": {
                 "baseline": lambda: json_format.MessageToJson(cpp_address_book),
                 "cytobuf": lambda: cython_address_book.ToJsonString(),
+                "cytobuf (bytes)": lambda: cython_address_book.ToJsonBytes(),
                 "pyrobuf": lambda: pyro_address_book.SerializeToJson(),
             },
+            "FromDict": {
+                "baseline": lambda: json_format.ParseDict(py_dict, CppAddressBook()),
+                "cytobuf": lambda: CyAddressBook.from_dict(py_dict),
+            },
+            "ToDict": {
+                "baseline": lambda: json_format.MessageToDict(cpp_address_book),
+                "cytobuf": lambda: cython_address_book.to_dict(),
+            },
+            "ToColumns": {
+                "baseline": lambda: [
+                    (person.name, person.id, person.email) for person in cpp_address_book.people
+                ],
+                "cytobuf": lambda: cython_address_book.people.to_columns(),
+            },
             "Iterate": {
                 "json": lambda: list(py_dict["people"]),
                 "baseline": lambda: list(cpp_address_book.people),
@@ -172,6 +470,15 @@ def main():
                 "cytobuf": lambda: cython_person.name,
                 "pyrobuf": lambda: pyrobuf_person.name,
             },
+            "String Field Access": {
+                "baseline": lambda: cpp_type_tester.string_value,
+                "cytobuf": lambda: cython_type_tester.string_value,
+                "cytobuf (cached)": lambda: cython_type_tester.cached_string_value,
+            },
+            "Nested Field Access": {
+                "baseline": lambda: cpp_type_tester.sub_message_value.child.value,
+                "cytobuf": lambda: cython_type_tester.sub_message_value.child.value,
+            },
         }
         longest_implementation = len(
             max(
@@ -195,6 +502,32 @@ def main():
         baseline = benchmark_memory("baseline", baseline_proto, CppAddressBook)
         benchmark_memory("cytobuf ", baseline_proto, CyAddressBook, baseline)
         benchmark_memory("pyrobuf ", baseline_proto, PyroAddressBook, baseline)
+        memory_arena = Arena()
+        benchmark_memory(
+            "cytobuf (arena)", baseline_proto, lambda: CyAddressBook(arena=memory_arena), baseline
+        )
+
+    print(f"\n{args.threaded_items} Items per proto, multi-threaded:")
+    threaded_proto = build_baseline_proto(args.threaded_items)
+    threaded_address_book = CyAddressBook()
+    threaded_address_book.ParseFromString(threaded_proto)
+    benchmark_threads(
+        "Parse", lambda: CyAddressBook().ParseFromString(threaded_proto), thread_counts
+    )
+    benchmark_threads("Serialize", threaded_address_book.SerializeToString, thread_counts)
+
+    for item_count in parallel_items:
+        print(f"\n{item_count} Items per proto, serialized in parallel:")
+        benchmark_parallel_serialize(item_count, thread_counts)
+
+    print(f"\n{args.map_entries} Entries per map:")
+    benchmark_map(args.map_entries)
+
+    print(f"\n{args.repeated_samples} Samples per repeated double field:")
+    benchmark_repeated(args.repeated_samples)
+
+    print(f"\n{args.pickle_items} Items per proto, pickled:")
+    benchmark_pickle(args.pickle_items)
 
 
 if __name__ == "__main__":
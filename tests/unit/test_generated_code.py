@@ -1,11 +1,27 @@
+import array
+import copy
+import gc
 import json
+import mmap
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 from enum import EnumMeta
+from enum import IntEnum
 
 import pytest
 from cytobuf_pb.addressbook.models import addressbook_pb2
 from cytobuf_pb.people.models import people_pb2
 from cytobuf_type_test import type_test_pb2
 
+from cytobuf.protobuf.arena import Arena
+from cytobuf.protobuf.delimited import DelimitedReader
+from cytobuf.protobuf.delimited import DelimitedWriter
+from cytobuf.protobuf.json_format import ParseError
+from cytobuf.protobuf.message import DecodeError
+from cytobuf.protobuf.message import FieldMask
+from cytobuf.protobuf.message import ParseOptions
+
 BASELINE_ATTRIBUTES = {
     "__all__",
     "__builtins__",
@@ -33,6 +49,18 @@ def test_enum():
     assert phone_type.MOBILE.value == 0
     assert phone_type.HOME.value == 1
     assert phone_type.WORK.value == 2
+    assert issubclass(phone_type, IntEnum)
+
+
+def test_enum_read_returns_members():
+    test_type = type_test_pb2.TypeTester()
+    test_type.repeated_enum_value.extend([2, type_test_pb2.TopLevelEnum.VALUE_1])
+    assert test_type.repeated_enum_value[0] is type_test_pb2.TopLevelEnum.VALUE_2
+    assert list(test_type.repeated_enum_value) == [2, 1]
+    # Values missing from the enum definition are returned as plain ints.
+    test_type.repeated_enum_value.add(7)
+    assert type(test_type.repeated_enum_value[-1]) is int
+    assert test_type.to_dict() == {"repeatedEnumValue": ["VALUE_2", "VALUE_1", 7]}
 
 
 @pytest.mark.parametrize("value", [1, 1])
@@ -131,6 +159,20 @@ def test_floats(float_type):
         assert getattr(test_type, f"{float_type}_value") == 0.3333333432674408
 
 
+def test_cached_string():
+    test_type = type_test_pb2.TypeTester()
+    test_type.cached_string_value = "US"
+    value = test_type.cached_string_value
+    assert value == "US"
+    assert test_type.cached_string_value is value
+    other = type_test_pb2.TypeTester()
+    other.cached_string_value = "US"
+    assert other.cached_string_value is value
+    test_type.cached_string_value = "\U0001f600" * 100
+    assert test_type.cached_string_value == "\U0001f600" * 100
+    assert json.loads(test_type.ToJsonString()) == test_type.to_dict()
+
+
 def test_string_unicode():
     person = people_pb2.Person()
     person.name = "\U0001f600lol"
@@ -253,3 +295,1243 @@ def test_map_message_value():
         ("foo", "hi"),
         ("bar", "meh"),
     }
+
+
+def test_map_views():
+    test_type = type_test_pb2.TypeTester()
+    test_type.map_to_int32_value.update({"a": 1, "b": 2}, c=3)
+    assert sorted(test_type.map_to_int32_value.keys()) == ["a", "b", "c"]
+    assert sorted(test_type.map_to_int32_value.values()) == [1, 2, 3]
+    assert sorted(test_type.map_to_int32_value.items()) == [("a", 1), ("b", 2), ("c", 3)]
+    assert test_type.map_to_int32_value.to_dict() == {"a": 1, "b": 2, "c": 3}
+    assert test_type.map_to_int32_value.get("b") == 2
+    assert test_type.map_to_int32_value.get("missing") is None
+    assert test_type.map_to_int32_value.get("missing", -1) == -1
+    del test_type.map_to_int32_value["a"]
+    assert "a" not in test_type.map_to_int32_value
+    with pytest.raises(KeyError):
+        del test_type.map_to_int32_value["a"]
+
+
+def test_map_string_value():
+    test_type = type_test_pb2.TypeTester()
+    assert test_type.map_to_string_value["missing"] == ""
+    assert "missing" not in test_type.map_to_string_value
+    test_type.map_to_string_value["greeting"] = "hello"
+    assert test_type.map_to_string_value["greeting"] == "hello"
+    assert test_type.map_to_string_value.items() == [("greeting", "hello")]
+    round_tripped = type_test_pb2.TypeTester()
+    round_tripped.ParseFromString(test_type.SerializeToString())
+    assert round_tripped.map_to_string_value.to_dict() == {"greeting": "hello"}
+
+
+def test_map_message_update():
+    source = type_test_pb2.TypeTester()
+    source.map_to_submessage_value["foo"].value = "hi"
+    test_type = type_test_pb2.TypeTester()
+    test_type.map_to_submessage_value.update(source.map_to_submessage_value)
+    source.map_to_submessage_value["foo"].value = "changed"
+    assert test_type.map_to_submessage_value.get("foo").value == "hi"
+    assert test_type.map_to_submessage_value.get("bar") is None
+    submessages = test_type.map_to_submessage_value.to_dict()
+    assert {k: m.value for k, m in submessages.items()} == {"foo": "hi"}
+    with pytest.raises(TypeError):
+        test_type.map_to_submessage_value.update({"bar": None})
+    assert "bar" not in test_type.map_to_submessage_value
+
+
+def test_repeated_numeric_buffer():
+    test_type = type_test_pb2.TypeTester()
+    assert memoryview(test_type.repeated_double_value).tolist() == []
+    test_type.repeated_double_value.extend_from_buffer(array.array("d", [1.5, 2.5]))
+    test_type.repeated_double_value.add(3.5)
+    view = memoryview(test_type.repeated_double_value)
+    assert view.format == "d"
+    assert view.tolist() == [1.5, 2.5, 3.5]
+    view[0] = 0.5
+    view.release()
+    assert list(test_type.repeated_double_value) == [0.5, 2.5, 3.5]
+    assert memoryview(test_type.repeated_double_value).toreadonly().readonly
+
+    test_type.repeated_int64_value.extend_from_buffer(array.array("q", [-1, 2**40]))
+    test_type.repeated_int32_value.extend_from_buffer(array.array("i", [7, 8]))
+    test_type.repeated_bool_value.extend_from_buffer(memoryview(bytes([1, 0])).cast("?"))
+    round_tripped = type_test_pb2.TypeTester()
+    round_tripped.ParseFromString(test_type.SerializeToString())
+    assert memoryview(round_tripped.repeated_int64_value).tolist() == [-1, 2**40]
+    assert memoryview(round_tripped.repeated_int32_value).tolist() == [7, 8]
+    assert memoryview(round_tripped.repeated_bool_value).tolist() == [True, False]
+
+
+def test_repeated_numeric_buffer_errors():
+    test_type = type_test_pb2.TypeTester()
+    with pytest.raises(ValueError):
+        test_type.repeated_int64_value.extend_from_buffer(array.array("d", [1.0]))
+    with pytest.raises(ValueError):
+        test_type.repeated_int64_value.extend_from_buffer(array.array("i", [1]))
+    with memoryview(test_type.repeated_double_value):
+        with pytest.raises(BufferError):
+            test_type.repeated_double_value.add(1.0)
+        with pytest.raises(BufferError):
+            test_type.repeated_double_value.extend_from_buffer(array.array("d", [1.0]))
+    test_type.repeated_double_value.add(1.0)
+    assert list(test_type.repeated_double_value) == [1.0]
+
+
+def test_repeated_numeric_buffer_blocks_message_changes():
+    test_type = type_test_pb2.TypeTester()
+    test_type.repeated_double_value.extend([1.0, 2.0])
+    serialized = test_type.SerializeToString()
+    other = type_test_pb2.TypeTester()
+    with memoryview(test_type.repeated_double_value) as view:
+        for modify in (
+            lambda: test_type.ParseFromString(serialized),
+            lambda: test_type.MergeFromString(serialized),
+            lambda: test_type.Clear(),
+            lambda: test_type.CopyFrom(other),
+            lambda: test_type.MergeFrom(other),
+            lambda: test_type.Swap(other),
+            lambda: other.Swap(test_type),
+            lambda: test_type.FromJsonString("{}"),
+        ):
+            with pytest.raises(BufferError):
+                modify()
+        assert view.tolist() == [1.0, 2.0]
+    test_type.Clear()
+    # The fields of elements are reallocated along with their message.
+    items = type_test_pb2.TypeTesterList()
+    items.items.add().repeated_double_value.add(1.0)
+    with memoryview(items.items[0].repeated_double_value):
+        with pytest.raises(BufferError):
+            items.MergeFromString(items.SerializeToString())
+        with pytest.raises(BufferError):
+            items.Clear()
+    items.Clear()
+    assert len(items.items) == 0
+
+
+def test_repeated_scalar_mutation():
+    test_type = type_test_pb2.TypeTester()
+    values = test_type.repeated_int32_value
+    expected = list(range(10))
+    values.extend(range(10))
+    values.extend(array.array("i", [10, 11]))
+    expected.extend([10, 11])
+    assert list(values) == expected
+    for key in (slice(None, None, 3), -1, slice(1, 3), slice(None, None, -2)):
+        del values[key]
+        del expected[key]
+        assert list(values) == expected
+    values[0] = 100
+    values[1:2] = [20, 30, 40]
+    values[::2] = [0] * len(range(0, len(values), 2))
+    expected[0] = 100
+    expected[1:2] = [20, 30, 40]
+    expected[::2] = [0] * len(range(0, len(expected), 2))
+    assert list(values) == expected
+    assert values.pop() == expected.pop()
+    assert values.pop(0) == expected.pop(0)
+    assert list(values) == expected
+    with pytest.raises(ValueError):
+        values[::2] = [1] * (len(range(0, len(expected), 2)) + 1)
+    with pytest.raises(TypeError):
+        values.extend([1, "two"])
+    with pytest.raises(IndexError):
+        values[len(expected)] = 1
+    assert list(values) == expected
+    values.Reserve(100)
+    values.clear()
+    assert len(values) == 0
+
+
+def test_repeated_string_mutation():
+    test_type = type_test_pb2.TypeTester()
+    values = test_type.repeated_string_value
+    values.extend(iter(["a", "b", "c", "d"]))
+    del values[1:3]
+    values[0:0] = ["z"]
+    assert values.pop(1) == "a"
+    assert list(values) == ["z", "d"]
+    values.clear()
+    with pytest.raises(IndexError):
+        values.pop()
+    with pytest.raises(IndexError):
+        test_type.repeated_int32_value.pop(-1)
+
+
+def test_repeated_message_mutation():
+    person = people_pb2.Person()
+    person.name = "original"
+    addressbook = addressbook_pb2.AddressBook()
+    addressbook.people.extend([person, person])
+    addressbook.people[1].name = "changed"
+    assert person.name == "original"
+    assert [p.name for p in addressbook.people] == ["original", "changed"]
+    with pytest.raises(TypeError):
+        addressbook.people[0] = person
+    with pytest.raises(TypeError):
+        addressbook.people.extend([None])
+    assert len(addressbook.people) == 2
+    popped = addressbook.people.pop(0)
+    assert popped.name == "original"
+    assert [p.name for p in addressbook.people] == ["changed"]
+    del addressbook.people[:]
+    assert len(addressbook.people) == 0
+
+
+def test_repeated_message_pop_from_arena():
+    arena = Arena()
+    addressbook = addressbook_pb2.AddressBook(arena=arena)
+    addressbook.people.add().name = "on arena"
+    popped = addressbook.people.pop()
+    del addressbook
+    arena.Reset()
+    assert popped.name == "on arena"
+
+
+def test_sub_message_wrapper_cache():
+    test_type = type_test_pb2.TypeTester()
+    sub_message = test_type.sub_message_value
+    assert test_type.sub_message_value is sub_message
+    assert test_type.sub_message_value.child is sub_message.child
+    sub_message.child.value = "nested"
+    assert test_type.sub_message_value.child.value == "nested"
+    serialized = test_type.SerializeToString()
+
+    del test_type.sub_message_value
+    assert test_type.sub_message_value is not sub_message
+    assert test_type.sub_message_value.child.value == ""
+
+    test_type.ParseFromString(serialized)
+    assert test_type.sub_message_value.child.value == "nested"
+    test_type.Clear()
+    assert test_type.sub_message_value.child.value == ""
+
+
+def test_copy_from():
+    source = _build_addressbook(3)
+    destination = addressbook_pb2.AddressBook()
+    destination.people.add().name = "replaced"
+    destination.CopyFrom(source)
+    assert destination == source
+    destination.people[0].name = "changed"
+    assert source.people[0].name == "person 0"
+    with pytest.raises(TypeError):
+        destination.CopyFrom(people_pb2.Person())
+    with pytest.raises(TypeError):
+        destination.CopyFrom(None)
+
+
+def test_merge_from():
+    merged = addressbook_pb2.AddressBook()
+    for x in range(3):
+        merged.MergeFrom(_build_addressbook(2))
+    assert [person.id for person in merged.people] == [0, 1] * 3
+    merged.MergeFrom(merged)
+    assert len(merged.people) == 12
+    merged.MergeFromString(memoryview(_build_addressbook(1).SerializeToString()))
+    assert len(merged.people) == 13
+    with pytest.raises(DecodeError):
+        merged.MergeFromString(b"\xff")
+
+
+def test_swap():
+    first = type_test_pb2.TypeTester()
+    first.sub_message_value.value = "first"
+    first.repeated_double_value.extend([1.0, 2.0])
+    second = type_test_pb2.TypeTester(arena=Arena())
+    second.sub_message_value.value = "second"
+    held = first.sub_message_value
+    first.Swap(second)
+    assert first.sub_message_value.value == "second"
+    assert list(first.repeated_double_value) == []
+    assert second.sub_message_value.value == "first"
+    assert held.value == "first"
+    assert list(second.repeated_double_value) == [1.0, 2.0]
+
+
+@pytest.mark.parametrize("method", ["CopyFrom", "Swap"])
+def test_copy_from_and_swap_with_self(method):
+    test_type = type_test_pb2.TypeTester()
+    sub_message = test_type.sub_message_value
+    sub_message.value = "keep"
+    person = _build_addressbook(1).people[0]
+    getattr(test_type, method)(test_type)
+    assert test_type.sub_message_value is sub_message
+    assert test_type.sub_message_value.value == "keep"
+    getattr(person, method)(person)
+    assert person.name == "person 0"
+
+
+def test_repeated_field_swap():
+    first = _build_addressbook(2)
+    second = _build_addressbook(3)
+    first.people.swap(second.people)
+    assert len(first.people) == 3
+    assert len(second.people) == 2
+    first_values = type_test_pb2.TypeTester()
+    second_values = type_test_pb2.TypeTester()
+    first_values.repeated_int64_value.extend([1, 2])
+    second_values.repeated_int64_value.swap(first_values.repeated_int64_value)
+    assert list(second_values.repeated_int64_value) == [1, 2]
+    with memoryview(first_values.repeated_int64_value):
+        with pytest.raises(BufferError):
+            second_values.repeated_int64_value.swap(first_values.repeated_int64_value)
+    with pytest.raises(TypeError):
+        first_values.repeated_int64_value.swap(first_values.repeated_bool_value)
+
+
+@pytest.mark.parametrize("protocol", range(pickle.HIGHEST_PROTOCOL + 1))
+def test_pickle(protocol):
+    addressbook = _build_addressbook(3)
+    round_tripped = pickle.loads(pickle.dumps(addressbook, protocol=protocol))
+    assert type(round_tripped) is type(addressbook)
+    assert round_tripped == addressbook
+    person = people_pb2.Person()
+    person.name = "bob"
+    assert pickle.loads(pickle.dumps(person, protocol=protocol)) == person
+    assert pickle.loads(pickle.dumps(addressbook.people[1], protocol=protocol)).id == 1
+
+
+def test_pickle_out_of_band():
+    addressbook = _build_addressbook(3, arena=Arena())
+    buffers = []
+    data = pickle.dumps(addressbook, protocol=5, buffer_callback=buffers.append)
+    assert len(buffers) == 1
+    assert len(data) < len(addressbook.SerializeToString())
+    assert pickle.loads(data, buffers=buffers) == addressbook
+
+
+@pytest.mark.parametrize("copier", [copy.copy, copy.deepcopy])
+def test_copy(copier):
+    addressbook = _build_addressbook(3)
+    copied = copier(addressbook)
+    assert copied == addressbook
+    copied.people[0].name = "changed"
+    assert addressbook.people[0].name == "person 0"
+
+
+def test_containers_created_lazily():
+    person = people_pb2.Person()
+    phones = person.phones
+    assert person.phones is phones
+    phones.add().number = "555-1234"
+    round_tripped = people_pb2.Person()
+    round_tripped.ParseFromString(person.SerializeToString())
+    assert [phone.number for phone in round_tripped.phones] == ["555-1234"]
+    with pytest.raises(AttributeError):
+        person.phones = None
+
+
+def _build_type_tester():
+    test_type = type_test_pb2.TypeTester()
+    test_type.float_value = 1.5
+    test_type.double_value = 0.1
+    test_type.int64_value = 2**40
+    test_type.uint64_value = 2**63
+    test_type.string_value = "héllo"
+    test_type.bytes_value = b"\x00\xffabc"
+    test_type.bool_value = True
+    test_type.repeated_int64_value.extend([1, -2])
+    test_type.map_to_int32_value["key"] = 4
+    test_type.map_to_submessage_value["sub"].value = "value"
+    test_type.sub_message_value.child.value = "nested"
+    return test_type
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"including_default_value_fields": True},
+        {"preserving_proto_field_name": True},
+        {"use_integers_for_enums": True},
+    ],
+)
+def test_to_dict_matches_json(options):
+    test_type = _build_type_tester()
+    assert test_type.to_dict(**options) == json.loads(test_type.ToJsonString(**options))
+    addressbook = _build_addressbook(3)
+    assert addressbook.to_dict(**options) == json.loads(addressbook.ToJsonString(**options))
+
+
+def test_to_json_bytes():
+    test_type = _build_type_tester()
+    for options in range(8):
+        flags = {
+            "including_default_value_fields": bool(options & 1),
+            "preserving_proto_field_name": bool(options & 2),
+            "use_integers_for_enums": bool(options & 4),
+        }
+        encoded = test_type.ToJsonBytes(**flags)
+        assert isinstance(encoded, bytes)
+        assert encoded.decode("utf-8") == test_type.ToJsonString(**flags)
+        assert json.loads(encoded) == test_type.to_dict(**flags)
+
+
+def test_from_dict_round_trip():
+    test_type = _build_type_tester()
+    assert type_test_pb2.TypeTester.from_dict(test_type.to_dict()) == test_type
+    assert (
+        type_test_pb2.TypeTester.from_dict(test_type.to_dict(preserving_proto_field_name=True))
+        == test_type
+    )
+    addressbook = addressbook_pb2.AddressBook.from_dict(
+        {"people": [{"name": "bob", "phones": [{"type": "HOME"}, {"type": 2}]}]}
+    )
+    assert [phone.type.value for phone in addressbook.people[0].phones] == [1, 2]
+    test_type = type_test_pb2.TypeTester.from_dict(
+        {"floatValue": "NaN", "int64Value": "12", "bytesValue": "AP-_"}
+    )
+    assert test_type.float_value != test_type.float_value
+    assert test_type.int64_value == 12
+    assert test_type.bytes_value == b"\x00\xff\xbf"
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"unknown": 1},
+        {"int32Value": "x"},
+        {"int32Value": 2**40},
+        {"boolValue": 1},
+        {"boolValue": "true"},
+        {"floatValue": 1e39},
+        {"repeatedStringValue": "abc"},
+        {"mapToInt32Value": {"key": "value"}},
+        {"subMessageValue": {"child": {"value": 3}}},
+    ],
+)
+def test_from_dict_errors(value):
+    with pytest.raises(ParseError):
+        type_test_pb2.TypeTester.from_dict(value)
+
+
+@pytest.mark.parametrize(
+    "wrap", [str, lambda data: data.encode(), lambda data: memoryview(data.encode())]
+)
+def test_from_json_string(wrap):
+    addressbook = _build_addressbook(3)
+    round_tripped = addressbook_pb2.AddressBook()
+    round_tripped.people.add().name = "replaced"
+    round_tripped.FromJsonString(wrap(addressbook.ToJsonString()))
+    assert round_tripped == addressbook
+
+
+@pytest.mark.parametrize("data", ["{", "[]", '{"unknown": 1}', '{"people": [{"id": "x"}]}'])
+def test_from_json_string_errors(data):
+    with pytest.raises(ParseError):
+        addressbook_pb2.AddressBook().FromJsonString(data)
+
+
+def test_to_dict_well_known_types():
+    tester = type_test_pb2.WellKnownTester()
+    tester.when.seconds = 1600000000
+    tester.count.value = 3
+    assert tester.to_dict() == {"when": "2020-09-13T12:26:40Z", "count": 3}
+    assert tester.when.to_dict() == "2020-09-13T12:26:40Z"
+    tester.details.fields["a"].list_value.values.add().string_value = "x"
+    tester.labels.add().value = "p"
+    for options in ({}, {"including_default_value_fields": True}):
+        assert tester.to_dict(**options) == json.loads(tester.ToJsonString(**options))
+    assert type_test_pb2.WellKnownTester.from_dict(tester.to_dict()) == tester
+
+
+def test_from_json_string_well_known_types():
+    tester = type_test_pb2.WellKnownTester()
+    tester.FromJsonString(
+        '{"when": "2020-09-13T12:26:40Z", "count": 3, "elapsed": "1.5s",'
+        ' "details": {"a": [1, "x", null]}, "labels": ["p", "q"]}'
+    )
+    assert tester.when.seconds == 1600000000
+    assert tester.count.value == 3
+    assert (tester.elapsed.seconds, tester.elapsed.nanos) == (1, 500000000)
+    assert [label.value for label in tester.labels] == ["p", "q"]
+    round_tripped = type_test_pb2.WellKnownTester()
+    round_tripped.FromJsonString(tester.ToJsonString())
+    assert round_tripped == tester
+    with pytest.raises(ParseError):
+        tester.FromJsonString('{"when": 3}')
+    with pytest.raises(ParseError):
+        type_test_pb2.TypeTester().FromJsonString('{"boolValue": "true"}')
+
+
+def test_from_dict_ignore_unknown_fields():
+    test_type = type_test_pb2.TypeTester.from_dict(
+        {"unknown": 1, "int32Value": 3}, ignore_unknown_fields=True
+    )
+    assert test_type.int32_value == 3
+
+
+def _build_addressbook(item_count, arena=None):
+    addressbook = addressbook_pb2.AddressBook(arena=arena)
+    for x in range(item_count):
+        person = addressbook.people.add()
+        person.name = f"person {x}"
+        person.email = f"person{x}@email.com"
+        person.id = x
+        for y in range(3):
+            phone = person.phones.add()
+            phone.number = f"+1425555{x:04d}{y}"
+            phone.type = y
+    return addressbook
+
+
+@pytest.mark.parametrize("item_count", [1, 1000])
+def test_parse_and_serialize_from_threads(item_count):
+    expected = _build_addressbook(item_count)
+    serialized = expected.SerializeToString()
+
+    def round_trip(_):
+        addressbook = addressbook_pb2.AddressBook()
+        addressbook.ParseFromString(serialized)
+        return addressbook.SerializeToString()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(round_trip, range(16)))
+    assert results == [serialized] * 16
+
+
+@pytest.mark.parametrize(
+    "wrap", [bytes, bytearray, memoryview, lambda data: memoryview(b"xx" + data + b"yy")[2:-2]]
+)
+def test_parse_from_buffer(wrap):
+    expected = _build_addressbook(10)
+    addressbook = addressbook_pb2.AddressBook()
+    addressbook.people.add().name = "stale"
+    addressbook.ParseFromBuffer(wrap(expected.SerializeToString()))
+    assert addressbook == expected
+
+
+def test_parse_from_mmap(tmp_path):
+    expected = _build_addressbook(100)
+    path = tmp_path / "addressbook.bin"
+    path.write_bytes(expected.SerializeToString())
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        addressbook = addressbook_pb2.AddressBook()
+        addressbook.ParseFromBuffer(mapped)
+    assert addressbook == expected
+
+
+def test_merge_from_buffer():
+    first = _build_addressbook(2)
+    second = _build_addressbook(3)
+    addressbook = addressbook_pb2.AddressBook()
+    addressbook.MergeFromBuffer(bytearray(first.SerializeToString()))
+    addressbook.MergeFromBuffer(memoryview(second.SerializeToString()))
+    assert [person.name for person in addressbook.people] == [
+        person.name for person in list(first.people) + list(second.people)
+    ]
+
+
+def test_parse_from_buffer_errors():
+    addressbook = addressbook_pb2.AddressBook()
+    with pytest.raises(DecodeError):
+        addressbook.ParseFromBuffer(b"\x0a\xff")
+    with pytest.raises(DecodeError):
+        addressbook.MergeFromBuffer(bytearray(b"\x0a\x05\x0a"))
+    with pytest.raises(TypeError):
+        addressbook.ParseFromBuffer("not a buffer")
+    with pytest.raises(BufferError):
+        addressbook.ParseFromBuffer(memoryview(b"\x00" * 8)[::2])
+
+    with pytest.raises(DecodeError):
+        addressbook.ParseFromString(b"\x0a\xff")
+
+
+def _nested_sub_message(depth):
+    sub_message = type_test_pb2.SubMessage()
+    sub_message.value = "leaf"
+    for _ in range(depth - 1):
+        parent = type_test_pb2.SubMessage()
+        parent.child.CopyFrom(sub_message)
+        sub_message = parent
+    return sub_message.SerializeToString()
+
+
+@pytest.mark.parametrize("merge", [False, True])
+def test_parse_options_limits(merge):
+    serialized = _nested_sub_message(5)
+    parse = "MergeFromBuffer" if merge else "ParseFromBuffer"
+    sub_message = type_test_pb2.SubMessage()
+    getattr(sub_message, parse)(serialized, ParseOptions(recursion_limit=5))
+    assert sub_message.child.child.child.child.value == "leaf"
+    with pytest.raises(DecodeError):
+        getattr(sub_message, parse)(serialized, ParseOptions(recursion_limit=3))
+    with pytest.raises(DecodeError):
+        getattr(sub_message, parse)(
+            serialized, ParseOptions(total_bytes_limit=len(serialized) - 1)
+        )
+    getattr(sub_message, parse)(serialized, ParseOptions(total_bytes_limit=len(serialized)))
+    # Large payloads are parsed without the GIL, through the same options.
+    addressbook = addressbook_pb2.AddressBook()
+    serialized = _build_addressbook(1000).SerializeToString()
+    with pytest.raises(DecodeError):
+        addressbook.ParseFromString(serialized, ParseOptions(total_bytes_limit=1024))
+    addressbook.ParseFromString(serialized, ParseOptions(partial=True))
+    assert len(addressbook.people) == 1000
+
+
+def test_parse_options_discard_unknown_fields():
+    test_type = type_test_pb2.TypeTester()
+    test_type.int32_value = 7
+    test_type.sub_message_value.value = "known"
+    # SubMessage only defines fields 1 and 2, so the int32 and the sub-message are unknown.
+    serialized = test_type.SerializeToString()
+    sub_message = type_test_pb2.SubMessage()
+    sub_message.ParseFromString(serialized)
+    assert sub_message.SerializeToString() == serialized
+    sub_message.ParseFromString(serialized, ParseOptions(discard_unknown_fields=True))
+    assert sub_message.SerializeToString() == b""
+    sub_message.MergeFromString(serialized, ParseOptions(discard_unknown_fields=True))
+    assert sub_message.SerializeToString() == b""
+    (parsed,) = type_test_pb2.SubMessage.parse_many(
+        [serialized], options=ParseOptions(discard_unknown_fields=True)
+    )
+    assert parsed.SerializeToString() == b""
+
+
+def test_parse_options():
+    options = ParseOptions(recursion_limit=10, partial=True)
+    assert options.recursion_limit == 10
+    assert options.total_bytes_limit == 2**31 - 1
+    assert options.partial
+    assert not options.discard_unknown_fields
+    assert options.field_mask is None
+    assert repr(options) == (
+        "ParseOptions(recursion_limit=10, total_bytes_limit=2147483647, partial=True, "
+        "discard_unknown_fields=False, field_mask=None, lazy=False)"
+    )
+    with pytest.raises(ValueError):
+        ParseOptions(recursion_limit=-1)
+    with pytest.raises(ValueError):
+        ParseOptions(total_bytes_limit=-1)
+    with pytest.raises(TypeError):
+        addressbook_pb2.AddressBook().ParseFromString(b"", {"partial": True})
+
+
+def test_byte_size():
+    addressbook = _build_addressbook(10)
+    assert addressbook.ByteSize() == len(addressbook.SerializeToString())
+    assert addressbook_pb2.AddressBook().ByteSize() == 0
+    assert addressbook_pb2.AddressBook().SerializeToString() == b""
+
+
+def test_serialize_into():
+    addressbooks = [_build_addressbook(item_count) for item_count in (1, 10, 100)]
+    buffer = bytearray(sum(addressbook.ByteSize() for addressbook in addressbooks) + 3)
+    offset = 3
+    for addressbook in addressbooks:
+        written = addressbook.SerializeInto(buffer, offset)
+        assert written == addressbook.ByteSize()
+        offset += written
+    assert bytes(buffer[3:]) == b"".join(
+        addressbook.SerializeToString() for addressbook in addressbooks
+    )
+    view = memoryview(buffer)
+    offset = 3
+    for expected in addressbooks:
+        parsed = addressbook_pb2.AddressBook()
+        parsed.ParseFromBuffer(view[offset : offset + expected.ByteSize()])
+        assert parsed == expected
+        offset += expected.ByteSize()
+
+
+def test_serialize_into_errors():
+    addressbook = _build_addressbook(1)
+    size = addressbook.ByteSize()
+    with pytest.raises(ValueError, match="Buffer too small"):
+        addressbook.SerializeInto(bytearray(size - 1))
+    with pytest.raises(ValueError, match="Buffer too small"):
+        addressbook.SerializeInto(bytearray(size), 1)
+    with pytest.raises(IndexError):
+        addressbook.SerializeInto(bytearray(size), -1)
+    with pytest.raises(BufferError):
+        addressbook.SerializeInto(b"\x00" * size)
+
+
+@pytest.mark.parametrize("arena", [None, Arena()])
+def test_serialize_threads(arena):
+    person = people_pb2.Person(arena=arena)
+    person.name = "bob"
+    person.email = "bob@example.com"
+    for index in range(10000):
+        person.phones.add().number = f"+1425{index:07}"
+    # An unknown field, which C++ writes after every known one.
+    person.MergeFromString(b"\x28\x07")
+    expected = person.SerializeToString()
+    for threads in (2, 3, 8):
+        assert person.SerializeToString(threads=threads) == expected
+        buffer = bytearray(len(expected) + 1)
+        assert person.SerializeInto(buffer, 1, threads=threads) == len(expected)
+        assert bytes(buffer[1:]) == expected
+    # Messages with too few elements to split are serialized on this thread.
+    addressbook = _build_addressbook(10)
+    assert addressbook.SerializeToString(threads=4) == addressbook.SerializeToString()
+    with pytest.raises(ValueError):
+        person.SerializeToString(threads=0)
+
+
+@pytest.mark.parametrize("arena", [None, Arena()])
+def test_serialize_threads_between_fields(arena):
+    split = type_test_pb2.SplitTester(arena=arena)
+    split.head = "head"
+    split.middle = 7
+    split.tail = "tail"
+    split.mapped["key"].value = "mapped"
+    # Chunks end within and across the split fields, around the fields that aren't split.
+    for index in range(3000):
+        split.first.add().value = f"first {index}"
+    for index in range(5):
+        split.second.add().child.value = f"second {index}"
+    for index in range(2000):
+        split.third.add().value = f"third {index}"
+    expected = split.SerializeToString(threads=1)
+    for threads in (2, 3, 7):
+        assert split.SerializeToString(threads=threads) == expected
+    round_tripped = type_test_pb2.SplitTester()
+    round_tripped.ParseFromString(expected)
+    assert round_tripped == split
+
+
+def test_arena_allocation():
+    arena = Arena()
+    assert arena.SpaceUsed() == 0
+    expected = _build_addressbook(100)
+    addressbook = addressbook_pb2.AddressBook(arena=arena)
+    addressbook.ParseFromString(expected.SerializeToString())
+    assert addressbook == expected
+    assert arena.SpaceUsed() > 0
+    person = people_pb2.Person(arena=arena)
+    person.name = "bob"
+    person.phones.add().number = "555"
+    assert person.ToJsonString() == '{"name":"bob","phones":[{"number":"555"}]}'
+
+
+def test_arena_reset():
+    arena = Arena(start_block_size=1024, max_block_size=64 * 1024)
+    addressbook = addressbook_pb2.AddressBook(arena=arena)
+    addressbook.ParseFromString(_build_addressbook(10).SerializeToString())
+    with pytest.raises(RuntimeError, match="1 live message"):
+        arena.Reset()
+    del addressbook
+    assert arena.Reset() > 0
+    assert arena.SpaceUsed() == 0
+    addressbook = addressbook_pb2.AddressBook(arena=arena)
+    assert len(addressbook.people) == 0
+
+
+def test_arena_outlives_its_messages():
+    arena = Arena()
+    addressbook = addressbook_pb2.AddressBook(arena=arena)
+    addressbook.people.add().name = "bob"
+    del arena
+    assert addressbook.people[0].name == "bob"
+
+
+def _churn_memory():
+    # Frees whatever is unreferenced and reuses the memory, so reads through dangling pointers
+    # would see other messages' data.
+    gc.collect()
+    return [_build_addressbook(10).SerializeToString() for _ in range(20)]
+
+
+@pytest.mark.parametrize("use_arena", [False, True])
+def test_views_keep_their_message_alive(use_arena):
+    addressbook = _build_addressbook(100, Arena() if use_arena else None)
+    people = addressbook.people
+    person = addressbook.people[50]
+    phones = addressbook.people[99].phones
+    phone = addressbook.people[98].phones[2]
+    del addressbook
+    _churn_memory()
+    assert len(people) == 100
+    assert person.name == "person 50"
+    assert [phone.number for phone in phones] == [f"+14255550099{y}" for y in range(3)]
+    assert phone.number == "+142555500982"
+    del people, person, phones
+    _churn_memory()
+    assert phone.number == "+142555500982"
+
+
+@pytest.mark.parametrize("use_arena", [False, True])
+def test_sub_message_views(use_arena):
+    test_type = type_test_pb2.TypeTester(arena=Arena() if use_arena else None)
+    test_type.sub_message_value.child.value = "child"
+    child = test_type.sub_message_value.child
+    assert test_type.sub_message_value.child is child
+    del test_type
+    _churn_memory()
+    assert child.value == "child"
+    test_type = type_test_pb2.TypeTester(arena=Arena() if use_arena else None)
+    sub_message = test_type.sub_message_value
+    child = sub_message.child
+    child.value = "cleared"
+    # Clearing the parent detaches the wrappers that are still referenced.
+    test_type.Clear()
+    _churn_memory()
+    assert child.value == "cleared"
+    assert test_type.sub_message_value is not sub_message
+    assert test_type.sub_message_value.child.value == ""
+    sub_message = test_type.sub_message_value
+    sub_message.value = "deleted"
+    del test_type.sub_message_value
+    test_type.ParseFromString(_build_type_tester().SerializeToString())
+    _churn_memory()
+    assert sub_message.value == "deleted"
+
+
+@pytest.mark.parametrize("use_arena", [False, True])
+def test_element_views(use_arena):
+    arena = Arena() if use_arena else None
+    addressbook = _build_addressbook(10, arena)
+    person = addressbook.people[0]
+    assert addressbook.people[0] is person
+    # Swapping detaches the wrappers of both messages' elements.
+    other = _build_addressbook(3, arena)
+    addressbook.Swap(other)
+    del other
+    _churn_memory()
+    assert person.name == "person 0"
+    addressbook = _build_addressbook(10, arena)
+    first, second = addressbook.people[1], addressbook.people[2]
+    phone = addressbook.people[3].phones[1]
+    popped = addressbook.people.pop(1)
+    assert popped is first or use_arena
+    del addressbook.people[2]
+    _churn_memory()
+    assert phone.number == "+142555500031"
+    del addressbook.people[:]
+    _churn_memory()
+    assert first.name == popped.name == "person 1"
+    assert second.name == "person 2"
+    test_type = type_test_pb2.TypeTester(arena=arena)
+    value = test_type.map_to_submessage_value["key"]
+    assert test_type.map_to_submessage_value["key"] is value
+    value.child.value = "child"
+    child = value.child
+    del test_type.map_to_submessage_value["key"]
+    del test_type
+    _churn_memory()
+    assert child.value == "child"
+
+
+@pytest.mark.parametrize(
+    "clear",
+    [
+        lambda addressbook: addressbook.Clear(),
+        lambda addressbook: addressbook.people.clear(),
+        lambda addressbook: addressbook.CopyFrom(_build_addressbook(2)),
+        lambda addressbook: addressbook.ParseFromString(_build_addressbook(2).SerializeToString()),
+        lambda addressbook: addressbook.people.swap(_build_addressbook(2).people),
+    ],
+)
+def test_element_views_keep_cleared_elements(clear):
+    addressbook = _build_addressbook(5)
+    person = addressbook.people[4]
+    phone = person.phones[2]
+    clear(addressbook)
+    _churn_memory()
+    assert person.name == "person 4"
+    assert phone.number == "+142555500042"
+    assert all(element is not person for element in addressbook.people)
+
+
+def test_cached_wrappers_are_collected():
+    arena = Arena()
+    tester = type_test_pb2.TypeTester(arena=arena)
+    sub_message = tester.sub_message_value
+    assert tester.sub_message_value is sub_message
+    assert sub_message.child is sub_message.child
+    assert tester.map_to_submessage_value is tester.map_to_submessage_value
+    assert gc.is_tracked(tester)
+    del tester, sub_message
+    arena.Reset()
+
+
+def _encode_varint(value):
+    result = bytearray()
+    while value > 0x7F:
+        result.append((value & 0x7F) | 0x80)
+        value >>= 7
+    result.append(value)
+    return bytes(result)
+
+
+def test_delimited_round_trip(tmp_path):
+    path = tmp_path / "people.bin"
+    expected = [_build_addressbook(item_count) for item_count in range(20)]
+    with DelimitedWriter(path) as writer:
+        for addressbook in expected:
+            writer.write(addressbook)
+    assert path.read_bytes() == b"".join(
+        _encode_varint(addressbook.ByteSize()) + addressbook.SerializeToString()
+        for addressbook in expected
+    )
+    with DelimitedReader(str(path), addressbook_pb2.AddressBook) as reader:
+        actual = list(reader)
+    assert actual == expected
+    assert all(isinstance(addressbook, addressbook_pb2.AddressBook) for addressbook in actual)
+
+
+def test_delimited_file_objects(tmp_path):
+    path = tmp_path / "people.bin"
+    person = people_pb2.Person()
+    person.name = "bob"
+    with open(path, "wb") as f:
+        writer = DelimitedWriter(f)
+        writer.write(person)
+        writer.write(people_pb2.Person())
+        writer.close()
+        assert not f.closed
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        reader = DelimitedReader(fd, people_pb2.Person)
+        assert next(reader).name == "bob"
+        assert next(reader) == people_pb2.Person()
+        with pytest.raises(StopIteration):
+            next(reader)
+        reader.close()
+        assert os.fstat(fd)
+    finally:
+        os.close(fd)
+    with pytest.raises(ValueError, match="closed reader"):
+        next(reader)
+    with pytest.raises(ValueError, match="closed writer"):
+        writer.write(person)
+
+
+def test_delimited_errors(tmp_path):
+    path = tmp_path / "truncated.bin"
+    serialized = _build_addressbook(3).SerializeToString()
+    path.write_bytes(_encode_varint(len(serialized)) + serialized[:-1])
+    with DelimitedReader(path, addressbook_pb2.AddressBook) as reader:
+        with pytest.raises(DecodeError):
+            next(reader)
+    with pytest.raises(TypeError):
+        DelimitedReader(path, dict)
+    with pytest.raises(FileNotFoundError):
+        DelimitedReader(tmp_path / "missing.bin", addressbook_pb2.AddressBook)
+
+
+def test_parse_many():
+    expected = [_build_addressbook(item_count) for item_count in range(50)]
+    serialized = [addressbook.SerializeToString() for addressbook in expected]
+    buffers = [
+        wrap(data) for wrap, data in zip([bytes, bytearray, memoryview] * 20, serialized)
+    ]
+    actual = addressbook_pb2.AddressBook.parse_many(buffers)
+    assert actual == expected
+    assert all(isinstance(addressbook, addressbook_pb2.AddressBook) for addressbook in actual)
+    assert addressbook_pb2.AddressBook.parse_many(iter(serialized)) == expected
+    assert addressbook_pb2.AddressBook.parse_many([]) == []
+
+
+def test_parse_many_on_arena():
+    arena = Arena()
+    people = [people_pb2.Person() for _ in range(3)]
+    for x, person in enumerate(people):
+        person.name = f"person {x}"
+    actual = people_pb2.Person.parse_many(
+        [person.SerializeToString() for person in people], arena=arena
+    )
+    assert actual == people
+    assert arena.SpaceUsed() > 0
+
+
+def test_parse_many_errors():
+    valid = _build_addressbook(1).SerializeToString()
+    with pytest.raises(DecodeError, match="index 2"):
+        addressbook_pb2.AddressBook.parse_many([valid, valid, b"\x0a\xff"])
+    with pytest.raises(TypeError):
+        addressbook_pb2.AddressBook.parse_many([valid, "not a buffer"])
+
+
+def test_to_columns():
+    columns = _build_addressbook(3).people.to_columns()
+    assert set(columns) == {"name", "id", "email", "phones"}
+    assert columns["id"].format == "i"
+    assert columns["id"].tolist() == [0, 1, 2]
+    assert list(columns["name"]) == ["person 0", "person 1", "person 2"]
+    assert columns["name"][-1] == "person 2"
+    assert columns["phones"].offsets.tolist() == [0, 3, 6, 9]
+    assert columns["phones"].values["type"].tolist() == [0, 1, 2] * 3
+    assert addressbook_pb2.AddressBook().people.to_columns()["id"].tolist() == []
+
+
+def test_to_columns_sub_messages():
+    testers = type_test_pb2.TypeTesterList()
+    testers.items.add().sub_message_value.child.value = "child"
+    testers.items.add().bytes_value = b"\x00bytes"
+    columns = testers.items.to_columns()
+    assert "map_to_int32_value" not in columns
+    assert list(columns["bytes_value"]) == [b"", b"\x00bytes"]
+    # Unset sub-messages are exported as defaults, down to the first level no row sets.
+    assert list(columns["sub_message_value"]["value"]) == ["", ""]
+    assert list(columns["sub_message_value"]["child"]["value"]) == ["child", ""]
+    assert columns["sub_message_value"]["child"]["child"] == {}
+
+
+@pytest.mark.parametrize("item_count", [0, 1, 10])
+def test_from_columns_round_trip(item_count):
+    expected = _build_addressbook(item_count)
+    actual = addressbook_pb2.AddressBook()
+    actual.people.from_columns(expected.people.to_columns())
+    assert actual == expected
+    actual.people.from_columns(expected.people.to_columns())
+    assert len(actual.people) == 2 * item_count
+
+
+def test_from_columns_sequences():
+    testers = type_test_pb2.TypeTesterList()
+    testers.items.from_columns(
+        {
+            "int64_value": array.array("q", [1, 2]),
+            "bool_value": memoryview(b"\x01\x00").cast("?"),
+            "string_value": ["a", b"b"],
+        }
+    )
+    assert [item.int64_value for item in testers.items] == [1, 2]
+    assert [item.bool_value for item in testers.items] == [True, False]
+    assert [item.string_value for item in testers.items] == ["a", "b"]
+
+
+@pytest.mark.parametrize(
+    "columns, error",
+    [
+        ({"unknown": [1]}, ValueError),
+        ({"int64_value": array.array("i", [1])}, ValueError),
+        ({"int64_value": array.array("q", [1]), "string_value": ["a", "b"]}, ValueError),
+        ({"repeated_int32_value": [[1]]}, TypeError),
+        ({"string_value": [1]}, TypeError),
+    ],
+)
+def test_from_columns_errors(columns, error):
+    testers = type_test_pb2.TypeTesterList()
+    testers.items.add()
+    with pytest.raises(error):
+        testers.items.from_columns(columns)
+    # Rows are only appended if all of the columns were read.
+    assert len(testers.items) == 1
+
+
+def test_to_arrow():
+    pyarrow = pytest.importorskip("pyarrow")
+    addressbook = _build_addressbook(3)
+    batch = addressbook.people.to_arrow()
+    assert batch.num_rows == 3
+    assert batch.schema.field("name").type == pyarrow.large_string()
+    assert batch.schema.field("id").type == pyarrow.int32()
+    assert batch.to_pylist() == [
+        {
+            "name": person.name,
+            "id": person.id,
+            "email": person.email,
+            "phones": [{"number": phone.number, "type": phone.type} for phone in person.phones],
+        }
+        for person in addressbook.people
+    ]
+    testers = type_test_pb2.TypeTesterList()
+    testers.items.add().repeated_bool_value.extend([True, False])
+    batch = testers.items.to_arrow()
+    assert batch.column("repeated_bool_value").to_pylist() == [[True, False]]
+    assert batch.column("sub_message_value").to_pylist() == [{}]
+
+
+def test_parse_columns():
+    people = _build_addressbook(20).people
+    serialized = [person.SerializeToString() for person in people]
+    columns = people_pb2.Person.parse_columns(serialized)
+    assert list(columns["name"]) == [person.name for person in people]
+    assert columns["id"].tolist() == list(range(20))
+    assert columns["phones"].offsets.tolist() == list(range(0, 63, 3))
+    actual = addressbook_pb2.AddressBook()
+    actual.people.from_columns(columns)
+    assert list(actual.people) == list(people)
+    selected = people_pb2.Person.parse_columns(serialized, fields=["id"])
+    assert list(selected) == ["id"]
+    assert people_pb2.Person.parse_columns([], fields=["id"])["id"].tolist() == []
+
+
+@pytest.mark.parametrize("offset_format", ["i", "q"])
+def test_parse_columns_from_offsets(offset_format):
+    people = _build_addressbook(5).people
+    serialized = [person.SerializeToString() for person in people]
+    offsets = array.array(offset_format, [0])
+    for data in serialized:
+        offsets.append(offsets[-1] + len(data))
+    columns = people_pb2.Person.parse_columns(b"".join(serialized), offsets, fields=["name"])
+    assert list(columns["name"]) == [person.name for person in people]
+
+
+def test_parse_columns_errors():
+    person = people_pb2.Person()
+    person.name = "name"
+    valid = person.SerializeToString()
+    with pytest.raises(ValueError, match="no fields named"):
+        people_pb2.Person.parse_columns([valid], fields=["unknown"])
+    with pytest.raises(DecodeError, match="index 1"):
+        people_pb2.Person.parse_columns([valid, b"\x0a\xff"])
+    with pytest.raises(ValueError, match="offsets"):
+        people_pb2.Person.parse_columns(valid, array.array("q", [0, len(valid) + 1]))
+    with pytest.raises(ValueError, match="offsets"):
+        people_pb2.Person.parse_columns(valid, array.array("q"))
+    with pytest.raises(DecodeError):
+        people_pb2.Person.parse_columns([valid], options=ParseOptions(total_bytes_limit=1))
+
+
+def test_parse_arrow():
+    pyarrow = pytest.importorskip("pyarrow")
+    people = _build_addressbook(5).people
+    serialized = [person.SerializeToString() for person in people]
+    for messages in [
+        pyarrow.array(serialized, pyarrow.binary()),
+        pyarrow.array(serialized, pyarrow.large_binary()),
+        pyarrow.chunked_array([serialized[:2], serialized[2:]], pyarrow.binary()),
+    ]:
+        batch = people_pb2.Person.parse_arrow(messages, fields=["name", "id"])
+        assert batch.to_pylist() == [{"name": person.name, "id": person.id} for person in people]
+    sliced = pyarrow.array(serialized, pyarrow.binary()).slice(3)
+    assert people_pb2.Person.parse_columns(sliced, fields=["id"])["id"].tolist() == [3, 4]
+    assert people_pb2.Person.parse_many(sliced) == list(people)[3:]
+    with pytest.raises(ValueError, match="null"):
+        people_pb2.Person.parse_columns(pyarrow.array([serialized[0], None]))
+    with pytest.raises(TypeError):
+        people_pb2.Person.parse_columns(pyarrow.array(["not binary"]))
+
+
+def test_field_mask_parse():
+    expected = _build_addressbook(10)
+    field_mask = FieldMask(addressbook_pb2.AddressBook, ["people.email", "people.phones.type"])
+    actual = addressbook_pb2.AddressBook()
+    actual.ParseFromString(expected.SerializeToString(), ParseOptions(field_mask=field_mask))
+    assert [person.email for person in actual.people] == [
+        person.email for person in expected.people
+    ]
+    assert all(person.name == "" and person.id == 0 for person in actual.people)
+    assert [phone.type for phone in actual.people[1].phones] == [0, 1, 2]
+    assert all(phone.number == "" for phone in actual.people[1].phones)
+    assert actual.SerializeToString() == expected.SerializeToString(field_mask)
+    parsed = addressbook_pb2.AddressBook.parse_many(
+        [expected.SerializeToString()], options=ParseOptions(field_mask=field_mask)
+    )
+    assert parsed == [actual]
+
+
+def test_field_mask_nested_and_maps():
+    expected = type_test_pb2.TypeTester()
+    expected.int32_value = 1
+    expected.map_to_submessage_value["key"].value = "value"
+    expected.sub_message_value.value = "parent"
+    expected.sub_message_value.child.value = "child"
+    field_mask = FieldMask(
+        type_test_pb2.TypeTester,
+        # The whole sub-message is kept, even though a later path names one of its fields.
+        ["map_to_submessage_value", "sub_message_value", "sub_message_value.child.value"],
+    )
+    actual = type_test_pb2.TypeTester()
+    actual.ParseFromString(expected.SerializeToString(), ParseOptions(field_mask=field_mask))
+    assert actual.int32_value == 0
+    assert actual.map_to_submessage_value["key"].value == "value"
+    assert actual.sub_message_value == expected.sub_message_value
+    assert FieldMask(type_test_pb2.TypeTester, []).paths == ()
+    assert expected.SerializeToString(FieldMask(type_test_pb2.TypeTester, [])) == b""
+
+
+def test_field_mask_errors():
+    with pytest.raises(ValueError, match="has no field 'unknown'"):
+        FieldMask(people_pb2.Person, ["unknown"])
+    with pytest.raises(ValueError, match="isn't a message field"):
+        FieldMask(people_pb2.Person, ["name.value"])
+    with pytest.raises(ValueError, match="map fields"):
+        FieldMask(type_test_pb2.TypeTester, ["map_to_submessage_value.value"])
+    options = ParseOptions(field_mask=FieldMask(people_pb2.Person, ["name"]))
+    with pytest.raises(TypeError):
+        addressbook_pb2.AddressBook().ParseFromString(b"", options)
+    with pytest.raises(TypeError):
+        addressbook_pb2.AddressBook().SerializeToString(options.field_mask)
+    serialized = _build_addressbook(1).people[0].SerializeToString()
+    with pytest.raises(DecodeError):
+        people_pb2.Person().ParseFromString(serialized[:-1], options)
+    with pytest.raises(DecodeError):
+        people_pb2.Person().ParseFromString(b"\x0f", options)
+
+
+def test_lazy_parse():
+    test_type = type_test_pb2.TypeTester()
+    test_type.int32_value = 7
+    test_type.sub_message_value.value = "first"
+    test_type.sub_message_value.child.value = "nested"
+    test_type.map_to_submessage_value["key"].value = "mapped"
+    # A field repeated on the wire is merged when it's decoded, like any other.
+    serialized = test_type.SerializeToString() + b"\xda\x01\x04\n\x02ok"
+    expected = type_test_pb2.TypeTester()
+    expected.ParseFromString(serialized)
+    lazy = type_test_pb2.TypeTester()
+    lazy.ParseFromString(serialized, ParseOptions(lazy=True))
+    assert lazy.int32_value == 7
+    assert lazy.map_to_submessage_value["key"].value == "mapped"
+    assert lazy.sub_message_value.value == "ok"
+    assert lazy.sub_message_value.child.value == "nested"
+    assert lazy == expected
+    for operation in (
+        lambda message: message.SerializeToString(),
+        lambda message: message.ByteSize(),
+        lambda message: message.to_dict(),
+        lambda message: message.ToJsonString(),
+        lambda message: copy.copy(message).SerializeToString(),
+    ):
+        lazy.ParseFromString(serialized, ParseOptions(lazy=True))
+        assert operation(lazy) == operation(expected)
+    lazy.ParseFromString(serialized, ParseOptions(lazy=True))
+    assert lazy == expected
+    lazy.ParseFromString(serialized, ParseOptions(lazy=True))
+    copied = type_test_pb2.TypeTester()
+    copied.CopyFrom(lazy)
+    assert copied == expected
+    lazy.ParseFromString(serialized, ParseOptions(lazy=True))
+    lazy.MergeFromString(b"\xda\x01\x04\n\x02hi")
+    assert lazy.sub_message_value.value == "hi"
+    assert lazy.sub_message_value.child.value == "nested"
+    lazy.ParseFromString(serialized, ParseOptions(lazy=True))
+    del lazy.sub_message_value
+    del expected.sub_message_value
+    assert lazy == expected
+    lazy.ParseFromString(serialized, ParseOptions(lazy=True))
+    lazy.Clear()
+    assert lazy.SerializeToString() == b""
+
+
+def test_lazy_parse_errors():
+    test_type = type_test_pb2.TypeTester()
+    test_type.int32_value = 7
+    # The deferred sub-message is truncated, which is only detected once it's decoded.
+    serialized = test_type.SerializeToString() + b"\xda\x01\x02\n\x05"
+    lazy = type_test_pb2.TypeTester()
+    lazy.ParseFromString(serialized, ParseOptions(lazy=True))
+    assert lazy.int32_value == 7
+    with pytest.raises(DecodeError):
+        lazy.sub_message_value
+    with pytest.raises(DecodeError):
+        type_test_pb2.TypeTester().ParseFromString(serialized[:-1], ParseOptions(lazy=True))
+    with pytest.raises(ValueError):
+        type_test_pb2.TypeTester.parse_many([serialized], options=ParseOptions(lazy=True))
+
+
+def test_lazy_parse_views():
+    child = type_test_pb2.SubMessage()
+    child.child.value = "child"
+    test_type = type_test_pb2.TypeTester()
+    sub_message = test_type.sub_message_value
+    # Views can't hold deferred fields, which their parent wouldn't see.
+    with pytest.raises(ValueError):
+        sub_message.ParseFromString(child.SerializeToString(), ParseOptions(lazy=True))
+    with pytest.raises(ValueError):
+        _build_addressbook(1).people[0].MergeFromString(b"", ParseOptions(lazy=True))
+    sub_message.value = "kept"
+    update = type_test_pb2.TypeTester()
+    update.sub_message_value.CopyFrom(child)
+    test_type.MergeFromString(update.SerializeToString(), ParseOptions(lazy=True))
+    assert sub_message.child.value == "child"
+    assert sub_message.value == "kept"
+    assert test_type.sub_message_value is sub_message
@@ -6,14 +6,14 @@ from google.protobuf import json_format
 from google.protobuf.descriptor_pb2 import FileDescriptorProto
 
 from cytobuf.protoc_gen_cython import ProtoFile
+from cytobuf.protoc_gen_cython.cython_file import GeneratorOptions
 from cytobuf.protoc_gen_cython.templates import message_pxd_template
 from cytobuf.protoc_gen_cython.templates import message_pyx_template
 from cytobuf.protoc_gen_cython.templates import py_module_template
 from cytobuf.protoc_gen_cython.templates import setup_py_template
 
 
-@pytest.fixture
-def pxd_file():
+def _parse_people_proto(options):
     proto_files = [
         {
             "name": "pb/people/models/people.proto",
@@ -121,10 +121,16 @@ def pxd_file():
         [json_format.ParseDict(x, FileDescriptorProto()) for x in proto_files],
         {"pb/people/models/people.proto"},
         "",
+        options,
     )
     return next(x for x in parsed_files if x.proto_filename == "pb/people/models/people.proto")
 
 
+@pytest.fixture
+def pxd_file():
+    return _parse_people_proto(GeneratorOptions(cache_strings=["pb.people.models.Person.email"]))
+
+
 def test_message_pxd_render(pxd_file):
     expected = textwrap.dedent(
         """\
@@ -134,7 +140,10 @@ def test_message_pxd_render(pxd_file):
     cimport cytobuf.protobuf.message
     from pb.address.models._address__cy_pb2 cimport Address as _cpp_pb_address_models_Address
     from pb.address.models._address__cy_pb2 cimport pb_address_models_Address
+    from cytobuf.protobuf.repeated_field cimport RepeatedField
+    from cytobuf.protobuf.repeated_field cimport RepeatedPtrField
     from libcpp.string cimport string
+    from libcpp.vector cimport vector
 
 
     cdef extern from "pb/people/models/people.pb.h" namespace "pb::people::models":
@@ -146,6 +155,7 @@ def test_message_pxd_render(pxd_file):
     
         cdef cppclass Person_PhoneNumber(cytobuf.protobuf.common.Message):
             Person_PhoneNumber()
+            void Swap(Person_PhoneNumber* other)
             void clear_number()
             const string& number()
             void set_number(const string&) except +
@@ -155,6 +165,7 @@ def test_message_pxd_render(pxd_file):
     
         cdef cppclass Person(cytobuf.protobuf.common.Message):
             Person()
+            void Swap(Person* other)
             void clear_name()
             const string& name()
             void set_name(const string&) except +
@@ -169,26 +180,86 @@ def test_message_pxd_render(pxd_file):
             Person_PhoneNumber* mutable_phones(int) except +
             size_t phones_size() const
             Person_PhoneNumber* add_phones()
+            const RepeatedPtrField[Person_PhoneNumber]& phones()
+            RepeatedPtrField[Person_PhoneNumber]* mutable_phones()
             void clear_address()
             const _cpp_pb_address_models_Address& address()
             _cpp_pb_address_models_Address* mutable_address()
             bint has_address() const;
+            _cpp_pb_address_models_Address* release_address()
 
     cdef class pb_people_models_Person_PhoneNumber(cytobuf.protobuf.message.Message):
         cdef Person_PhoneNumber* _message(self)
 
         @staticmethod
-        cdef from_cpp(Person_PhoneNumber* other)
+        cdef from_cpp(Person_PhoneNumber* other, cytobuf.protobuf.message.Message parent)
+
+        @staticmethod
+        cdef from_element(Person_PhoneNumber* other, cytobuf.protobuf.message.Message parent)
+
+        @staticmethod
+        cdef dict _to_dict(
+            Person_PhoneNumber* message,
+            bint including_default_value_fields,
+            bint preserving_proto_field_name,
+            bint use_integers_for_enums,
+        )
+
+        @staticmethod
+        cdef int _merge_dict(Person_PhoneNumber* message, dict value, bint ignore_unknown_fields) except -1
+
+        @staticmethod
+        cdef dict _to_columns(vector[Person_PhoneNumber*]& messages, set fields)
+
+        @staticmethod
+        cdef int _from_columns(vector[Person_PhoneNumber*]& messages, dict columns) except -1
+
+        @staticmethod
+        cdef dict _parse_columns(
+            cytobuf.protobuf.message.Payloads payloads,
+            object fields,
+            cytobuf.protobuf.message.ParseOptions options,
+        )
 
     cdef class __pb_people_models_Person__phones__container:
         cdef Person* _instance
+        cdef cytobuf.protobuf.message.Message _parent
+        cdef void _detach_elements(self, int start)
 
     cdef class pb_people_models_Person(cytobuf.protobuf.message.Message):
-        cdef readonly __pb_people_models_Person__phones__container phones
+        cdef __pb_people_models_Person__phones__container _phones_cache
+        cdef cytobuf.protobuf.message.Message _address_cache
         cdef Person* _message(self)
 
         @staticmethod
-        cdef from_cpp(Person* other)
+        cdef from_cpp(Person* other, cytobuf.protobuf.message.Message parent)
+
+        @staticmethod
+        cdef from_element(Person* other, cytobuf.protobuf.message.Message parent)
+
+        @staticmethod
+        cdef dict _to_dict(
+            Person* message,
+            bint including_default_value_fields,
+            bint preserving_proto_field_name,
+            bint use_integers_for_enums,
+        )
+
+        @staticmethod
+        cdef int _merge_dict(Person* message, dict value, bint ignore_unknown_fields) except -1
+
+        @staticmethod
+        cdef dict _to_columns(vector[Person*]& messages, set fields)
+
+        @staticmethod
+        cdef int _from_columns(vector[Person*]& messages, dict columns) except -1
+
+        @staticmethod
+        cdef dict _parse_columns(
+            cytobuf.protobuf.message.Payloads payloads,
+            object fields,
+            cytobuf.protobuf.message.ParseOptions options,
+        )
     """
     )
 
@@ -206,31 +277,254 @@ def test_message_pyx_render(pxd_file):
         # distutils: library_dirs = /usr/local/lib
         # distutils: extra_compile_args= -std=c++11
 
+        cimport cython
+
+        cimport cytobuf.protobuf.arena
+        cimport cytobuf.protobuf.columns
+        cimport cytobuf.protobuf.common
+        cimport cytobuf.protobuf.enum_table
+        cimport cytobuf.protobuf.json_format
         cimport cytobuf.protobuf.message
+        cimport cytobuf.protobuf.strings
         from pb.address.models._address__cy_pb2 cimport Address as _cpp_pb_address_models_Address
         from pb.address.models._address__cy_pb2 cimport pb_address_models_Address
         from pb.people.models._enums.people_pb2 import pb_people_models_Person_PhoneType as _py_pb_people_models_Person_PhoneType
+        from cytobuf.protobuf.repeated_field cimport RepeatedField
+        from cytobuf.protobuf.repeated_field cimport RepeatedPtrField
         from libcpp.string cimport string
+        from libcpp.vector cimport vector
+
+        import cytobuf.protobuf.columns
+        import cytobuf.protobuf.json_format
+
+        cdef cytobuf.protobuf.enum_table.EnumTable __pb_people_models_Person_PhoneType__members = cytobuf.protobuf.enum_table.EnumTable(_py_pb_people_models_Person_PhoneType)
 
         cdef class pb_people_models_Person_PhoneNumber(cytobuf.protobuf.message.Message):
 
-            def __cinit__(self, _init = True):
+            def __cinit__(self, _init = True, cytobuf.protobuf.arena.Arena arena = None):
                 if _init:
-                    instance = new Person_PhoneNumber()
-                    self._internal = instance
+                    self._internal = cytobuf.protobuf.common.Arena.CreateMessage[Person_PhoneNumber](self._arena_pointer())
 
             cdef Person_PhoneNumber* _message(self):
                 return <Person_PhoneNumber*>self._internal
 
+            cdef int _merge_from_json(self, object value, bint ignore_unknown_fields) except -1:
+                if not isinstance(value, dict):
+                    raise cytobuf.protobuf.json_format.ParseError(f"Expected a JSON object, got {type(value).__name__}")
+                return pb_people_models_Person_PhoneNumber._merge_dict(self._message(), value, ignore_unknown_fields)
+
             @staticmethod
-            cdef from_cpp(Person_PhoneNumber* other):
-                result = pb_people_models_Person_PhoneNumber(_init=False)
+            cdef from_cpp(Person_PhoneNumber* other, cytobuf.protobuf.message.Message parent):
+                cdef pb_people_models_Person_PhoneNumber result = pb_people_models_Person_PhoneNumber.__new__(pb_people_models_Person_PhoneNumber, False)
                 result._internal = other
+                result._parent = parent
+                return result
+
+            @staticmethod
+            cdef from_element(Person_PhoneNumber* other, cytobuf.protobuf.message.Message parent):
+                \"\"\"Wraps a repeated or map element of `parent`, reusing its wrapper if it has one.\"\"\"
+                cdef cytobuf.protobuf.message.Message result = parent._element(other)
+                if result is None:
+                    result = pb_people_models_Person_PhoneNumber.from_cpp(other, parent)
+                    parent._track_element(result)
+                return result
+
+            @staticmethod
+            cdef dict _to_dict(
+                Person_PhoneNumber* message,
+                bint including_default_value_fields,
+                bint preserving_proto_field_name,
+                bint use_integers_for_enums,
+            ):
+                cdef dict result = {}
+                if including_default_value_fields or not message.number().empty():
+                    result["number"] = cytobuf.protobuf.strings.decode_utf8(message.number())
+                if including_default_value_fields or message.type() != 0:
+                    result["type"] = cytobuf.protobuf.json_format.encode_enum(_py_pb_people_models_Person_PhoneType, message.type(), use_integers_for_enums)
+                return result
+
+            @staticmethod
+            cdef int _merge_dict(Person_PhoneNumber* message, dict value, bint ignore_unknown_fields) except -1:
+                for key, item in value.items():
+                    try:
+                        if key == "number":
+                            if item is None:
+                                message.clear_number()
+                            else:
+                                message.set_number(cytobuf.protobuf.json_format.decode_string(item))
+                        elif key == "type":
+                            if item is None:
+                                message.clear_type()
+                            else:
+                                message.set_type(<Person_PhoneType>cytobuf.protobuf.json_format.decode_enum(_py_pb_people_models_Person_PhoneType, item))
+                        elif not ignore_unknown_fields:
+                            raise cytobuf.protobuf.json_format.ParseError(
+                                f'Message type "Person_PhoneNumber" has no field named "{key}"'
+                            )
+                    except cytobuf.protobuf.json_format.ParseError:
+                        raise
+                    except (KeyError, OverflowError, TypeError, ValueError) as error:
+                        raise cytobuf.protobuf.json_format.ParseError(f"Failed to parse {key} field: {error}") from error
+                return 0
+
+            @staticmethod
+            cdef dict _to_columns(vector[Person_PhoneNumber*]& messages, set fields):
+                cdef dict columns = {}
+                cdef size_t i
+                cdef int j
+                cdef void* data
+                cdef bint present
+                cdef vector[long long] offsets
+                cdef vector[long long] value_offsets
+                cdef string values
+                if fields is not None:
+                    unknown = fields - {"number", "type"}
+                    if unknown:
+                        raise ValueError(f"Person_PhoneNumber has no fields named {sorted(unknown)}")
+                if fields is None or "number" in fields:
+                    value_offsets.assign(1, 0)
+                    values.clear()
+                    for i in range(messages.size()):
+                        values.append(messages[i].number())
+                        value_offsets.push_back(values.size())
+                    columns["number"] = cytobuf.protobuf.columns.binary_column(value_offsets, values, True)
+                if fields is None or "type" in fields:
+                    columns["type"] = cytobuf.protobuf.columns.new_column("i", sizeof(int), messages.size(), &data)
+                    for i in range(messages.size()):
+                        (<int*>data)[i] = messages[i].type()
+                return columns
+
+            @staticmethod
+            cdef int _from_columns(vector[Person_PhoneNumber*]& messages, dict columns) except -1:
+                cdef size_t i
+                cdef long long j
+                cdef cytobuf.protobuf.columns.ColumnBuffer buffer
+                cdef const long long* offsets
+                cdef vector[string] values
+                unknown = columns.keys() - {"number", "type"}
+                if unknown:
+                    raise ValueError(f"Person_PhoneNumber has no fields named {sorted(unknown)}")
+                column = columns.get("number")
+                if column is not None:
+                    cytobuf.protobuf.columns.binary_values(column, messages.size(), values)
+                    for i in range(messages.size()):
+                        messages[i].set_number(values[i])
+                column = columns.get("type")
+                if column is not None:
+                    buffer = cytobuf.protobuf.columns.ColumnBuffer(column, b"i", sizeof(int), messages.size())
+                    for i in range(messages.size()):
+                        messages[i].set_type(<Person_PhoneType>(<const int*>buffer.data)[i])
+                return 0
+
+            def to_dict(
+                    self,
+                    bint including_default_value_fields = False,
+                    bint preserving_proto_field_name = False,
+                    bint use_integers_for_enums = False,
+            ):
+                \"\"\"Converts this message to a dict matching `json_format.MessageToDict`.\"\"\"
+                self._load_lazy_fields()
+                return pb_people_models_Person_PhoneNumber._to_dict(
+                    self._message(),
+                    including_default_value_fields,
+                    preserving_proto_field_name,
+                    use_integers_for_enums,
+                )
+
+            @classmethod
+            def from_dict(cls, dict value, bint ignore_unknown_fields = False):
+                \"\"\"Builds a new message from a dict in the format produced by `to_dict`.\"\"\"
+                cdef pb_people_models_Person_PhoneNumber result = cls()
+                pb_people_models_Person_PhoneNumber._merge_dict(result._message(), value, ignore_unknown_fields)
                 return result
 
+            @classmethod
+            def parse_columns(
+                    cls,
+                    messages,
+                    offsets = None,
+                    fields = None,
+                    cytobuf.protobuf.message.ParseOptions options = None,
+            ):
+                \"\"\"Parses a batch of serialized messages into columns, as exported by `to_columns`.
+
+                `messages` is a sequence of buffer-protocol objects, a pyarrow binary array or, with
+                `offsets`, a single buffer holding the messages back to back.  They're decoded in C++ with
+                the GIL released onto a temporary arena, without creating a message object per record.
+                Only the fields named in `fields` are exported, if given.
+                \"\"\"
+                return pb_people_models_Person_PhoneNumber._parse_columns(
+                    cytobuf.protobuf.message.Payloads(messages, offsets), fields, options
+                )
+
+            @classmethod
+            def parse_arrow(
+                    cls,
+                    messages,
+                    offsets = None,
+                    fields = None,
+                    cytobuf.protobuf.message.ParseOptions options = None,
+            ):
+                \"\"\"Like `parse_columns`, but returns the columns as a `pyarrow.RecordBatch`.\"\"\"
+                cdef cytobuf.protobuf.message.Payloads payloads = cytobuf.protobuf.message.Payloads(messages, offsets)
+                return cytobuf.protobuf.columns.to_arrow(
+                    pb_people_models_Person_PhoneNumber._parse_columns(payloads, fields, options), len(payloads)
+                )
+
+            @staticmethod
+            cdef dict _parse_columns(
+                    cytobuf.protobuf.message.Payloads payloads,
+                    object fields,
+                    cytobuf.protobuf.message.ParseOptions options,
+            ):
+                cdef cytobuf.protobuf.arena.Arena arena = cytobuf.protobuf.arena.Arena()
+                cdef set selected = None if fields is None else set(fields)
+                cdef vector[cytobuf.protobuf.common.Message*] targets
+                cdef vector[Person_PhoneNumber*] parsed
+                cdef Person_PhoneNumber* message
+                cdef size_t i
+                targets.reserve(payloads.sizes.size())
+                parsed.reserve(payloads.sizes.size())
+                for i in range(payloads.sizes.size()):
+                    message = cytobuf.protobuf.common.Arena.CreateMessage[Person_PhoneNumber](arena._arena)
+                    targets.push_back(message)
+                    parsed.push_back(message)
+                cytobuf.protobuf.message.parse_payloads(targets, payloads, options)
+                return pb_people_models_Person_PhoneNumber._to_columns(parsed, selected)
+
+            def CopyFrom(self, pb_people_models_Person_PhoneNumber other not None):
+                if other is self:
+                    return
+                self._check_exports()
+                self._reset_cache(False)
+                self._lazy = None
+                other._load_lazy_fields()
+                self._message().CopyFrom(other._message()[0])
+
+            def MergeFrom(self, pb_people_models_Person_PhoneNumber other not None):
+                self._check_exports()
+                self._load_lazy_fields()
+                other._load_lazy_fields()
+                if other is self:
+                    # C++ doesn't allow merging a message into itself, so merge a serialized copy.
+                    self.MergeFromString(self.SerializeToString())
+                else:
+                    self._message().MergeFrom(other._message()[0])
+
+            def Swap(self, pb_people_models_Person_PhoneNumber other not None):
+                if other is self:
+                    return
+                self._check_exports()
+                other._check_exports()
+                self._reset_cache(True)
+                other._reset_cache(True)
+                self._load_lazy_fields()
+                other._load_lazy_fields()
+                self._message().Swap(other._message())
+
             @property
             def number(self):
-                return bytes.decode(self._message().number())
+                return cytobuf.protobuf.strings.decode_utf8(self._message().number())
 
             @number.setter
             def number(self, str value):
@@ -242,7 +536,7 @@ def test_message_pyx_render(pxd_file):
 
             @property
             def type(self):
-                return _py_pb_people_models_Person_PhoneType(self._message().type())
+                return __pb_people_models_Person_PhoneType__members.lookup(self._message().type())
 
             @type.setter
             def type(self, Person_PhoneType value):
@@ -252,12 +546,13 @@ def test_message_pyx_render(pxd_file):
             def type(self):
                 self._message().clear_type()
 
+        @cython.freelist(8)
         cdef class __pb_people_models_Person__phones__container:
 
             def __iter__(self):
                 cdef size_t i
                 for i in range(self._instance.phones_size()):
-                    yield pb_people_models_Person_PhoneNumber.from_cpp(self._instance.mutable_phones(i))
+                    yield pb_people_models_Person_PhoneNumber.from_element(self._instance.mutable_phones(i), self._parent)
 
             def __len__(self):
                 return self._instance.phones_size()
@@ -273,39 +568,491 @@ def test_message_pyx_render(pxd_file):
                         index = key
                     if not 0 <= index < size:
                         raise IndexError(f"list index ({key}) out of range")
-                    return pb_people_models_Person_PhoneNumber.from_cpp(self._instance.mutable_phones(index))
+                    return pb_people_models_Person_PhoneNumber.from_element(self._instance.mutable_phones(index), self._parent)
                 else:
                     start, stop, step = key.indices(size)
                     return [
-                        pb_people_models_Person_PhoneNumber.from_cpp(self._instance.mutable_phones(index))
+                        pb_people_models_Person_PhoneNumber.from_element(self._instance.mutable_phones(index), self._parent)
                         for index in range(start, stop, step)
                     ]
 
             def add(self):
-                return pb_people_models_Person_PhoneNumber.from_cpp(self._instance.add_phones())
+                return pb_people_models_Person_PhoneNumber.from_element(self._instance.add_phones(), self._parent)
+
+            def extend(self, values):
+                cdef RepeatedPtrField[Person_PhoneNumber]* elements = self._instance.mutable_phones()
+                cdef pb_people_models_Person_PhoneNumber value
+                if not isinstance(values, (list, tuple)):
+                    values = list(values)
+                elements.Reserve(elements.size() + len(values))
+                for value in values:
+                    if value is None:
+                        raise TypeError("pb_people_models_Person_PhoneNumber expected, got NoneType")
+                    value._load_lazy_fields()
+                    self._instance.add_phones().CopyFrom(value._message()[0])
+
+            def __setitem__(self, key, value):
+                raise TypeError("Repeated message fields do not support item assignment")
+
+            def pop(self, Py_ssize_t index=-1):
+                cdef RepeatedPtrField[Person_PhoneNumber]* elements = self._instance.mutable_phones()
+                cdef Py_ssize_t size = elements.size()
+                cdef pb_people_models_Person_PhoneNumber result
+                if index < 0:
+                    index += size
+                if not 0 <= index < size:
+                    raise IndexError("pop index out of range")
+                while index < size - 1:
+                    elements.SwapElements(index, index + 1)
+                    index += 1
+                result = <pb_people_models_Person_PhoneNumber>self._parent._element(elements.Mutable(index))
+                if result is not None:
+                    self._parent._detach_element(elements.Mutable(index), False)
+                    # Off an arena the element's wrapper has taken its contents, so it's the result.
+                    if result._ptr_owner:
+                        elements.RemoveLast()
+                        return result
+                result = pb_people_models_Person_PhoneNumber.from_cpp(elements.ReleaseLast(), None)
+                result._ptr_owner = True
+                return result
+
+            def to_columns(self):
+                \"\"\"Exports the fields of every element as a dict of columns, with a row per element.
+
+                Numeric and enum fields become typed memoryviews, string and bytes fields `BinaryColumn`s,
+                repeated fields `ListColumn`s and sub-messages dicts of their own columns.  Map fields
+                aren't exported.
+                \"\"\"
+                cdef RepeatedPtrField[Person_PhoneNumber]* elements = self._instance.mutable_phones()
+                cdef vector[Person_PhoneNumber*] messages
+                cdef int i
+                messages.reserve(elements.size())
+                for i in range(elements.size()):
+                    messages.push_back(elements.Mutable(i))
+                return pb_people_models_Person_PhoneNumber._to_columns(messages, None)
+
+            def to_arrow(self):
+                \"\"\"Exports the columns of `to_columns` as a `pyarrow.RecordBatch`.\"\"\"
+                return cytobuf.protobuf.columns.to_arrow(self.to_columns(), len(self))
+
+            def from_columns(self, dict columns not None):
+                \"\"\"Appends an element for each row of `columns`, in the format produced by `to_columns`.
+
+                Numeric columns may be any buffer of a matching type, such as NumPy arrays, and string
+                and bytes columns any sequence of `str` or bytes.  Missing columns are left unset.
+                \"\"\"
+                cdef RepeatedPtrField[Person_PhoneNumber]* elements = self._instance.mutable_phones()
+                cdef int start = elements.size()
+                cdef Py_ssize_t count = cytobuf.protobuf.columns.column_length(columns)
+                cdef vector[Person_PhoneNumber*] messages
+                cdef Py_ssize_t i
+                self._parent._check_exports()
+                elements.Reserve(start + count)
+                messages.reserve(count)
+                for i in range(count):
+                    messages.push_back(self._instance.add_phones())
+                try:
+                    pb_people_models_Person_PhoneNumber._from_columns(messages, columns)
+                except:
+                    self._detach_elements(start)
+                    elements.DeleteSubrange(start, count)
+                    raise
+
+            cdef void _detach_elements(self, int start):
+                \"\"\"Detaches the wrappers of the elements from `start` on, before they're removed.\"\"\"
+                cdef RepeatedPtrField[Person_PhoneNumber]* elements = self._instance.mutable_phones()
+                cdef int i
+                if self._parent._elements is NULL:
+                    return
+                for i in range(start, elements.size()):
+                    self._parent._detach_element(elements.Mutable(i), False)
+
+            def __delitem__(self, key):
+                cdef RepeatedPtrField[Person_PhoneNumber]* elements = self._instance.mutable_phones()
+                cdef Py_ssize_t size = elements.size()
+                cdef Py_ssize_t index, first, last, step, kept
+                if isinstance(key, slice):
+                    indices = range(*key.indices(size))
+                    if not indices:
+                        return
+                    if indices.step < 0:
+                        indices = indices[::-1]
+                    first, last, step = indices[0], indices[-1], indices.step
+                else:
+                    index = key
+                    if index < 0:
+                        index += size
+                    if not 0 <= index < size:
+                        raise IndexError("list assignment index out of range")
+                    first, last, step = index, index, 1
+                kept = first
+                for index in range(first, size):
+                    if index > last or (index - first) % step:
+                        if kept != index:
+                            elements.SwapElements(kept, index)
+                        kept += 1
+                self._detach_elements(kept)
+                elements.DeleteSubrange(kept, size - kept)
+
+            def clear(self):
+                self._detach_elements(0)
+                self._instance.clear_phones()
+
+            def Reserve(self, int size):
+                self._instance.mutable_phones().Reserve(size)
+
+            def swap(self, __pb_people_models_Person__phones__container other not None):
+                \"\"\"Exchanges the elements of this field with those of the same field in another message.\"\"\"
+                self._detach_elements(0)
+                other._detach_elements(0)
+                self._instance.mutable_phones().Swap(other._instance.mutable_phones())
+
+        cdef cytobuf.protobuf.strings.StringCache __pb_people_models_Person__email__strings = cytobuf.protobuf.strings.StringCache()
 
         cdef class pb_people_models_Person(cytobuf.protobuf.message.Message):
 
-            def __cinit__(self, _init = True):
-                self.phones = __pb_people_models_Person__phones__container()
+            def __cinit__(self, _init = True, cytobuf.protobuf.arena.Arena arena = None):
                 if _init:
-                    instance = new Person()
-                    self.phones._instance = instance
-                    self._internal = instance
+                    self._internal = cytobuf.protobuf.common.Arena.CreateMessage[Person](self._arena_pointer())
 
             cdef Person* _message(self):
                 return <Person*>self._internal
 
+            cdef void _reset_cache(self, bint preserve):
+                cdef bint on_arena = self._internal.GetArena() is not NULL
+                cdef cytobuf.protobuf.common.Message* released
+                if self._address_cache is not None:
+                    if not on_arena:
+                        released = self._message().release_address()
+                        self._detach_cached(self._address_cache, released)
+                        if preserve and released is not NULL:
+                            self._message().mutable_address().CopyFrom(released[0])
+                    self._address_cache = None
+                cytobuf.protobuf.message.Message._reset_cache(self, preserve)
+
+            cdef bint _has_cached_field(self, int number):
+                if number == 5:
+                    return self._address_cache is not None
+                return False
+
+            cdef int _check_exports(self) except -1:
+                if self._address_cache is not None:
+                    self._address_cache._check_exports()
+                return cytobuf.protobuf.message.Message._check_exports(self)
+
+            cdef int _merge_from_json(self, object value, bint ignore_unknown_fields) except -1:
+                if not isinstance(value, dict):
+                    raise cytobuf.protobuf.json_format.ParseError(f"Expected a JSON object, got {type(value).__name__}")
+                return pb_people_models_Person._merge_dict(self._message(), value, ignore_unknown_fields)
+
             @staticmethod
-            cdef from_cpp(Person* other):
-                result = pb_people_models_Person(_init=False)
+            cdef from_cpp(Person* other, cytobuf.protobuf.message.Message parent):
+                cdef pb_people_models_Person result = pb_people_models_Person.__new__(pb_people_models_Person, False)
                 result._internal = other
-                result.phones._instance = other
+                result._parent = parent
                 return result
 
+            @staticmethod
+            cdef from_element(Person* other, cytobuf.protobuf.message.Message parent):
+                \"\"\"Wraps a repeated or map element of `parent`, reusing its wrapper if it has one.\"\"\"
+                cdef cytobuf.protobuf.message.Message result = parent._element(other)
+                if result is None:
+                    result = pb_people_models_Person.from_cpp(other, parent)
+                    parent._track_element(result)
+                return result
+
+            @staticmethod
+            cdef dict _to_dict(
+                Person* message,
+                bint including_default_value_fields,
+                bint preserving_proto_field_name,
+                bint use_integers_for_enums,
+            ):
+                cdef dict result = {}
+                cdef int i
+                if including_default_value_fields or not message.name().empty():
+                    result["name"] = cytobuf.protobuf.strings.decode_utf8(message.name())
+                if including_default_value_fields or message.id() != 0:
+                    result["id"] = message.id()
+                if including_default_value_fields or not message.email().empty():
+                    result["email"] = __pb_people_models_Person__email__strings.decode(message.email())
+                if including_default_value_fields or message.phones_size():
+                    result["phones"] = [
+                        pb_people_models_Person_PhoneNumber._to_dict(<Person_PhoneNumber*>&message.phones(i), including_default_value_fields, preserving_proto_field_name, use_integers_for_enums)
+                        for i in range(message.phones_size())
+                    ]
+                if message.has_address():
+                    result["address"] = pb_address_models_Address._to_dict(<_cpp_pb_address_models_Address*>&message.address(), including_default_value_fields, preserving_proto_field_name, use_integers_for_enums)
+                return result
+
+            @staticmethod
+            cdef int _merge_dict(Person* message, dict value, bint ignore_unknown_fields) except -1:
+                for key, item in value.items():
+                    try:
+                        if key == "name":
+                            if item is None:
+                                message.clear_name()
+                            else:
+                                message.set_name(cytobuf.protobuf.json_format.decode_string(item))
+                        elif key == "id":
+                            if item is None:
+                                message.clear_id()
+                            else:
+                                message.set_id(cytobuf.protobuf.json_format.decode_integer(item))
+                        elif key == "email":
+                            if item is None:
+                                message.clear_email()
+                            else:
+                                message.set_email(cytobuf.protobuf.json_format.decode_string(item))
+                        elif key == "phones":
+                            if item is None:
+                                message.clear_phones()
+                            elif not isinstance(item, list):
+                                raise TypeError(f"list expected, got {type(item).__name__}")
+                            else:
+                                for element in item:
+                                    pb_people_models_Person_PhoneNumber._merge_dict(message.add_phones(), element, ignore_unknown_fields)
+                        elif key == "address":
+                            if item is None:
+                                message.clear_address()
+                            else:
+                                pb_address_models_Address._merge_dict(message.mutable_address(), item, ignore_unknown_fields)
+                        elif not ignore_unknown_fields:
+                            raise cytobuf.protobuf.json_format.ParseError(
+                                f'Message type "Person" has no field named "{key}"'
+                            )
+                    except cytobuf.protobuf.json_format.ParseError:
+                        raise
+                    except (KeyError, OverflowError, TypeError, ValueError) as error:
+                        raise cytobuf.protobuf.json_format.ParseError(f"Failed to parse {key} field: {error}") from error
+                return 0
+
+            @staticmethod
+            cdef dict _to_columns(vector[Person*]& messages, set fields):
+                cdef dict columns = {}
+                cdef size_t i
+                cdef int j
+                cdef void* data
+                cdef bint present
+                cdef vector[long long] offsets
+                cdef vector[long long] value_offsets
+                cdef string values
+                cdef vector[Person_PhoneNumber*] phones_messages
+                cdef vector[_cpp_pb_address_models_Address*] address_messages
+                if fields is not None:
+                    unknown = fields - {"name", "id", "email", "phones", "address"}
+                    if unknown:
+                        raise ValueError(f"Person has no fields named {sorted(unknown)}")
+                if fields is None or "name" in fields:
+                    value_offsets.assign(1, 0)
+                    values.clear()
+                    for i in range(messages.size()):
+                        values.append(messages[i].name())
+                        value_offsets.push_back(values.size())
+                    columns["name"] = cytobuf.protobuf.columns.binary_column(value_offsets, values, True)
+                if fields is None or "id" in fields:
+                    columns["id"] = cytobuf.protobuf.columns.new_column("i", sizeof(int), messages.size(), &data)
+                    for i in range(messages.size()):
+                        (<int*>data)[i] = messages[i].id()
+                if fields is None or "email" in fields:
+                    value_offsets.assign(1, 0)
+                    values.clear()
+                    for i in range(messages.size()):
+                        values.append(messages[i].email())
+                        value_offsets.push_back(values.size())
+                    columns["email"] = cytobuf.protobuf.columns.binary_column(value_offsets, values, True)
+                if fields is None or "phones" in fields:
+                    offsets.assign(1, 0)
+                    for i in range(messages.size()):
+                        for j in range(messages[i].phones_size()):
+                            phones_messages.push_back(messages[i].mutable_phones(j))
+                        offsets.push_back(phones_messages.size())
+                    columns["phones"] = cytobuf.protobuf.columns.ListColumn(
+                        cytobuf.protobuf.columns.offsets_column(offsets),
+                        pb_people_models_Person_PhoneNumber._to_columns(phones_messages, None),
+                    )
+                if fields is None or "address" in fields:
+                    # Unset sub-messages are exported as their defaults, unless none of the rows set one,
+                    # which also ends the recursion of recursive message types.
+                    present = False
+                    for i in range(messages.size()):
+                        if messages[i].has_address():
+                            present = True
+                            break
+                    if present:
+                        address_messages.reserve(messages.size())
+                        for i in range(messages.size()):
+                            address_messages.push_back(<_cpp_pb_address_models_Address*>&messages[i].address())
+                        columns["address"] = pb_address_models_Address._to_columns(address_messages, None)
+                    else:
+                        columns["address"] = {}
+                return columns
+
+            @staticmethod
+            cdef int _from_columns(vector[Person*]& messages, dict columns) except -1:
+                cdef size_t i
+                cdef long long j
+                cdef cytobuf.protobuf.columns.ColumnBuffer buffer
+                cdef const long long* offsets
+                cdef vector[string] values
+                cdef vector[Person_PhoneNumber*] phones_messages
+                cdef vector[_cpp_pb_address_models_Address*] address_messages
+                unknown = columns.keys() - {"name", "id", "email", "phones", "address"}
+                if unknown:
+                    raise ValueError(f"Person has no fields named {sorted(unknown)}")
+                column = columns.get("name")
+                if column is not None:
+                    cytobuf.protobuf.columns.binary_values(column, messages.size(), values)
+                    for i in range(messages.size()):
+                        messages[i].set_name(values[i])
+                column = columns.get("id")
+                if column is not None:
+                    buffer = cytobuf.protobuf.columns.ColumnBuffer(column, b"i", sizeof(int), messages.size())
+                    for i in range(messages.size()):
+                        messages[i].set_id(<int>(<const int*>buffer.data)[i])
+                column = columns.get("email")
+                if column is not None:
+                    cytobuf.protobuf.columns.binary_values(column, messages.size(), values)
+                    for i in range(messages.size()):
+                        messages[i].set_email(values[i])
+                column = columns.get("phones")
+                if column is not None:
+                    buffer = cytobuf.protobuf.columns.list_offsets(column, messages.size())
+                    offsets = <const long long*>buffer.data
+                    column = column.values
+                    for i in range(messages.size()):
+                        for j in range(offsets[i], offsets[i + 1]):
+                            phones_messages.push_back(messages[i].add_phones())
+                    pb_people_models_Person_PhoneNumber._from_columns(phones_messages, column)
+                column = columns.get("address")
+                if column is not None:
+                    # An empty dict is the export of a field that none of the rows set.
+                    for i in range(messages.size() if column else 0):
+                        address_messages.push_back(messages[i].mutable_address())
+                    pb_address_models_Address._from_columns(address_messages, column)
+                return 0
+
+            def to_dict(
+                    self,
+                    bint including_default_value_fields = False,
+                    bint preserving_proto_field_name = False,
+                    bint use_integers_for_enums = False,
+            ):
+                \"\"\"Converts this message to a dict matching `json_format.MessageToDict`.\"\"\"
+                self._load_lazy_fields()
+                return pb_people_models_Person._to_dict(
+                    self._message(),
+                    including_default_value_fields,
+                    preserving_proto_field_name,
+                    use_integers_for_enums,
+                )
+
+            @classmethod
+            def from_dict(cls, dict value, bint ignore_unknown_fields = False):
+                \"\"\"Builds a new message from a dict in the format produced by `to_dict`.\"\"\"
+                cdef pb_people_models_Person result = cls()
+                pb_people_models_Person._merge_dict(result._message(), value, ignore_unknown_fields)
+                return result
+
+            @classmethod
+            def parse_columns(
+                    cls,
+                    messages,
+                    offsets = None,
+                    fields = None,
+                    cytobuf.protobuf.message.ParseOptions options = None,
+            ):
+                \"\"\"Parses a batch of serialized messages into columns, as exported by `to_columns`.
+
+                `messages` is a sequence of buffer-protocol objects, a pyarrow binary array or, with
+                `offsets`, a single buffer holding the messages back to back.  They're decoded in C++ with
+                the GIL released onto a temporary arena, without creating a message object per record.
+                Only the fields named in `fields` are exported, if given.
+                \"\"\"
+                return pb_people_models_Person._parse_columns(
+                    cytobuf.protobuf.message.Payloads(messages, offsets), fields, options
+                )
+
+            @classmethod
+            def parse_arrow(
+                    cls,
+                    messages,
+                    offsets = None,
+                    fields = None,
+                    cytobuf.protobuf.message.ParseOptions options = None,
+            ):
+                \"\"\"Like `parse_columns`, but returns the columns as a `pyarrow.RecordBatch`.\"\"\"
+                cdef cytobuf.protobuf.message.Payloads payloads = cytobuf.protobuf.message.Payloads(messages, offsets)
+                return cytobuf.protobuf.columns.to_arrow(
+                    pb_people_models_Person._parse_columns(payloads, fields, options), len(payloads)
+                )
+
+            @staticmethod
+            cdef dict _parse_columns(
+                    cytobuf.protobuf.message.Payloads payloads,
+                    object fields,
+                    cytobuf.protobuf.message.ParseOptions options,
+            ):
+                cdef cytobuf.protobuf.arena.Arena arena = cytobuf.protobuf.arena.Arena()
+                cdef set selected = None if fields is None else set(fields)
+                cdef vector[cytobuf.protobuf.common.Message*] targets
+                cdef vector[Person*] parsed
+                cdef Person* message
+                cdef size_t i
+                targets.reserve(payloads.sizes.size())
+                parsed.reserve(payloads.sizes.size())
+                for i in range(payloads.sizes.size()):
+                    message = cytobuf.protobuf.common.Arena.CreateMessage[Person](arena._arena)
+                    targets.push_back(message)
+                    parsed.push_back(message)
+                cytobuf.protobuf.message.parse_payloads(targets, payloads, options)
+                return pb_people_models_Person._to_columns(parsed, selected)
+
+            def CopyFrom(self, pb_people_models_Person other not None):
+                if other is self:
+                    return
+                self._check_exports()
+                self._reset_cache(False)
+                self._lazy = None
+                other._load_lazy_fields()
+                self._message().CopyFrom(other._message()[0])
+
+            def MergeFrom(self, pb_people_models_Person other not None):
+                self._check_exports()
+                self._load_lazy_fields()
+                other._load_lazy_fields()
+                if other is self:
+                    # C++ doesn't allow merging a message into itself, so merge a serialized copy.
+                    self.MergeFromString(self.SerializeToString())
+                else:
+                    self._message().MergeFrom(other._message()[0])
+
+            def Swap(self, pb_people_models_Person other not None):
+                if other is self:
+                    return
+                self._check_exports()
+                other._check_exports()
+                self._reset_cache(True)
+                other._reset_cache(True)
+                self._load_lazy_fields()
+                other._load_lazy_fields()
+                self._message().Swap(other._message())
+
+            @property
+            def phones(self):
+                cdef __pb_people_models_Person__phones__container container
+                # Containers are created when the field is first accessed and kept for later accesses.
+                if self._phones_cache is not None:
+                    return self._phones_cache
+                container = __pb_people_models_Person__phones__container()
+                container._instance = self._message()
+                container._parent = self
+                self._phones_cache = container
+                return container
+
             @property
             def name(self):
-                return bytes.decode(self._message().name())
+                return cytobuf.protobuf.strings.decode_utf8(self._message().name())
 
             @name.setter
             def name(self, str value):
@@ -329,7 +1076,7 @@ def test_message_pyx_render(pxd_file):
 
             @property
             def email(self):
-                return bytes.decode(self._message().email())
+                return __pb_people_models_Person__email__strings.decode(self._message().email())
 
             @email.setter
             def email(self, str value):
@@ -341,10 +1088,25 @@ def test_message_pyx_render(pxd_file):
 
             @property
             def address(self):
-                return pb_address_models_Address.from_cpp(self._message().mutable_address())
+                cdef _cpp_pb_address_models_Address* instance
+                cdef cytobuf.protobuf.message.Message cached
+                self._load_lazy_field(5)
+                instance = self._message().mutable_address()
+                # The wrapper is only reused while it still points at the sub-message's current storage.
+                cached = self._address_cache
+                if cached is not None and cached._internal == instance:
+                    return cached
+                cached = pb_address_models_Address.from_cpp(instance, self)
+                self._address_cache = cached
+                return cached
 
             @address.deleter
             def address(self):
+                self._load_lazy_field(5)
+                if self._address_cache is not None:
+                    if self._internal.GetArena() is NULL:
+                        self._detach_cached(self._address_cache, self._message().release_address())
+                    self._address_cache = None
                 self._message().clear_address()
     """
     )
@@ -352,6 +1114,13 @@ def test_message_pyx_render(pxd_file):
     assert expected.strip() == actual.strip()
 
 
+def test_message_pyx_render_raw_enums():
+    actual = message_pyx_template.render(file=_parse_people_proto(GeneratorOptions(raw_enums=True)))
+    assert "EnumTable" not in actual
+    assert "return (self._message().type())" in actual
+    assert "encode_enum(_py_pb_people_models_Person_PhoneType, message.type()" in actual
+
+
 def test_py_module_render(pxd_file):
     expected = textwrap.dedent(
         """\